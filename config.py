@@ -23,11 +23,98 @@ class Settings(BaseSettings):
     # AI Configuration
     # ai_service: str = "gemini"  # 'gemini', 'openai', or 'openrouter'
     # ai_model: str = "gemini-3-flash-preview"  # hoặc 'gpt-3.5-turbo', 'gpt-4', 'xiaomi/mimo-v2-flash:free'
-    ai_service: str = "openrouter"  # 'gemini', 'openai', or 'openrouter'
+    ai_service: str = "openrouter"  # 'gemini', 'openai', 'openrouter' hoặc 'auto' (router tự chọn)
     ai_model: str = "xiaomi/mimo-v2-flash:free"  # Model miễn phí từ OpenRouter
     ai_temperature: float = 0.7
     ai_max_tokens: int = 800  # Giới hạn response tokens (tránh timeout)
 
+    # Provider Router (khi ai_service = 'auto')
+    ai_router_providers: list = ["openrouter", "gemini", "openai"]  # Chỉ dùng provider có API key
+    ai_router_timeout: float = 20.0  # Timeout mỗi lần gọi provider (giây)
+    ai_router_cooldown: float = 30.0  # Tạm ngừng provider sau timeout/429 (giây)
+    ai_hedge_delay: float = 0.0  # Gửi hedged request sau N giây chưa có kết quả, 0 = tắt
+
+    # HTTP Transport (connection pool dùng chung cho các AI provider)
+    ai_http_max_connections: int = 100
+    ai_http_max_keepalive: int = 20  # Số kết nối keep-alive giữ lại
+    ai_http_keepalive_expiry: float = 30.0  # Giây
+    ai_http_connect_timeout: float = 5.0  # Giây
+    ai_http_read_timeout: float = 30.0  # Giây
+    ai_retry_attempts: int = 2  # Số lần thử lại khi timeout/429/5xx/lỗi kết nối
+    ai_retry_base_delay: float = 0.5  # Backoff: base * 2^n giây (có jitter)
+    ai_retry_max_delay: float = 4.0
+
+    # Admission Control (giới hạn request đồng thời tới mỗi provider)
+    provider_max_concurrency: int = 8  # Số lời gọi đồng thời tối đa mỗi provider
+    provider_concurrency_overrides: dict = {}  # Giới hạn riêng theo provider, vd: {"openrouter": 4}
+    provider_max_queue: int = 32  # Số request chờ tối đa, đầy thì trả về 429
+    provider_queue_timeout: float = 10.0  # Thời gian chờ tối đa trong hàng đợi (giây)
+
+    # Prompt Budget (giới hạn kích thước prompt gửi cho AI)
+    prompt_token_budget: int = 3000  # Tổng token tối đa của prompt
+    prompt_max_job_tokens: int = 300  # Token tối đa cho mỗi công việc
+
+    # Chat Sessions (lưu lịch sử hội thoại phía server)
+    session_max_recent_messages: int = 10  # Số tin nhắn giữ nguyên văn, cũ hơn được tóm tắt
+    session_summary_max_chars: int = 2000  # Độ dài tối đa của bản tóm tắt các lượt chat cũ
+    session_summary_window: int = 10  # Gom đủ N tin nhắn cũ thì LLM tóm tắt lại một lần
+    session_max_sessions: int = 10000  # Số session tối đa trong bộ nhớ
+    session_ttl: int = 86400  # Session không hoạt động quá thời gian này sẽ bị xóa (giây)
+    session_db_path: str = ""  # File SQLite để lưu session, rỗng = chỉ lưu trong bộ nhớ
+
+    # CV Cache (cache text/phân tích CV theo SHA-256 của file PDF)
+    cv_cache_max_size: int = 256  # Số CV tối đa trong bộ nhớ
+    cv_cache_dir: str = ""  # Thư mục lưu cache xuống đĩa, rỗng = chỉ cache trong bộ nhớ
+    skills_taxonomy_path: str = ""  # File JSON danh mục kỹ năng, rỗng = data/skills_taxonomy.json
+
+    # CV Profiles (hồ sơ CV theo cv_id, dùng để gợi ý việc làm mà không upload lại)
+    cv_profile_max_size: int = 5000  # Số hồ sơ tối đa trong bộ nhớ
+    cv_profile_ttl: int = 30 * 86400  # Hồ sơ không được dùng quá thời gian này sẽ bị xóa (giây), 0 = không hết hạn
+    cv_profile_db_path: str = ""  # File SQLite để lưu hồ sơ, rỗng = chỉ lưu trong bộ nhớ
+    cv_max_queries: int = 6  # Số query tìm việc tạo từ mỗi CV (query tổng hợp + các đoạn CV)
+    rrf_k: int = 60  # Hằng số k của Reciprocal Rank Fusion khi gộp kết quả nhiều query
+    rrf_candidates: int = 100  # Số kết quả lấy về cho mỗi query trước khi gộp (làm tròn lên theo trang cần lấy)
+
+    # PDF Extraction (đọc PDF trong process pool, không chặn event loop)
+    pdf_workers: int = 2  # Số process đọc PDF, 0 = đọc trong thread (không dùng process pool)
+    pdf_timeout: float = 15.0  # Thời gian tối đa đọc một file PDF, tính cả thời gian chờ worker (giây)
+    pdf_max_pages: int = 20  # Chỉ đọc N trang đầu của CV
+
+    # CV Upload (chép theo từng phần, giới hạn dung lượng)
+    upload_max_bytes: int = 10 * 1024 * 1024  # Dung lượng tối đa file CV upload (byte), lớn hơn trả về 413
+    upload_spool_max_memory: int = 1024 * 1024  # File lớn hơn được ghi ra file tạm thay vì giữ trong RAM
+    bulk_upload_max_bytes: int = 200 * 1024 * 1024  # Tổng dung lượng tối đa của một request upload hàng loạt
+    bulk_max_files: int = 500  # Số CV tối đa mỗi request (tính cả file trong ZIP)
+    bulk_concurrency: int = 4  # Số CV được phân tích cùng lúc
+
+    # Response Cache (cache câu trả lời AI trong bộ nhớ)
+    response_cache_enabled: bool = True
+    response_cache_max_size: int = 1000  # Số câu trả lời tối đa
+    response_cache_ttl: int = 3600  # Giây
+
+    # Retrieval Cache (cache kết quả vector search)
+    retrieval_cache_enabled: bool = True
+    retrieval_cache_max_size: int = 2048  # Số query tối đa
+    # TTL chặn trên độ cũ khi vector DB bị ghi bởi process khác (vd: script import)
+    retrieval_cache_ttl: int = 600  # Giây
+
+    # Vector DB
+    vector_batch_size: int = 512  # Số job được embed + upsert mỗi lần khi nạp hàng loạt
+    vector_batch_max_items: int = 1000  # Số job (thêm + xóa) tối đa mỗi request /api/vector/jobs/batch
+
+    # Hybrid Search (vector search + chỉ mục từ khóa BM25, gộp bằng RRF)
+    hybrid_search_enabled: bool = True
+    hybrid_candidates: int = 50  # Số ứng viên lấy từ mỗi bên trước khi gộp
+    hybrid_lexical_weight: float = 1.0  # Trọng số của BM25 khi gộp (vector search = 1.0)
+    hybrid_filter_overfetch: int = 4  # Có bộ lọc: lấy gấp ngần này ứng viên BM25 rồi mới lọc theo metadata
+    bm25_index_path: str = ""  # File SQLite của chỉ mục BM25, rỗng = bm25_index.db cạnh thư mục vector_db
+
+    # Logging
+    log_level: str = "INFO"
+    log_format: str = "text"  # 'text' hoặc 'json' (một dòng JSON mỗi log)
+    log_payload_sample_rate: float = 0.0  # Tỉ lệ request được log prompt/câu trả lời/text CV (0-1)
+    log_payload_max_chars: int = 2000  # Payload dài hơn sẽ bị cắt khi log
+
     # Database Configuration
     db_host: str = "localhost"
     db_port: int = 3306
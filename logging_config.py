@@ -0,0 +1,157 @@
+"""
+Cấu hình logging của ứng dụng
+
+- Log ghi qua QueueHandler: thread xử lý request chỉ đẩy record vào hàng đợi,
+  việc format và ghi ra stdout do thread nền (QueueListener) đảm nhiệm
+- Mỗi request có một request ID (header X-Request-ID) gắn vào mọi dòng log
+- Email / số điện thoại được che trước khi ghi
+- Payload lớn (prompt, câu trả lời, text CV) chỉ được log theo tỉ lệ lấy mẫu
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+from config import get_settings
+
+# Request ID của request đang xử lý ("-" khi ngoài request, vd: lúc khởi động)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+_EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+# Số điện thoại VN (0xx / +84 / 84), cho phép dấu cách, chấm, gạch ngang giữa các nhóm số
+_PHONE_PATTERN = re.compile(r"(?<![\w+.])(?:\+?84|0)[\s.-]?[1-9](?:[\s.-]?\d){7,9}(?!\d)")
+
+# Thuộc tính có sẵn của LogRecord, phần còn lại là field truyền qua `extra`
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+
+def redact(text: str) -> str:
+    """Che email và số điện thoại trong text"""
+    text = _EMAIL_PATTERN.sub("[email]", text)
+    return _PHONE_PATTERN.sub("[phone]", text)
+
+
+def should_log_payload() -> bool:
+    """Lấy mẫu log payload theo settings.log_payload_sample_rate (0 = không bao giờ)"""
+    rate = get_settings().log_payload_sample_rate
+    return rate > 0 and random.random() < rate
+
+
+def payload_preview(text: str) -> str:
+    """Cắt payload theo settings.log_payload_max_chars trước khi log"""
+    max_chars = get_settings().log_payload_max_chars
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}… (+{len(text) - max_chars} ký tự)"
+
+
+class RequestIdFilter(logging.Filter):
+    """Gắn request ID hiện tại vào record (chạy ở thread gọi log, trước khi vào hàng đợi)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """Format record thành JSON một dòng hoặc text `key=value`, đã che PII"""
+
+    def __init__(self, json_format: bool = False):
+        super().__init__()
+        self.json_format = json_format
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {
+            key: value for key, value in record.__dict__.items()
+            if key not in _RESERVED_ATTRS and not key.startswith("_")
+        }
+        message = record.getMessage()
+        if record.exc_info:
+            message += "\n" + self.formatException(record.exc_info)
+        request_id = getattr(record, "request_id", "-")
+
+        if self.json_format:
+            data = {
+                "ts": round(record.created, 3),
+                "level": record.levelname,
+                "logger": record.name,
+                "request_id": request_id,
+                "msg": message,
+                **fields
+            }
+            return redact(json.dumps(data, ensure_ascii=False, default=str))
+
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        extras = " ".join(f"{key}={value}" for key, value in fields.items())
+        line = f"{timestamp} {record.levelname:<7} [{request_id}] {record.name}: {message}"
+        return redact(f"{line} {extras}" if extras else line)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging() -> None:
+    """Cấu hình root logger (chỉ chạy một lần)"""
+    global _listener
+    if _listener is not None:
+        return
+    settings = get_settings()
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(StructuredFormatter(json_format=settings.log_format == "json"))
+
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(settings.log_level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    # Ghi nốt các record còn trong hàng đợi khi process thoát
+    atexit.register(_listener.stop)
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware gán request ID cho mỗi request HTTP
+
+    Dùng header X-Request-ID của client nếu có (để nối log với gateway / frontend),
+    không thì tự sinh; request ID được trả lại trong response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
@@ -6,9 +6,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 from config import get_settings
+from logging_config import setup_logging, RequestIdMiddleware
+from services.http_transport import close_http_clients
+from services.pdf_extractor import shutdown_pdf_extractor
+from services.upload_service import UploadSizeLimitMiddleware
 from routes.chat import router as chat_router
 from routes.vector import router as vector_router
 from routes.cv import router as cv_router
+from routes.metrics import router as metrics_router
 
 # Load environment variables
 load_dotenv()
@@ -16,6 +21,9 @@ load_dotenv()
 # Get settings
 settings = get_settings()
 
+# Logging (ghi log qua hàng đợi, không chặn request)
+setup_logging()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="AI JobHunter Chatbot",
@@ -30,12 +38,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
+)
+
+# Từ chối upload quá lớn (413) trước khi parse form multipart
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=settings.upload_max_bytes,
+    path_limits={"/api/cv/bulk-analyze": settings.bulk_upload_max_bytes}
 )
 
+# Gán request ID cho mỗi request (gắn vào log và header X-Request-ID)
+app.add_middleware(RequestIdMiddleware)
+
+@app.on_event("shutdown")
+async def close_connection_pools():
+    """Đóng connection pool dùng chung của các AI provider và process pool đọc PDF"""
+    await close_http_clients()
+    shutdown_pdf_extractor()
+
 # Include routers
 app.include_router(chat_router)
 app.include_router(vector_router)
 app.include_router(cv_router)
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     import uvicorn
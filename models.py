@@ -58,8 +58,10 @@ class CVAnalysisResponse(BaseModel):
     phone: Optional[str] = Field(None, description="Số điện thoại")
     skills: List[str] = Field(default=[], description="Danh sách kỹ năng")
     experience_years: Optional[int] = Field(None, description="Số năm kinh nghiệm")
+    field_confidence: Optional[Dict[str, float]] = Field(None, description="Độ tin cậy (0-1) của email, phone, experience_years")
     message: Optional[str] = Field(None, description="Thông báo")
     error: Optional[str] = Field(None, description="Lỗi nếu có")
+    cv_id: Optional[str] = Field(None, description="ID hồ sơ CV, dùng để gợi ý việc làm mà không cần upload lại")
 
 
 class JobRecommendation(BaseModel):
@@ -73,7 +75,10 @@ class JobRecommendationResponse(BaseModel):
     """Response chứa danh sách công việc gợi ý"""
     success: bool = Field(..., description="Trạng thái")
     jobs: List[JobRecommendation] = Field(default=[], description="Danh sách công việc")
-    total: int = Field(..., description="Tổng số công việc tìm thấy")
+    total: int = Field(..., description="Số công việc tìm thấy (đã lọc min_score); has_more = True thì có thể còn nhiều hơn")
     cv_summary: Dict = Field(default={}, description="Tóm tắt thông tin CV")
     message: Optional[str] = Field(None, description="Thông báo")
+    cv_id: Optional[str] = Field(None, description="ID hồ sơ CV")
+    offset: int = Field(default=0, description="Vị trí bắt đầu của trang kết quả")
+    has_more: bool = Field(default=False, description="Còn kết quả ở trang sau")
 
@@ -2,16 +2,26 @@
 Chat API routes
 """
 from fastapi import APIRouter, HTTPException, File, UploadFile, Form
-from typing import Optional, List, Dict
+from fastapi.responses import StreamingResponse
+from typing import Optional, List, Dict, Tuple, AsyncIterator
 from models import ChatRequest, ChatResponse, HealthResponse
 from services.gemini_service import get_gemini_service
 from services.openai_service import get_openai_service
 from services.openrouter_service import get_openrouter_service
 from services.cv_service import get_cv_service
+from services.upload_service import spool_pdf_upload, UploadRejectedError
+from services.cache_service import get_response_cache
+from services.provider_router import get_provider_router
+from services.session_service import get_session_store
+from services.admission import QueueFullError, get_admission_stats
 from config import get_settings
+from logging_config import should_log_payload, payload_preview
+import asyncio
 import json
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 @router.get("/", tags=["Health"])
@@ -36,11 +46,165 @@ async def health_check():
     )
 
 
+@router.get("/api/chat/cache-stats", tags=["Chat"])
+async def cache_stats():
+    """
+    Thống kê response cache: số entry, hit rate, latency tiết kiệm được
+    """
+    return get_response_cache().stats()
+
+
+@router.get("/api/chat/providers", tags=["Chat"])
+async def provider_stats():
+    """
+    Thống kê latency (p50/p95), tỉ lệ lỗi và thứ tự ưu tiên của các AI provider
+    (chỉ có khi ai_service = 'auto'), cùng hàng đợi / thời gian chờ của admission control
+    """
+    if get_settings().ai_service != "auto":
+        return {"router_enabled": False, "admission": get_admission_stats()}
+    return {"router_enabled": True, **get_provider_router().get_stats()}
+
+
+def _log_request(endpoint: str, message: str, history: List[Dict], file: Optional[UploadFile]) -> None:
+    """Log tóm tắt request; nội dung tin nhắn chỉ log theo tỉ lệ lấy mẫu"""
+    extra = {
+        "endpoint": endpoint,
+        "message_chars": len(message),
+        "history_messages": len(history),
+        "has_file": file is not None
+    }
+    if should_log_payload():
+        extra["payload"] = payload_preview(message)
+    logger.info("Nhận chat request", extra=extra)
+
+
+def _parse_history(conversation_history: str) -> List[Dict]:
+    """Parse lịch sử hội thoại từ JSON string, lỗi thì trả về list rỗng"""
+    try:
+        history = json.loads(conversation_history)
+    except:
+        history = []
+    return history
+
+
+async def _extract_cv_text(file: Optional[UploadFile]) -> str:
+    """
+    Đọc text từ CV PDF (nếu có) để đưa vào context cho AI
+    
+    Args:
+        file: File CV PDF (optional)
+        
+    Returns:
+        str: Text trích xuất từ CV, rỗng nếu không có file hoặc không đọc được
+        
+    Raises:
+        HTTPException: 413 / 415 khi file quá lớn hoặc không phải PDF
+    """
+    if not (file and file.filename.lower().endswith('.pdf')):
+        return ""
+    try:
+        async with spool_pdf_upload(file) as upload:
+            cv_service = get_cv_service()
+            cv_text = await cv_service.extract_text_from_pdf_async(upload.source, digest=upload.digest)
+        
+        if cv_text and len(cv_text) >= 50:
+            logger.info("Đã trích xuất %d ký tự từ CV", len(cv_text))
+            return cv_text
+        logger.warning("CV quá ngắn hoặc không đọc được")
+    except UploadRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        logger.warning("Lỗi khi xử lý CV: %s", e)
+        # Nếu lỗi khi đọc CV, vẫn tiếp tục chat bình thường
+    return ""
+
+
+def _resolve_session(
+    session_id: Optional[str],
+    new_session: bool,
+    history: List[Dict],
+    cv_text: str
+) -> Tuple[Optional[str], List[Dict], str, str]:
+    """
+    Lấy lịch sử, CV và bản tóm tắt từ session phía server
+    
+    Session ID chỉ do server cấp: new_session = True tạo session mới (dùng lịch sử
+    client gửi lên làm lịch sử ban đầu), ID không do server cấp / đã hết hạn trả về 404.
+    CV mới upload được lưu vào session.
+    
+    Returns:
+        Tuple: (session_id hoặc None nếu không dùng session, history, cv_text, summary)
+        
+    Raises:
+        HTTPException: 404 nếu không tìm thấy session
+    """
+    if not session_id and not new_session:
+        return None, history, cv_text, ""
+    store = get_session_store()
+    if session_id:
+        session = store.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Không tìm thấy session, hãy tạo session mới")
+    else:
+        session = store.create(history)
+    session_id = session["session_id"]
+    if cv_text:
+        store.set_cv(session_id, cv_text)
+    logger.info(
+        "Dùng session %s", session_id[:8],
+        extra={"history_messages": len(session["history"]), "has_summary": bool(session["summary"])}
+    )
+    return session_id, list(session["history"]), cv_text or session["cv_text"], store.context_summary(session)
+
+
+# Giữ tham chiếu tới các task tóm tắt chạy nền (asyncio chỉ giữ weak reference)
+_summary_tasks = set()
+
+def _record_turn(session_id: str, message: str, response: str, ai_service) -> None:
+    """Ghi lượt chat vào session; đủ một cửa sổ tin nhắn cũ thì tóm tắt lại bằng LLM (chạy nền)"""
+    store = get_session_store()
+    if store.append_turn(session_id, message, response) and store.summary_due(session_id):
+        task = asyncio.create_task(store.summarize(session_id, ai_service.complete_async))
+        _summary_tasks.add(task)
+        task.add_done_callback(_summary_tasks.discard)
+
+
+def _get_ai_service():
+    """Chọn AI service theo cấu hình settings.ai_service"""
+    settings = get_settings()
+    
+    if settings.ai_service == "auto":
+        return get_provider_router()
+    elif settings.ai_service == "openai":
+        return get_openai_service()
+    elif settings.ai_service == "openrouter":
+        return get_openrouter_service()
+    else:
+        return get_gemini_service()
+
+
+def _too_many_requests(error: QueueFullError) -> HTTPException:
+    """Provider quá tải: trả 429 kèm Retry-After để client tự thử lại"""
+    logger.warning("Từ chối request: %s", error, extra={"retry_after": error.retry_after})
+    return HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def _sse_event(data: Dict) -> str:
+    """Format một event theo chuẩn Server-Sent Events"""
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @router.post("/api/chat", tags=["Chat"])
 async def chat(
     message: str = Form(...),
     conversation_history: str = Form(default="[]"),
-    file: Optional[UploadFile] = File(None)
+    file: Optional[UploadFile] = File(None),
+    session_id: Optional[str] = Form(default=None),
+    new_session: bool = Form(default=False)
 ):
     """
     Main chatbot endpoint - Hỗ trợ upload CV PDF kèm message
@@ -48,78 +212,183 @@ async def chat(
     Nhận tin nhắn từ user, có thể kèm file CV PDF.
     - Nếu có file CV: trích xuất text và đưa vào context cho AI xử lý
     - Nếu không có file: chat bình thường
+    - Nếu có session_id (hoặc new_session = true ở lượt đầu): lịch sử, CV và tóm tắt
+      được lấy từ session phía server, client chỉ cần gửi tin nhắn mới
     
     Args:
         message: Tin nhắn từ user
         conversation_history: Lịch sử chat dạng JSON string (mặc định: [])
         file: File CV PDF (optional)
+        session_id: ID phiên chat do server cấp (optional), ID lạ trả về 404
+        new_session: Tạo phiên chat mới, ID được trả về trong response
         
     Returns:
         ChatResponse với câu trả lời từ AI
     """
     try:
-        # Log request
-        print("\n🚀 New Chat Request Received")
-        print(f"Message: {message}")
-        print(f"Has file: {file is not None}")
-        
         # Parse conversation history
-        try:
-            history = json.loads(conversation_history)
-        except:
-            history = []
+        history = _parse_history(conversation_history)
+        _log_request("chat", message, history, file)
         
-        print(f"History length: {len(history)}")
+        # XỬ LÝ FILE CV NẾU CÓ (CV được đưa vào prompt trong giới hạn token budget)
+        cv_text = await _extract_cv_text(file)
         
-        # XỬ LÝ FILE CV NẾU CÓ
-        cv_text = ""
-        if file and file.filename.lower().endswith('.pdf'):
-            print("📄 Đang xử lý file CV...")
-            try:
-                content = await file.read()
-                cv_service = get_cv_service()
-                cv_text = cv_service.extract_text_from_pdf(content)
-                
-                if cv_text and len(cv_text) >= 50:
-                    print(f"✅ Đã trích xuất {len(cv_text)} ký tự từ CV")
-                    # Thêm context CV vào message
-                    message = f"Dựa vào nội dung CV sau đây:\n\n{cv_text}\n\n---\n\nCâu hỏi/Yêu cầu của tôi: {message}"
-                else:
-                    print("⚠️ CV quá ngắn hoặc không đọc được")
-            except Exception as e:
-                print(f"❌ Lỗi khi xử lý CV: {e}")
-                # Nếu lỗi khi đọc CV, vẫn tiếp tục chat bình thường
+        # Lấy lịch sử, CV và tóm tắt từ session (nếu có)
+        session_id, history, cv_text, summary = _resolve_session(session_id, new_session, history, cv_text)
         
         # Lấy settings và chọn service phù hợp
-        settings = get_settings()
-        
-        if settings.ai_service == "openai":
-            print("Using OpenAI service")
-            ai_service = get_openai_service()
-        elif settings.ai_service == "openrouter":
-            print("Using OpenRouter service (Free model)")
-            ai_service = get_openrouter_service()
-        else:
-            print("Using Gemini service")
-            ai_service = get_gemini_service()
+        ai_service = _get_ai_service()
         
         # Chat với AI
-        ai_response = ai_service.chat(
+        ai_response = await ai_service.chat_async(
             message=message,
-            conversation_history=history
+            conversation_history=history,
+            cv_text=cv_text,
+            summary=summary
         )
         
+        if session_id:
+            _record_turn(session_id, message, ai_response, ai_service)
+        
         return {
             "response": ai_response,
             "success": True,
-            "has_cv": bool(cv_text)
+            "has_cv": bool(cv_text),
+            "session_id": session_id
         }
     
+    except QueueFullError as e:
+        raise _too_many_requests(e)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Lỗi khi xử lý chat request")
         raise HTTPException(
             status_code=500,
             detail=f"Error: {str(e)}"
         )
+
+
+@router.post("/api/chat/stream", tags=["Chat"])
+async def chat_stream(
+    message: str = Form(...),
+    conversation_history: str = Form(default="[]"),
+    file: Optional[UploadFile] = File(None),
+    session_id: Optional[str] = Form(default=None),
+    new_session: bool = Form(default=False)
+):
+    """
+    Phiên bản streaming của /api/chat (Server-Sent Events)
+    
+    Retrieval và xử lý CV giống hệt /api/chat, nhưng câu trả lời được đẩy về
+    client theo từng token ngay khi AI provider sinh ra.
+    
+    Mỗi event có dạng `data: {...}`:
+    - {"type": "token", "content": "..."}: một đoạn câu trả lời
+    - {"type": "done", "success": true, "has_cv": bool, "session_id": ...}: kết thúc stream
+    - {"type": "error", "success": false, "detail": "..."}: lỗi giữa chừng
+    
+    Provider quá tải (hàng đợi đầy) trả về HTTP 429 kèm header Retry-After.
+    
+    Args:
+        message: Tin nhắn từ user
+        conversation_history: Lịch sử chat dạng JSON string (mặc định: [])
+        file: File CV PDF (optional)
+        session_id: ID phiên chat do server cấp (optional), ID lạ trả về 404
+        new_session: Tạo phiên chat mới, ID được trả về trong event "done"
+        
+    Returns:
+        StreamingResponse dạng text/event-stream
+    """
+    history = _parse_history(conversation_history)
+    _log_request("chat_stream", message, history, file)
+    cv_text = await _extract_cv_text(file)
+    session_id, history, cv_text, summary = _resolve_session(session_id, new_session, history, cv_text)
+    ai_service = _get_ai_service()
+    tokens = ai_service.chat_stream(
+        message=message,
+        conversation_history=history,
+        cv_text=cv_text,
+        summary=summary
+    )
+    
+    # Chờ token đầu tiên trước khi gửi header: provider quá tải vẫn trả được 429
+    first_token, first_error = None, None
+    try:
+        first_token = await tokens.__anext__()
+    except StopAsyncIteration:
+        pass
+    except QueueFullError as e:
+        raise _too_many_requests(e)
+    except Exception as e:
+        first_error = e
+    
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            if first_error is not None:
+                raise first_error
+            chunks = []
+            if first_token is not None:
+                chunks.append(first_token)
+                yield _sse_event({"type": "token", "content": first_token})
+                async for token in tokens:
+                    chunks.append(token)
+                    yield _sse_event({"type": "token", "content": token})
+            if session_id:
+                _record_turn(session_id, message, "".join(chunks), ai_service)
+            yield _sse_event({
+                "type": "done",
+                "success": True,
+                "has_cv": bool(cv_text),
+                "session_id": session_id
+            })
+        except Exception as e:
+            # Header đã gửi đi nên không thể trả HTTP 500, báo lỗi qua event
+            logger.exception("Lỗi khi streaming câu trả lời")
+            yield _sse_event({"type": "error", "success": False, "detail": f"Error: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Tắt buffering của nginx để token tới client ngay
+        }
+    )
+
+
+@router.post("/api/chat/sessions", tags=["Chat"])
+async def create_session():
+    """
+    Tạo phiên chat mới phía server
+    
+    Returns:
+        session_id để gửi kèm các request /api/chat tiếp theo
+    """
+    session = get_session_store().create()
+    return {"session_id": session["session_id"], "success": True}
+
+
+@router.get("/api/chat/sessions/{session_id}", tags=["Chat"])
+async def get_session(session_id: str):
+    """Xem lịch sử gần đây, bản tóm tắt và trạng thái CV của một phiên chat (không trả về nội dung CV)"""
+    session = get_session_store().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy session")
+    return {
+        "session_id": session["session_id"],
+        "history": session["history"],
+        "summary": session["summary"],
+        "unsummarized_messages": len(session.get("pending", [])),
+        "has_cv": bool(session["cv_text"]),
+        "created_at": session["created_at"],
+        "updated_at": session["updated_at"]
+    }
+
+
+@router.delete("/api/chat/sessions/{session_id}", tags=["Chat"])
+async def delete_session(session_id: str):
+    """Xóa phiên chat (lịch sử, CV, tóm tắt)"""
+    if not get_session_store().delete(session_id):
+        raise HTTPException(status_code=404, detail="Không tìm thấy session")
+    return {"success": True, "session_id": session_id}
@@ -1,13 +1,153 @@
 """
 CV Upload API routes - Xử lý upload và phân tích CV
 """
-from fastapi import APIRouter, File, UploadFile, HTTPException, Query
-from typing import Optional
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from config import get_settings
 from models import CVAnalysisResponse, JobRecommendationResponse, JobRecommendation
 from services.cv_service import get_cv_service
-from services.vector_service import search_jobs_vector, collection
+from services.cv_batch_service import BatchItem, analyze_cv_batch, expand_zip
+from services.upload_service import SpooledUpload, receive_upload, spool_pdf_upload, UploadRejectedError
+from services.cv_profile_service import get_cv_profile_store, profile_summary
+from services.job_text import build_job_where
+from services.vector_service import embed_queries, query_jobs_by_embeddings
 
 router = APIRouter(prefix="/api/cv", tags=["CV"])
+logger = logging.getLogger(__name__)
+
+
+async def _analyze_upload(file: UploadFile) -> Tuple[Dict, str]:
+    """
+    Nhận file CV theo từng phần (giới hạn dung lượng, kiểm tra magic bytes) rồi phân tích
+    
+    Args:
+        file: File PDF được upload
+        
+    Returns:
+        Tuple (kết quả phân tích từ CVService.analyze_cv, SHA-256 của file = cv_id)
+    """
+    try:
+        async with spool_pdf_upload(file) as upload:
+            analysis = await get_cv_service().analyze_cv_async(upload.source, digest=upload.digest)
+            return analysis, upload.digest
+    except UploadRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+async def _save_profile(cv_id: str, analysis: Dict) -> Optional[Dict]:
+    """
+    Lưu hồ sơ CV kèm embedding của các query tìm việc (bỏ qua nếu hồ sơ cùng phiên bản đã có)
+    
+    Returns:
+        Dict hồ sơ CV, None nếu CV không tạo được query tìm kiếm
+    """
+    cv_service = get_cv_service()
+    store = get_cv_profile_store()
+    version = cv_service.analysis_version()
+    profile = store.get(cv_id)
+    if profile is not None and profile.get("analysis_version") == version and profile.get("embeddings"):
+        return profile
+    
+    search_queries = cv_service.create_job_search_queries(analysis, get_settings().cv_max_queries)
+    if not search_queries:
+        return None
+    # Embed tất cả query trong một lần gọi
+    embeddings = await asyncio.to_thread(embed_queries, search_queries)
+    logger.info("Đã lưu hồ sơ CV", extra={"cv_id": cv_id[:12], "queries": len(search_queries)})
+    return store.save(cv_id, analysis, search_queries, embeddings, version)
+
+
+def _job_filters(
+    location: Optional[str] = Query(default=None, description="Địa điểm, nhiều giá trị cách nhau bởi dấu phẩy (vd: Hà Nội,HCM)"),
+    level: Optional[str] = Query(default=None, description="Cấp bậc (vd: Junior,Senior)"),
+    job_type: Optional[str] = Query(default=None, description="Loại hình (vd: Full-time)"),
+    work_mode: Optional[str] = Query(default=None, description="Hình thức làm việc (vd: Remote,Hybrid)"),
+    salary_min: Optional[int] = Query(default=None, ge=0, description="Lương tối thiểu mong muốn (VND)"),
+    salary_max: Optional[int] = Query(default=None, ge=0, description="Lương tối đa (VND)"),
+    active_only: bool = Query(default=False, description="Chỉ lấy công việc chưa hết hạn")
+) -> Optional[Dict]:
+    """Bộ lọc metadata của Chroma từ query params (None nếu không lọc)"""
+    return build_job_where(location, level, job_type, work_mode, salary_min, salary_max, active_only)
+
+
+def _relevance(distance: float) -> float:
+    """Độ phù hợp (0-1) từ distance tốt nhất qua các query, distance càng nhỏ = càng phù hợp"""
+    return max(0, 1 - (distance / 2.0))
+
+
+async def _recommend_for_profile(
+    profile: Dict,
+    limit: int,
+    offset: int = 0,
+    keyword: Optional[str] = None,
+    min_score: float = 0.0,
+    where: Optional[Dict] = None
+) -> JobRecommendationResponse:
+    """
+    Gợi ý việc làm từ hồ sơ CV: một lần query Chroma cho tất cả embedding đã lưu
+    (không embed lại), kết quả các query được gộp bằng Reciprocal Rank Fusion
+    
+    Args:
+        profile: Hồ sơ CV
+        limit: Số công việc mỗi trang
+        offset: Vị trí bắt đầu
+        keyword: Chỉ lấy công việc có mô tả chứa từ khóa này
+        min_score: Bỏ các công việc có độ phù hợp thấp hơn
+        where: Bộ lọc metadata (địa điểm, cấp bậc, lương, ...), lọc ngay trong Chroma
+        
+    Returns:
+        JobRecommendationResponse: Một trang công việc phù hợp
+    """
+    logger.info(
+        "Tìm công việc theo CV",
+        extra={
+            "cv_id": profile["cv_id"][:12], "limit": limit, "offset": offset,
+            "keyword": bool(keyword), "filtered": where is not None
+        }
+    )
+    # Chroma không hỗ trợ offset cho query: lấy đủ ứng viên cho offset + limit (+1 để biết còn
+    # trang sau), lọc min_score trên toàn bộ danh sách đã gộp rồi mới cắt trang.
+    # Số ứng viên mỗi query được làm tròn lên bội số của rrf_candidates để thứ tự RRF
+    # không đổi giữa các trang
+    needed = offset + limit + 1
+    step = get_settings().rrf_candidates
+    candidates = -(-needed // step) * step
+    results = await asyncio.to_thread(
+        query_jobs_by_embeddings,
+        profile["embeddings"],
+        candidates * len(profile["embeddings"]),
+        {"$contains": keyword} if keyword else None,
+        candidates,
+        where
+    )
+    # Job ngoài kết quả của mọi query xa hơn kết quả cuối của từng query: nếu nó đạt min_score
+    # thì query tương ứng đã có đủ `candidates` job đạt min_score, nên has_more vẫn đúng
+    matched = [
+        (job_id, document, _relevance(distance))
+        for job_id, document, distance in zip(results["ids"], results["documents"], results["distances"])
+        if _relevance(distance) >= min_score
+    ]
+    
+    jobs = [
+        JobRecommendation(job_id=job_id, description=document, relevance_score=round(relevance, 3))
+        for job_id, document, relevance in matched[offset:offset + limit]
+    ]
+    
+    summary = profile_summary(profile)
+    return JobRecommendationResponse(
+        success=True,
+        jobs=jobs,
+        total=len(matched),
+        cv_summary={field: summary[field] for field in ("skills", "experience_years", "email", "phone")},
+        message=f"Tìm thấy {len(jobs)} công việc phù hợp với CV của bạn",
+        cv_id=profile["cv_id"],
+        offset=offset,
+        has_more=len(matched) > offset + limit
+    )
 
 
 @router.post("/upload", response_model=CVAnalysisResponse)
@@ -29,18 +169,8 @@ async def upload_cv(file: UploadFile = File(...)):
                 detail="Chỉ chấp nhận file PDF"
             )
         
-        # Đọc file content
-        content = await file.read()
-        
-        if len(content) == 0:
-            raise HTTPException(
-                status_code=400,
-                detail="File rỗng"
-            )
-        
-        # Phân tích CV
-        cv_service = get_cv_service()
-        analysis = cv_service.analyze_cv(content)
+        # Nhận file (streaming, giới hạn dung lượng) và phân tích CV
+        analysis, cv_id = await _analyze_upload(file)
         
         if not analysis.get("success"):
             return CVAnalysisResponse(
@@ -48,13 +178,23 @@ async def upload_cv(file: UploadFile = File(...)):
                 error=analysis.get("error", "Không thể phân tích CV")
             )
         
+        # Lưu hồ sơ để gợi ý việc làm sau này chỉ cần cv_id
+        # (lỗi khi tính embedding không làm hỏng kết quả phân tích)
+        try:
+            profile = await _save_profile(cv_id, analysis)
+        except Exception:
+            logger.exception("Không lưu được hồ sơ CV")
+            profile = None
+        
         return CVAnalysisResponse(
             success=True,
             email=analysis.get("email"),
             phone=analysis.get("phone"),
             skills=analysis.get("skills", []),
             experience_years=analysis.get("experience_years"),
-            message="Phân tích CV thành công"
+            field_confidence=analysis.get("field_confidence"),
+            message="Phân tích CV thành công",
+            cv_id=profile["cv_id"] if profile else None
         )
         
     except HTTPException:
@@ -69,7 +209,8 @@ async def upload_cv(file: UploadFile = File(...)):
 @router.post("/recommend-jobs", response_model=JobRecommendationResponse)
 async def recommend_jobs_from_cv(
     file: UploadFile = File(...),
-    top_k: int = Query(default=10, ge=1, le=50, description="Số lượng công việc gợi ý")
+    top_k: int = Query(default=10, ge=1, le=50, description="Số lượng công việc gợi ý"),
+    where: Optional[Dict] = Depends(_job_filters)
 ):
     """
     Upload CV và nhận gợi ý công việc phù hợp
@@ -77,6 +218,8 @@ async def recommend_jobs_from_cv(
     Args:
         file: File PDF CV
         top_k: Số lượng công việc muốn gợi ý (1-50)
+        location, level, job_type, work_mode, salary_min, salary_max, active_only:
+            Lọc công việc theo metadata (query params)
         
     Returns:
         JobRecommendationResponse: Danh sách công việc phù hợp
@@ -90,9 +233,7 @@ async def recommend_jobs_from_cv(
             )
         
         # Đọc và phân tích CV
-        content = await file.read()
-        cv_service = get_cv_service()
-        analysis = cv_service.analyze_cv(content)
+        analysis, cv_id = await _analyze_upload(file)
         
         if not analysis.get("success"):
             raise HTTPException(
@@ -100,67 +241,155 @@ async def recommend_jobs_from_cv(
                 detail=f"Không thể phân tích CV: {analysis.get('error')}"
             )
         
-        # Tạo query tìm kiếm dựa trên CV
-        search_query = cv_service.create_job_search_query(analysis)
+        # Tạo hồ sơ CV (query tìm kiếm + embedding) rồi tìm công việc phù hợp
+        profile = await _save_profile(cv_id, analysis)
         
-        if not search_query:
+        if profile is None:
             raise HTTPException(
                 status_code=400,
                 detail="Không thể tạo query tìm kiếm từ CV"
             )
         
-        print(f"\n🔍 Search Query: {search_query}")
-        
-        # Tìm kiếm công việc phù hợp
-        results = collection.query(
-            query_texts=[search_query],
-            n_results=top_k
-        )
-        
-        # Xử lý kết quả
-        jobs = []
-        if results['documents'] and results['ids'] and results['distances']:
-            documents = results['documents'][0]
-            ids = results['ids'][0]
-            distances = results['distances'][0]
-            
-            for i in range(len(ids)):
-                # Convert distance thành relevance score (0-1)
-                # Distance càng nhỏ = càng phù hợp
-                relevance = max(0, 1 - (distances[i] / 2.0))
-                
-                jobs.append(JobRecommendation(
-                    job_id=ids[i],
-                    description=documents[i],
-                    relevance_score=round(relevance, 3)
-                ))
-        
-        # Tạo CV summary
-        cv_summary = {
-            "skills": analysis.get("skills", []),
-            "experience_years": analysis.get("experience_years"),
-            "email": analysis.get("email"),
-            "phone": analysis.get("phone")
-        }
-        
-        return JobRecommendationResponse(
-            success=True,
-            jobs=jobs,
-            total=len(jobs),
-            cv_summary=cv_summary,
-            message=f"Tìm thấy {len(jobs)} công việc phù hợp với CV của bạn"
-        )
+        return await _recommend_for_profile(profile, limit=top_k, where=where)
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
+        logger.exception("Lỗi khi tìm kiếm công việc theo CV")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Lỗi khi tìm kiếm công việc: {str(e)}"
+        )
+
+
+@router.get("/profiles/{cv_id}")
+async def get_cv_profile(cv_id: str):
+    """Thông tin hồ sơ CV đã lưu (không kèm nội dung CV)"""
+    profile = get_cv_profile_store().get(cv_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy hồ sơ CV, vui lòng upload lại CV")
+    return profile_summary(profile)
+
+
+@router.delete("/profiles/{cv_id}")
+async def delete_cv_profile(cv_id: str):
+    """Xóa hồ sơ CV (nội dung CV là dữ liệu cá nhân)"""
+    if not get_cv_profile_store().delete(cv_id):
+        raise HTTPException(status_code=404, detail="Không tìm thấy hồ sơ CV")
+    return {"success": True, "cv_id": cv_id}
+
+
+@router.get("/profiles/{cv_id}/recommend-jobs", response_model=JobRecommendationResponse)
+async def recommend_jobs_for_profile(
+    cv_id: str,
+    limit: int = Query(default=10, ge=1, le=50, description="Số công việc mỗi trang"),
+    offset: int = Query(default=0, ge=0, le=200, description="Vị trí bắt đầu"),
+    keyword: Optional[str] = Query(default=None, min_length=1, description="Chỉ lấy công việc có mô tả chứa từ khóa"),
+    min_score: float = Query(default=0.0, ge=0, le=1, description="Độ phù hợp tối thiểu"),
+    where: Optional[Dict] = Depends(_job_filters)
+):
+    """
+    Gợi ý việc làm theo hồ sơ CV đã lưu (không cần upload và phân tích lại CV)
+    
+    Args:
+        cv_id: ID hồ sơ CV (trả về từ /api/cv/upload hoặc /api/cv/recommend-jobs)
+        limit: Số công việc mỗi trang (1-50)
+        offset: Vị trí bắt đầu (phân trang)
+        keyword: Lọc theo từ khóa trong mô tả công việc
+        min_score: Bỏ các công việc có độ phù hợp thấp hơn
+        location, level, job_type, work_mode, salary_min, salary_max, active_only:
+            Lọc công việc theo metadata (địa điểm, cấp bậc, loại hình, hình thức, lương, hạn nộp)
+        
+    Returns:
+        JobRecommendationResponse: Một trang công việc phù hợp
+    """
+    profile = get_cv_profile_store().get(cv_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy hồ sơ CV, vui lòng upload lại CV")
+    try:
+        return await _recommend_for_profile(profile, limit, offset, keyword, min_score, where)
+    except Exception as e:
+        logger.exception("Lỗi khi tìm kiếm công việc theo hồ sơ CV")
         raise HTTPException(
             status_code=500,
             detail=f"Lỗi khi tìm kiếm công việc: {str(e)}"
         )
 
 
+@router.post("/bulk-analyze")
+async def bulk_analyze_cvs(
+    files: List[UploadFile] = File(..., description="Nhiều file CV PDF và/hoặc file ZIP chứa CV")
+):
+    """
+    Phân tích nhiều CV trong một request (cho nhà tuyển dụng)
+    
+    Kết quả trả về dạng NDJSON (mỗi dòng một JSON) ngay khi từng CV được phân tích xong:
+    - {"type": "result", "index", "file", "success", "email", "phone", "skills", ...}
+    - Dòng cuối {"type": "summary", "total", "succeeded", "failed", "files_per_second", ...}
+    
+    Args:
+        files: Các file PDF hoặc ZIP (file trong ZIP được phân tích như file PDF riêng lẻ)
+        
+    Returns:
+        StreamingResponse: application/x-ndjson
+    """
+    settings = get_settings()
+    uploads: List[SpooledUpload] = []
+    items: List[BatchItem] = []
+    try:
+        for file in files:
+            name = file.filename or "unknown"
+            lower_name = name.lower()
+            if not lower_name.endswith((".pdf", ".zip")):
+                items.append(BatchItem(name, error="Chỉ chấp nhận file PDF hoặc ZIP"))
+                continue
+            is_zip = lower_name.endswith(".zip")
+            try:
+                # Ghi thẳng ra file tạm (spool_max_memory=0): có thể có hàng trăm file trong một request
+                upload = await receive_upload(
+                    file,
+                    "zip" if is_zip else "pdf",
+                    max_bytes=settings.bulk_upload_max_bytes if is_zip else settings.upload_max_bytes,
+                    spool_max_memory=0
+                )
+            except UploadRejectedError as e:
+                items.append(BatchItem(name, error=e.detail))
+                continue
+            uploads.append(upload)
+            if is_zip:
+                items.extend(await asyncio.to_thread(expand_zip, upload.path, name, settings.upload_max_bytes))
+            else:
+                items.append(BatchItem.from_upload(name, upload))
+        
+        if len(items) > settings.bulk_max_files:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Tối đa {settings.bulk_max_files} CV mỗi lần (nhận được {len(items)})"
+            )
+    except BaseException:
+        for upload in uploads:
+            upload.close()
+        raise
+    
+    logger.info("Nhận yêu cầu phân tích CV hàng loạt", extra={"files": len(files), "items": len(items)})
+    
+    async def ndjson_stream() -> AsyncIterator[str]:
+        try:
+            async for result in analyze_cv_batch(items, settings.bulk_concurrency):
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        finally:
+            for upload in uploads:
+                upload.close()
+    
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
+@router.get("/cache-stats")
+async def cv_cache_stats():
+    """Thống kê cache text và kết quả phân tích CV"""
+    return get_cv_service().get_cache_stats()
+
+
 @router.get("/test")
 async def test_cv_endpoint():
     """Test endpoint để kiểm tra CV service hoạt động"""
@@ -169,6 +398,8 @@ async def test_cv_endpoint():
         "message": "CV service is ready",
         "endpoints": {
             "upload": "/api/cv/upload - Upload và phân tích CV",
-            "recommend": "/api/cv/recommend-jobs - Upload CV và nhận gợi ý công việc"
+            "recommend": "/api/cv/recommend-jobs - Upload CV và nhận gợi ý công việc",
+            "recommend_by_profile": "/api/cv/profiles/{cv_id}/recommend-jobs - Gợi ý công việc theo hồ sơ CV đã lưu",
+            "bulk": "/api/cv/bulk-analyze - Phân tích nhiều CV (PDF/ZIP), kết quả dạng NDJSON"
         }
     }
@@ -0,0 +1,17 @@
+"""
+Metrics API routes - Xuất metrics cho Prometheus
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from services.metrics import registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, tags=["Health"])
+async def metrics():
+    """
+    Metrics theo Prometheus text format: latency từng bước (đọc PDF, vector
+    search, ghép prompt, gọi LLM), số token, cache hit/miss và lỗi theo provider/model
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,21 +1,18 @@
 """
 Vector API routes - Quản lý vector database
 """
-import re
+import asyncio
+import logging
+from typing import Dict, List, Tuple
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from services.vector_service import add_job_to_vector
+from config import get_settings
+from services.job_text import build_job_metadata, build_job_text
+from services.vector_service import add_job_to_vector, add_jobs_to_vector, delete_jobs_from_vector, get_retrieval_cache_stats
+from logging_config import should_log_payload, payload_preview
 
 router = APIRouter()
-
-
-def clean_html(html_text):
-    """Loại bỏ HTML tags và giữ lại text thuần"""
-    if not html_text:
-        return ""
-    clean = re.sub(r'<[^>]+>', '', html_text)
-    clean = re.sub(r'\s+', ' ', clean).strip()
-    return clean
+logger = logging.getLogger(__name__)
 
 
 class JobVectorRequest(BaseModel):
@@ -50,6 +47,20 @@ class JobVectorRequest(BaseModel):
         }
 
 
+class JobVectorBatchRequest(BaseModel):
+    """Request body để thêm / cập nhật / xóa nhiều công việc trong một lần gọi"""
+    jobs: List[JobVectorRequest] = []
+    delete_ids: List[str] = []
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "jobs": [JobVectorRequest.model_config["json_schema_extra"]["example"]],
+                "delete_ids": ["98", "99"]
+            }
+        }
+
+
 @router.post("/api/vector/add-job", tags=["Vector"])
 async def add_job_vector(request: JobVectorRequest):
     """
@@ -57,27 +68,104 @@ async def add_job_vector(request: JobVectorRequest):
     Backend Spring Boot sẽ gọi endpoint này khi tạo công việc mới.
     """
     try:
-        # Clean HTML từ description
-        clean_description = clean_html(request.description)
-        
-        # Ghép thông tin job thành 1 đoạn text để vector hóa
-        text = (
-            f"{request.name}: {clean_description}\n"
-            f"Địa điểm: {request.location}\n"
-            f"Lương: {request.salary}\n"
-            f"Cấp bậc: {request.level}\n"
-            f"Loại hình: {request.job_type}\n"
-            f"Kinh nghiệm: {request.years_of_experience}\n"
-            f"Ngày bắt đầu: {request.start_date}\n"
-            f"Ngày kết thúc: {request.end_date}\n"
-            f"Hình thức làm việc: {request.work_mode}"
-        )
-        print(f"\n🆕 Thêm công việc vào vector DB: {request.job_id} - {text}")
-        add_job_to_vector(request.job_id, text)
+        # Ghép thông tin job thành 1 đoạn text để vector hóa (description được clean HTML)
+        text = build_job_text(request.model_dump())
+        logger.info("Thêm công việc vào vector DB", extra={"job_id": request.job_id, "chars": len(text)})
+        if should_log_payload():
+            logger.info("Nội dung công việc", extra={"job_id": request.job_id, "payload": payload_preview(text)})
+        # Địa điểm, cấp bậc, lương, ngày hết hạn... lưu thành metadata để lọc khi tìm kiếm
+        # (nội dung không đổi so với lần trước thì không embed lại)
+        embedded = add_job_to_vector(request.job_id, text, build_job_metadata(request.model_dump()))
         return {
             "success": True, 
-            "message": f"Đã thêm công việc {request.job_id} vào vector DB",
-            "job_id": request.job_id
+            "message": (
+                f"Đã thêm công việc {request.job_id} vào vector DB" if embedded
+                else f"Công việc {request.job_id} không thay đổi nội dung, bỏ qua embed lại"
+            ),
+            "job_id": request.job_id,
+            "status": "upserted" if embedded else "unchanged"
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi thêm vào vector DB: {str(e)}")
+
+
+def _apply_job_batch(request: JobVectorBatchRequest) -> Dict:
+    """Validate, upsert và xóa các job của một batch (chạy trong thread)"""
+    items: List[Dict] = []
+    conflicts = {job.job_id for job in request.jobs} & set(request.delete_ids)
+    conflict_error = "job_id vừa được thêm vừa bị xóa trong cùng request"
+    # job_id -> (vị trí item, text, metadata); job_id trùng lặp thì bản sau cùng được ghi
+    pending: Dict[str, Tuple[int, str, Dict]] = {}
+    
+    for job in request.jobs:
+        item = {"job_id": job.job_id, "action": "upsert"}
+        if not job.job_id.strip() or not job.name.strip():
+            item.update(status="error", error="job_id và name không được để trống")
+        elif job.job_id in conflicts:
+            item.update(status="error", error=conflict_error)
+        else:
+            if job.job_id in pending:
+                items[pending[job.job_id][0]].update(status="skipped", error="Trùng job_id, dùng bản sau cùng")
+            fields = job.model_dump()
+            pending[job.job_id] = (len(items), build_job_text(fields), build_job_metadata(fields))
+        items.append(item)
+    
+    if pending:
+        result = add_jobs_to_vector([(job_id, text, metadata) for job_id, (_, text, metadata) in pending.items()])
+        failed = set(result["failed_ids"])
+        unchanged = set(result["unchanged_ids"])
+        for job_id, (index, _, _) in pending.items():
+            if job_id in failed:
+                items[index].update(status="error", error="Lỗi khi ghi vào vector DB")
+            elif job_id in unchanged:
+                items[index]["status"] = "unchanged"
+            else:
+                items[index]["status"] = "upserted"
+    
+    delete_ids = [job_id for job_id in dict.fromkeys(request.delete_ids) if job_id not in conflicts]
+    deleted = set(delete_jobs_from_vector(delete_ids))
+    for job_id in delete_ids:
+        items.append({"job_id": job_id, "action": "delete", "status": "deleted" if job_id in deleted else "not_found"})
+    for job_id in conflicts:
+        items.append({"job_id": job_id, "action": "delete", "status": "error", "error": conflict_error})
+    
+    counts = {
+        status: sum(item["status"] == status for item in items)
+        for status in ("upserted", "unchanged", "deleted", "not_found", "skipped", "error")
+    }
+    return {"success": counts["error"] == 0, **counts, "items": items}
+
+
+@router.post("/api/vector/jobs/batch", tags=["Vector"])
+async def batch_jobs_vector(request: JobVectorBatchRequest):
+    """
+    API để thêm / cập nhật / xóa nhiều công việc trong vector DB bằng một request.
+    Backend Spring Boot gọi endpoint này khi đăng hoặc sửa nhiều công việc cùng lúc:
+    các job được embed + upsert theo batch thay vì mỗi job một request.
+    
+    Mỗi job có trạng thái riêng trong `items`:
+    - upserted: đã thêm / cập nhật
+    - unchanged: nội dung giống bản đã có, không embed lại (metadata vẫn được cập nhật nếu khác)
+    - deleted / not_found: đã xóa / không có trong vector DB
+    - skipped: trùng job_id với job phía sau trong cùng request (bản sau cùng được ghi)
+    - error: không hợp lệ hoặc ghi lỗi (kèm `error`)
+    """
+    max_items = get_settings().vector_batch_max_items
+    if len(request.jobs) + len(request.delete_ids) > max_items:
+        raise HTTPException(status_code=413, detail=f"Tối đa {max_items} job mỗi request")
+    
+    logger.info(
+        "Cập nhật hàng loạt vector DB",
+        extra={"jobs": len(request.jobs), "delete_ids": len(request.delete_ids)}
+    )
+    try:
+        return await asyncio.to_thread(_apply_job_batch, request)
+    except Exception as e:
+        logger.exception("Lỗi khi cập nhật hàng loạt vector DB")
+        raise HTTPException(status_code=500, detail=f"Lỗi khi cập nhật vector DB: {str(e)}")
+
+
+@router.get("/api/vector/cache-stats", tags=["Vector"])
+async def retrieval_cache_stats():
+    """Thống kê retrieval cache của vector search"""
+    return get_retrieval_cache_stats()
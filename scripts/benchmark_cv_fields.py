@@ -0,0 +1,151 @@
+"""
+Script benchmark trích xuất email / số điện thoại / số năm kinh nghiệm từ CV
+So sánh CVFieldExtractor (một regex, quét một lần) với cách cũ (mỗi trường quét lại toàn bộ text)
+
+Cách dùng:
+    python scripts/benchmark_cv_fields.py                 # dùng bộ CV mẫu tự sinh
+    python scripts/benchmark_cv_fields.py path/to/cvs     # thư mục chứa CV (.pdf / .txt)
+    python scripts/benchmark_cv_fields.py path/to/cvs --repeat 20
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# Thêm thư mục gốc vào path để import được services và config
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.cv_field_extractor import CVFieldExtractor
+
+
+# ===== Cách trích xuất cũ (giữ nguyên để so sánh) =====
+
+def legacy_extract_email(text):
+    emails = re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text)
+    return emails[0] if emails else None
+
+
+def legacy_extract_phone(text):
+    phone_patterns = [
+        r'\+?\d{1,3}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,9}',
+        r'\d{10,11}',
+        r'\(\d{3}\)\s*\d{3}[-.\s]?\d{4}'
+    ]
+    for pattern in phone_patterns:
+        phones = re.findall(pattern, text)
+        if phones:
+            return phones[0]
+    return None
+
+
+def legacy_extract_experience_years(text):
+    patterns = [
+        r'(\d+)\+?\s*(?:years?|năm)',
+        r'(\d+)-\d+\s*(?:years?|năm)',
+    ]
+    for pattern in patterns:
+        matches = re.findall(pattern, text.lower())
+        if matches:
+            return int(matches[0])
+    return None
+
+
+def legacy_extract(text):
+    return {
+        "email": legacy_extract_email(text),
+        "phone": legacy_extract_phone(text),
+        "experience_years": legacy_extract_experience_years(text)
+    }
+
+
+# ===== Bộ CV =====
+
+def synthetic_corpus(count=200, seed=42):
+    """Sinh bộ CV mẫu (tiếng Việt / tiếng Anh, nhiều định dạng số điện thoại và kinh nghiệm)"""
+    rng = random.Random(seed)
+    phones = ["0912 345 678", "+84 912.345.678", "(+84) 987-654-321", "0987654321", "028 3822 1234", "+1 (415) 555-0123"]
+    experiences = ["{n} năm kinh nghiệm", "Kinh nghiệm: hơn {n} năm", "{n}+ years of experience", "Experience: {n}-{m} years"]
+    filler = (
+        "Phát triển và bảo trì hệ thống backend, tối ưu truy vấn cơ sở dữ liệu, "
+        "làm việc với Python, Django, Docker, AWS. Designed REST APIs serving 1M users in 2019-2021. "
+    )
+    corpus = []
+    for i in range(count):
+        n = rng.randint(1, 12)
+        corpus.append("\n".join([
+            f"Nguyễn Văn {i} - Backend Developer",
+            f"Ngày sinh: 01.02.{rng.randint(1985, 2002)}  Email: user{i}@example.com  SĐT: {rng.choice(phones)}",
+            "Học vấn: Đại học Bách Khoa Hà Nội 2016-2020, GPA 3.2/4",
+            rng.choice(experiences).format(n=n, m=n + 2),
+            filler * rng.randint(5, 40)
+        ]))
+    return corpus
+
+
+def load_corpus(directory):
+    """Đọc các CV (.pdf, .txt) trong thư mục"""
+    from services.cv_service import get_cv_service
+    cv_service = get_cv_service()
+    corpus = []
+    for path in sorted(Path(directory).rglob("*")):
+        if path.suffix.lower() == ".txt":
+            corpus.append(path.read_text(encoding="utf-8", errors="ignore"))
+        elif path.suffix.lower() == ".pdf":
+            try:
+                corpus.append(cv_service.extract_text_from_pdf(str(path)))
+            except Exception as e:
+                print(f"⚠️  Bỏ qua {path.name}: {e}")
+    return corpus
+
+
+def bench(extract, corpus, repeat):
+    """Thời gian tốt nhất (giây) để xử lý toàn bộ bộ CV"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in corpus:
+            extract(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trích xuất trường thông tin từ CV")
+    parser.add_argument("directory", nargs="?", help="Thư mục chứa CV (.pdf / .txt), bỏ trống = CV mẫu")
+    parser.add_argument("--repeat", type=int, default=10, help="Số lần chạy (lấy thời gian tốt nhất)")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.directory) if args.directory else synthetic_corpus()
+    if not corpus:
+        print("❌ Không có CV nào để benchmark")
+        return
+    total_chars = sum(len(text) for text in corpus)
+    extractor = CVFieldExtractor()
+
+    print("=" * 60)
+    print(f"📊 BENCHMARK: {len(corpus)} CV, {total_chars / 1024:.0f}KB text, {args.repeat} lần chạy")
+    print("=" * 60)
+    legacy_seconds = bench(legacy_extract, corpus, args.repeat)
+    new_seconds = bench(extractor.extract, corpus, args.repeat)
+    print(f"Cách cũ:          {legacy_seconds * 1000:8.2f} ms ({legacy_seconds / len(corpus) * 1e6:.1f} µs/CV)")
+    print(f"CVFieldExtractor: {new_seconds * 1000:8.2f} ms ({new_seconds / len(corpus) * 1e6:.1f} µs/CV)")
+    print(f"Tăng tốc:         {legacy_seconds / new_seconds:.2f}x")
+
+    # Các trường cho kết quả khác nhau giữa hai cách (để kiểm tra độ chính xác bằng mắt)
+    print("\nKhác biệt kết quả:")
+    for field in ("email", "phone", "experience_years"):
+        diffs = []
+        for text in corpus:
+            old, new = legacy_extract(text)[field], extractor.extract(text)[field]
+            if old != new:
+                diffs.append((old, new))
+        print(f"- {field}: {len(diffs)}/{len(corpus)} CV khác")
+        for old, new in diffs[:3]:
+            print(f"    cũ: {old!r:30} mới: {new!r}")
+
+
+if __name__ == "__main__":
+    main()
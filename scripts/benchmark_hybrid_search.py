@@ -0,0 +1,106 @@
+"""
+Script benchmark tìm kiếm lai (vector + BM25) so với chỉ vector search
+Đo recall@k, MRR và độ trễ p50/p95 trên dữ liệu job đang có trong vector DB
+
+Cách dùng:
+    python scripts/benchmark_hybrid_search.py                      # truy vấn sinh từ chính các job
+    python scripts/benchmark_hybrid_search.py --queries-file q.jsonl --top-k 10
+
+File truy vấn: mỗi dòng một JSON {"query": "...", "relevant": ["job_id", ...]}
+Truy vấn tự sinh (known-item): tên job + vài từ hiếm trong mô tả, job đó là kết quả đúng duy nhất
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+# Thêm thư mục gốc vào path để import được services và config
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import get_settings
+from services.job_text import index_terms
+from services.metrics import percentile
+from services.vector_service import collection, search_jobs
+
+
+def load_queries(path):
+    """Đọc bộ truy vấn từ file JSONL"""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                queries.append((item["query"], set(item["relevant"])))
+    return queries
+
+
+def known_item_queries(count, seed=42):
+    """Sinh truy vấn từ các job ngẫu nhiên: tên job + 3 từ hiếm nhất trong mô tả"""
+    data = collection.get(include=["documents"])
+    if not data["ids"]:
+        return []
+    document_frequency = Counter()
+    for document in data["documents"]:
+        document_frequency.update(set(term for term in index_terms(document) if "_" not in term))
+
+    rng = random.Random(seed)
+    queries = []
+    for index in rng.sample(range(len(data["ids"])), min(count, len(data["ids"]))):
+        document = data["documents"][index]
+        name, _, description = document.partition(":")
+        terms = [term for term in dict.fromkeys(index_terms(description)) if "_" not in term and len(term) > 2]
+        rare = sorted(terms, key=lambda term: document_frequency[term])[:3]
+        queries.append((f"{name.strip()} {' '.join(rare)}", {data["ids"][index]}))
+    return queries
+
+
+def evaluate(queries, top_k):
+    """recall@k, MRR@k và danh sách độ trễ (ms) của search_jobs với cấu hình hiện tại"""
+    recalls, reciprocal_ranks, latencies = [], [], []
+    for query, relevant in queries:
+        started = time.perf_counter()
+        ids = search_jobs(query, top_k=top_k)["ids"]
+        latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(len(relevant.intersection(ids)) / len(relevant))
+        rank = next((position for position, job_id in enumerate(ids, 1) if job_id in relevant), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    return statistics.mean(recalls), statistics.mean(reciprocal_ranks), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tìm kiếm lai vector + BM25")
+    parser.add_argument("--queries-file", help="File JSONL {query, relevant}, bỏ trống = truy vấn tự sinh")
+    parser.add_argument("--count", type=int, default=200, help="Số truy vấn tự sinh")
+    parser.add_argument("--top-k", type=int, default=5, help="Số kết quả mỗi truy vấn")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries_file) if args.queries_file else known_item_queries(args.count)
+    if not queries:
+        print("❌ Không có truy vấn nào (vector DB trống?)")
+        return
+
+    settings = get_settings()
+    # Tắt cache để đo đúng chi phí truy vấn
+    settings.retrieval_cache_enabled = False
+    # Chạy một lần trước để nạp model embedding và chỉ mục BM25
+    search_jobs(queries[0][0], top_k=args.top_k)
+
+    print("=" * 60)
+    print(f"📊 BENCHMARK: {len(queries)} truy vấn, {collection.count()} job, top_k={args.top_k}")
+    print("=" * 60)
+    for label, hybrid in (("Vector search", False), ("Hybrid (BM25)", True)):
+        settings.hybrid_search_enabled = hybrid
+        recall, mrr, latencies = evaluate(queries, args.top_k)
+        print(
+            f"{label}: recall@{args.top_k}={recall:.3f}  MRR={mrr:.3f}  "
+            f"p50={percentile(latencies, 50):.1f}ms  p95={percentile(latencies, 95):.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
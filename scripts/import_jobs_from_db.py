@@ -4,13 +4,13 @@ Kết nối với database MySQL/PostgreSQL và nạp tất cả công việc v
 """
 
 import sys
-import re
 from pathlib import Path
 
 # Thêm thư mục gốc vào path để import được services và config
 sys.path.append(str(Path(__file__).parent.parent))
 
-from services.vector_service import add_job_to_vector, check_job_exists, get_all_job_ids
+from services.job_text import build_job_metadata, build_job_text, clean_html
+from services.vector_service import add_jobs_to_vector, get_all_job_ids
 from config import get_settings
 
 # Lấy cấu hình database từ Settings
@@ -27,15 +27,6 @@ DB_CONFIG = {
 FAILED_JOBS_FILE = Path(__file__).parent / "failed_jobs.txt"
 
 
-def clean_html(html_text):
-    """Loại bỏ HTML tags và giữ lại text thuần"""
-    if not html_text:
-        return ""
-    clean = re.sub(r'<[^>]+>', '', html_text)
-    clean = re.sub(r'\s+', ' ', clean).strip()
-    return clean
-
-
 def save_failed_job(job_id: str):
     """Lưu id job bị lỗi vào file"""
     with open(FAILED_JOBS_FILE, "a", encoding="utf-8") as f:
@@ -56,6 +47,54 @@ def clear_failed_jobs_file():
         FAILED_JOBS_FILE.unlink()
 
 
+def row_to_job_text(job):
+    """Tạo text của một job (dòng từ bảng jobs) để đưa vào vector DB"""
+    return build_job_text({
+        **job,
+        "description": clean_html(job.get('description', '')) or "Không có mô tả",
+        "salary": f"{job.get('salary', ''):,}đ" if job.get('salary') else "Thỏa thuận"
+    })
+
+
+def row_to_job(job):
+    """(job_id, text, metadata) của một dòng từ bảng jobs (metadata dùng để lọc khi tìm kiếm)"""
+    return str(job.get('id', '')), row_to_job_text(job), build_job_metadata(job)
+
+
+def print_batch_progress(report):
+    """In tiến độ và throughput của từng batch upsert"""
+    status = (
+        f"❌ Lỗi: {report['error']}" if "error" in report
+        else f"{report['jobs_per_second']} job/s, {report['unchanged']} không đổi"
+    )
+    print(
+        f"📦 Batch {report['batch']}: {report['size']} job trong {report['seconds']}s "
+        f"({status}) - {report['done']}/{report['total']}"
+    )
+
+
+def upsert_jobs(pending):
+    """
+    Embed + upsert các job theo batch (kích thước theo cấu hình vector_batch_size),
+    job có nội dung không đổi so với vector DB được bỏ qua
+    
+    Args:
+        pending: Danh sách (job_id, text, metadata)
+        
+    Returns:
+        Tuple[int, List[str]]: (số job thành công kể cả job không đổi, id các job bị lỗi)
+    """
+    if not pending:
+        return 0, []
+    print(f"🚀 Upsert {len(pending)} job, mỗi batch {settings.vector_batch_size} job")
+    result = add_jobs_to_vector(pending, on_batch=print_batch_progress)
+    print(
+        f"⏱️  {result['upserted']} job embed lại, {len(result['unchanged_ids'])} job không đổi "
+        f"trong {result['seconds']}s ({result['jobs_per_second']} job/s)"
+    )
+    return result["upserted"] + len(result["unchanged_ids"]), result["failed_ids"]
+
+
 def import_jobs_from_mysql(reimport_mode=False):
     """
     Import công việc từ MySQL database
@@ -109,6 +148,7 @@ def import_jobs_from_mysql(reimport_mode=False):
             error_count = 0
             skipped_count = 0
             
+            pending = []
             for job in jobs:
                 try:
                     job_id = str(job.get('id', ''))
@@ -119,30 +159,8 @@ def import_jobs_from_mysql(reimport_mode=False):
                         print(f"⏭️  [{job_id}] Đã tồn tại, bỏ qua")
                         continue
                     
-                    name = job.get('name', '')
-                    description = clean_html(job.get('description', '')) or "Không có mô tả"
-                    location = job.get('location', '')
-                    salary = f"{job.get('salary', ''):,}đ" if job.get('salary') else "Thỏa thuận"
-                    level = job.get('level', '')
-                    job_type = job.get('job_type', '')
-                    years_of_experience = job.get('years_of_experience', '')
-                    end_date = job.get('end_date', '')
-                    start_date = job.get('start_date', '')
-                    work_mode = job.get('work_mode', '')
-                    
                     # Tạo text đầy đủ cho vector DB
-                    text = (
-                        f"{name} tại {location}. {description}. "
-                        f"Mức lương: {salary}. Cấp bậc: {level}. Loại công việc: {job_type}. "
-                        f"Kinh nghiệm: {years_of_experience}. "
-                        f"Bắt đầu: {start_date}, Kết thúc: {end_date}. "
-                        f"Hình thức làm việc: {work_mode}."
-                    )
-                    
-                    # Thêm vào vector DB
-                    add_job_to_vector(job_id, text)
-                    print(f"✅ [{job_id}] {name}")
-                    success_count += 1
+                    pending.append(row_to_job(job))
                     
                 except Exception as e:
                     print(f"❌ Lỗi khi import job {job.get('id', 'unknown')}: {e}")
@@ -150,6 +168,12 @@ def import_jobs_from_mysql(reimport_mode=False):
                     # Lưu job bị lỗi vào file
                     save_failed_job(str(job.get('id', '')))
             
+            # Thêm vào vector DB theo batch
+            success_count, failed_ids = upsert_jobs(pending)
+            error_count += len(failed_ids)
+            for job_id in failed_ids:
+                save_failed_job(job_id)
+            
             print("=" * 60)
             print(f"🎉 HOÀN TẤT!")
             print(f"   ✅ Thành công: {success_count}")
@@ -209,6 +233,7 @@ def reimport_failed_jobs_mysql():
             error_count = 0
             skipped_count = 0
             
+            pending = []
             for job_id in failed_ids:
                 try:
                     # Kiểm tra xem job đã có trong vector DB chưa
@@ -231,35 +256,17 @@ def reimport_failed_jobs_mysql():
                         print(f"⚠️  [{job_id}] Không tìm thấy trong database hoặc đã bị xóa")
                         continue
                     
-                    name = job.get('name', '')
-                    description = clean_html(job.get('description', '')) or "Không có mô tả"
-                    location = job.get('location', '')
-                    salary = f"{job.get('salary', ''):,}đ" if job.get('salary') else "Thỏa thuận"
-                    level = job.get('level', '')
-                    job_type = job.get('job_type', '')
-                    years_of_experience = job.get('years_of_experience', '')
-                    end_date = job.get('end_date', '')
-                    start_date = job.get('start_date', '')
-                    work_mode = job.get('work_mode', '')
-                    
                     # Tạo text đầy đủ cho vector DB
-                    text = (
-                        f"{name} tại {location}. {description}. "
-                        f"Mức lương: {salary}. Cấp bậc: {level}. Loại công việc: {job_type}. "
-                        f"Kinh nghiệm: {years_of_experience}. "
-                        f"Bắt đầu: {start_date}, Kết thúc: {end_date}. "
-                        f"Hình thức làm việc: {work_mode}."
-                    )
-                    
-                    # Thêm vào vector DB
-                    add_job_to_vector(job_id, text)
-                    print(f"✅ [{job_id}] {name}")
-                    success_count += 1
+                    pending.append(row_to_job(job))
                     
                 except Exception as e:
                     print(f"❌ Lỗi khi re-import job {job_id}: {e}")
                     error_count += 1
             
+            # Thêm vào vector DB theo batch
+            success_count, still_failed = upsert_jobs(pending)
+            error_count += len(still_failed)
+            
             print("=" * 60)
             print(f"🎉 HOÀN TẤT RE-IMPORT!")
             print(f"   ✅ Thành công: {success_count}")
@@ -287,7 +294,7 @@ if __name__ == "__main__":
     print("📦 IMPORT JOBS VÀO VECTOR DATABASE")
     print("=" * 60)
     print("Chọn chức năng:")
-    print("1. Import tất cả jobs từ MySQL (có thể trùng)")
+    print("1. Import tất cả jobs từ MySQL (chỉ embed lại jobs có thay đổi)")
     print("2. Import chỉ các jobs chưa có trong vector DB (MySQL)")
     print("3. Re-import các jobs bị lỗi lần trước (MySQL)")
     print("=" * 60)
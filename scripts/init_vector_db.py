@@ -2,7 +2,13 @@
 Script khởi tạo dữ liệu mẫu cho vector database
 Chạy script này một lần để nạp dữ liệu công việc ban đầu vào ChromaDB
 """
-from services.vector_service import add_job_to_vector
+import sys
+from pathlib import Path
+
+# Thêm thư mục gốc vào path để import được services và config
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.vector_service import add_jobs_to_vector
 
 # Danh sách công việc mẫu (trong thực tế nên lấy từ database)
 jobs = [
@@ -54,16 +60,25 @@ def init_vector_db():
     print("🚀 BẮT ĐẦU NẠP DỮ LIỆU VÀO VECTOR DATABASE")
     print("=" * 60)
     
+    # Embed + upsert tất cả job theo batch
+    result = add_jobs_to_vector(
+        [(job['id'], f"{job['title']}: {job['description']}") for job in jobs],
+        on_batch=lambda report: print(
+            f"📦 Batch {report['batch']}: {report['size']} job trong {report['seconds']}s"
+            + (f" ❌ Lỗi: {report['error']}" if "error" in report else f" ({report['jobs_per_second']} job/s)")
+        )
+    )
     for job in jobs:
-        try:
-            text = f"{job['title']}: {job['description']}"
-            add_job_to_vector(job['id'], text)
+        if job['id'] in result['failed_ids']:
+            print(f"❌ Lỗi khi thêm [{job['id']}] {job['title']}")
+        else:
             print(f"✅ Đã thêm: [{job['id']}] {job['title']}")
-        except Exception as e:
-            print(f"❌ Lỗi khi thêm [{job['id']}] {job['title']}: {e}")
     
     print("=" * 60)
-    print(f"🎉 HOÀN TẤT! Đã nạp {len(jobs)} công việc vào vector DB.")
+    print(
+        f"🎉 HOÀN TẤT! Đã nạp {result['upserted']}/{len(jobs)} công việc vào vector DB "
+        f"({len(result['unchanged_ids'])} công việc không đổi)."
+    )
     print("=" * 60)
 
 if __name__ == "__main__":
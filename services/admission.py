@@ -0,0 +1,230 @@
+"""
+Admission Control - Giới hạn số request đồng thời tới mỗi AI provider
+Request vượt giới hạn được xếp hàng (có giới hạn); hàng đợi đầy thì từ chối ngay
+để route trả về 429 + Retry-After thay vì để mọi request cùng timeout
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, Optional
+
+from config import get_settings
+from services.metrics import percentile
+
+
+class QueueFullError(Exception):
+    """Hàng đợi của provider đã đầy (hoặc chờ quá lâu) - client nên thử lại sau"""
+
+    # Router coi lỗi này giống 429 của provider
+    status_code = 429
+
+    def __init__(self, provider: str, retry_after: int):
+        super().__init__(f"Provider {provider} đang quá tải, vui lòng thử lại sau {retry_after}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+def _resolve(future: "asyncio.Future") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class _Waiter:
+    """Một request đang chờ slot; wake() báo cho request (async hoặc sync) biết đã được cấp slot"""
+
+    __slots__ = ("wake", "granted")
+
+    def __init__(self, wake: Callable[[], None]):
+        self.wake = wake
+        self.granted = False
+
+
+class AdmissionController:
+    """
+    Giới hạn đồng thời + hàng đợi có giới hạn cho một provider
+
+    - Tối đa max_concurrency lời gọi chạy cùng lúc
+    - Tối đa max_queue request chờ; request thứ max_queue + 1 bị từ chối ngay
+    - Request chờ quá queue_timeout giây cũng bị từ chối
+    - Lời gọi async (slot) và đồng bộ (slot_sync) dùng chung giới hạn và hàng đợi (FIFO)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 8,
+        max_queue: int = 32,
+        queue_timeout: float = 10.0,
+        window: int = 200
+    ):
+        """
+        Args:
+            name: Tên provider (dùng trong thông báo lỗi / thống kê)
+            max_concurrency: Số lời gọi đồng thời tối đa
+            max_queue: Số request chờ tối đa, 0 = không xếp hàng
+            queue_timeout: Thời gian chờ tối đa trong hàng đợi (giây)
+            window: Số mẫu giữ lại để tính thời gian chờ / thời gian gọi
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # Lock của thread (không phải asyncio) vì slot được giữ từ cả event loop lẫn thread đồng bộ
+        self._lock = threading.RLock()
+        self._waiters: Deque[_Waiter] = deque()
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_times = deque(maxlen=window)
+        self.service_times = deque(maxlen=window)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Ước lượng số giây đến khi hàng đợi rút bớt (dựa trên thời gian gọi p50)"""
+        p50 = percentile(list(self.service_times), 50) or 1.0
+        return max(1, math.ceil(p50 * (self.waiting + 1) / self.max_concurrency))
+
+    def _reject(self) -> QueueFullError:
+        with self._lock:
+            self.rejected += 1
+            return QueueFullError(self.name, self.retry_after())
+
+    def _enqueue(self, wake: Callable[[], None]) -> Optional[_Waiter]:
+        """
+        Chiếm slot ngay nếu còn trống và không ai đang chờ (trả về None),
+        không thì xếp hàng (trả về waiter)
+
+        Raises:
+            QueueFullError: Hàng đợi đầy
+        """
+        with self._lock:
+            if self.active < self.max_concurrency and not self._waiters:
+                self.active += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                raise self._reject()
+            waiter = _Waiter(wake)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Rời hàng đợi (quá hạn / bị hủy), trả về True nếu slot đã kịp được cấp cho waiter"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def _release(self) -> None:
+        """Trả slot: chuyển thẳng cho request chờ lâu nhất, không còn ai chờ thì giảm active"""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                try:
+                    waiter.wake()
+                    return
+                except RuntimeError:
+                    # Event loop của waiter đã đóng: bỏ qua, chuyển slot cho người tiếp theo
+                    continue
+            self.active -= 1
+
+    @contextmanager
+    def _hold(self, enqueued: float) -> Iterator[None]:
+        """Giữ slot đã được cấp cho tới hết khối with, ghi thời gian chờ / thời gian gọi"""
+        started = time.perf_counter()
+        with self._lock:
+            self.queue_times.append(started - enqueued)
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            self.service_times.append(time.perf_counter() - started)
+            self._release()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Chiếm một slot gọi provider trong suốt khối `async with`
+
+        Raises:
+            QueueFullError: Hàng đợi đầy hoặc chờ quá queue_timeout
+        """
+        enqueued = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        waiter = self._enqueue(lambda: loop.call_soon_threadsafe(_resolve, granted))
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(granted, timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                if not self._abandon(waiter):
+                    raise self._reject()
+            except asyncio.CancelledError:
+                if self._abandon(waiter):
+                    self._release()
+                raise
+        with self._hold(enqueued):
+            yield
+
+    @contextmanager
+    def slot_sync(self) -> Iterator[None]:
+        """
+        Phiên bản đồng bộ của slot() cho lời gọi provider chặn thread (script / CLI)
+
+        Raises:
+            QueueFullError: Hàng đợi đầy hoặc chờ quá queue_timeout
+        """
+        enqueued = time.perf_counter()
+        granted = threading.Event()
+        waiter = self._enqueue(granted.set)
+        if waiter is not None and not granted.wait(self.queue_timeout):
+            if not self._abandon(waiter):
+                raise self._reject()
+        with self._hold(enqueued):
+            yield
+
+    def stats(self) -> Dict:
+        """Thống kê slot đang dùng, hàng đợi và thời gian chờ"""
+        queue_times = list(self.queue_times)
+        p50 = percentile(queue_times, 50)
+        p95 = percentile(queue_times, 95)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_time_p50": round(p50, 3) if p50 is not None else None,
+            "queue_time_p95": round(p95, 3) if p95 is not None else None
+        }
+
+
+# Mỗi provider một controller
+_controllers: Dict[str, AdmissionController] = {}
+
+def get_admission_controller(provider: str) -> AdmissionController:
+    """Lấy AdmissionController của provider (tạo mới theo settings nếu chưa có)"""
+    controller = _controllers.get(provider)
+    if controller is None:
+        settings = get_settings()
+        controller = AdmissionController(
+            provider,
+            max_concurrency=settings.provider_concurrency_overrides.get(provider, settings.provider_max_concurrency),
+            max_queue=settings.provider_max_queue,
+            queue_timeout=settings.provider_queue_timeout
+        )
+        _controllers[provider] = controller
+    return controller
+
+
+def get_admission_stats() -> Dict:
+    """Thống kê admission control của mọi provider đã được dùng"""
+    return {name: controller.stats() for name, controller in _controllers.items()}
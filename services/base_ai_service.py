@@ -0,0 +1,431 @@
+"""
+Base AI Service - Pipeline chat dùng chung cho mọi AI provider
+(truy xuất công việc -> ghép prompt trong token budget -> cache -> gọi provider)
+
+Provider mới chỉ cần kế thừa BaseAIService và cài đặt cách xây dựng request,
+gửi request và mở stream.
+"""
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from config import get_settings
+from logging_config import should_log_payload, payload_preview
+from services.vector_service import search_jobs, search_jobs_async
+from services.cache_service import get_response_cache
+from services.prompt_builder import get_prompt_assembler, build_retrieval_query, estimate_tokens
+from services.admission import get_admission_controller
+from services.http_transport import retry_async, retry_sync
+from services.metrics import stage_duration, llm_duration, llm_tokens, llm_errors
+
+logger = logging.getLogger(__name__)
+
+
+class BaseAIService:
+    """
+    Lớp cơ sở cho các AI service
+
+    Lớp con cần đặt provider_name / display_name và cài đặt:
+    - build_request(): xây dựng request (prompt string, danh sách messages, ...)
+    - _send() / _send_async(): gửi request, trả về response thô của SDK
+    - _response_text() / _response_usage(): lấy text và số token từ response
+    - _open_stream(): mở stream, trả về async iterator các đoạn text
+    """
+
+    provider_name = ""  # Tên dùng cho admission control / router
+    display_name = ""  # Tên hiển thị trong log
+    retrieval_top_k = 3  # Số công việc truy xuất cho mỗi câu hỏi
+
+    def __init__(self, model_name: str):
+        """
+        Args:
+            model_name: Tên model của provider
+        """
+        settings = get_settings()
+        self.model_name = model_name
+        self.temperature = settings.ai_temperature
+        self.max_tokens = settings.ai_max_tokens
+        self.timeout = settings.ai_http_read_timeout
+        # Giới hạn số request đồng thời tới provider
+        self.admission = get_admission_controller(self.provider_name)
+
+    def build_request(
+        self,
+        message: str,
+        conversation_history: List[Dict],
+        jobs_info: str = "",
+        cv_text: str = "",
+        summary: str = ""
+    ) -> Any:
+        """
+        Xây dựng request gửi cho provider từ các phần đã cắt theo token budget
+
+        Args:
+            message: Tin nhắn hiện tại từ user
+            conversation_history: Lịch sử hội thoại trước đó
+            jobs_info: Thông tin công việc từ vector search
+            cv_text: Nội dung CV của người dùng (nếu có)
+            summary: Tóm tắt các lượt chat cũ (nếu có)
+        """
+        raise NotImplementedError
+
+    def describe_request(self, request: Any) -> str:
+        """Nội dung request dạng text (dùng khi log payload)"""
+        return str(request)
+
+    def _send(self, request: Any) -> Any:
+        raise NotImplementedError
+
+    async def _send_async(self, request: Any) -> Any:
+        raise NotImplementedError
+
+    def _response_text(self, response: Any) -> str:
+        raise NotImplementedError
+
+    def _response_usage(self, response: Any) -> Tuple[Optional[int], Optional[int]]:
+        """(prompt tokens, completion tokens) provider trả về, None nếu không có"""
+        return None, None
+
+    async def _open_stream(self, request: Any) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    def generate_response(self, request: Any) -> str:
+        """
+        Gọi provider để tạo response (thử lại khi timeout/429/5xx)
+
+        Args:
+            request: Request từ build_request()
+
+        Returns:
+            str: Response từ AI
+
+        Raises:
+            QueueFullError: Provider đang quá tải (hàng đợi admission control đầy)
+        """
+        # Dùng chung giới hạn đồng thời / hàng đợi với các lời gọi async
+        with self.admission.slot_sync():
+            start = time.perf_counter()
+            try:
+                response = retry_sync(lambda: self._send(request), label=self.display_name)
+            except Exception as e:
+                self._record_error(e)
+                raise
+        text = self._response_text(response)
+        self._record_call(request, text, self._response_usage(response), start)
+        return text
+
+    async def generate_response_async(
+        self,
+        request: Any,
+        on_latency: Optional[Callable[[float], None]] = None
+    ) -> str:
+        """
+        Gọi provider (async) để tạo response, không chặn event loop
+
+        Args:
+            request: Request từ build_request()
+            on_latency: Callback nhận latency (giây) của lần gọi provider thành công
+
+        Returns:
+            str: Response từ AI
+        """
+        async with self.admission.slot():
+            start = time.perf_counter()
+            try:
+                response = await retry_async(lambda: self._send_async(request), label=self.display_name)
+            except Exception as e:
+                self._record_error(e)
+                raise
+        text = self._response_text(response)
+        elapsed = self._record_call(request, text, self._response_usage(response), start)
+        if on_latency is not None:
+            on_latency(elapsed)
+        return text
+
+    async def complete_async(self, prompt: str) -> str:
+        """
+        Gửi một prompt đơn lẻ (không truy xuất công việc, không cache),
+        dùng cho tác vụ phụ như tóm tắt hội thoại
+
+        Args:
+            prompt: Nội dung yêu cầu
+
+        Returns:
+            str: Response từ AI
+        """
+        return await self.generate_response_async(self.build_request(prompt, []))
+
+    async def stream_response(
+        self,
+        request: Any,
+        on_latency: Optional[Callable[[float], None]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Gọi provider ở chế độ stream, trả về từng đoạn text ngay khi nhận được
+        (chỉ thử lại khi mở stream, không thử lại giữa chừng)
+
+        Args:
+            request: Request từ build_request()
+            on_latency: Callback nhận thời gian (giây) của cả stream khi hoàn tất
+
+        Yields:
+            str: Từng đoạn text của response
+        """
+        # Giữ slot cho tới khi stream kết thúc
+        async with self.admission.slot():
+            start = time.perf_counter()
+            chunks = []
+            try:
+                stream = await retry_async(lambda: self._open_stream(request), label=self.display_name)
+                async for token in stream:
+                    chunks.append(token)
+                    yield token
+            except Exception as e:
+                self._record_error(e)
+                raise
+            elapsed = self._record_call(request, "".join(chunks), (None, None), start)
+            if on_latency is not None:
+                on_latency(elapsed)
+
+    def _record_call(
+        self,
+        request: Any,
+        text: str,
+        usage: Tuple[Optional[int], Optional[int]],
+        start: float
+    ) -> float:
+        """Ghi metrics latency và số token của một lần gọi provider thành công, trả về latency (giây)"""
+        elapsed = time.perf_counter() - start
+        labels = {"provider": self.provider_name, "model": self.model_name}
+        llm_duration.observe(elapsed, **labels)
+        stage_duration.observe(elapsed, stage="llm")
+        # Provider không trả usage (vd: stream) thì ước lượng
+        prompt_tokens, completion_tokens = usage
+        if prompt_tokens is None:
+            prompt_tokens = estimate_tokens(self.describe_request(request))
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(text)
+        llm_tokens.observe(prompt_tokens, kind="prompt", **labels)
+        llm_tokens.observe(completion_tokens, kind="completion", **labels)
+        return elapsed
+
+    def _record_error(self, exc: BaseException) -> None:
+        llm_errors.inc(provider=self.provider_name, model=self.model_name, error=type(exc).__name__)
+
+    def build_prompt(
+        self,
+        message: str,
+        conversation_history: List[Dict],
+        jobs: List[str],
+        cv_text: str = "",
+        summary: str = ""
+    ) -> Tuple[Any, Dict]:
+        """
+        Ghép request trong giới hạn token budget (xem PromptAssembler)
+
+        Args:
+            message: Tin nhắn từ user
+            conversation_history: Lịch sử hội thoại (có thể None)
+            jobs: Danh sách mô tả công việc từ vector search
+            cv_text: Nội dung CV (nếu có)
+            summary: Tóm tắt các lượt chat cũ (nếu có)
+
+        Returns:
+            Tuple[Any, Dict]: (request, kết quả phân bổ token budget)
+        """
+        start = time.perf_counter()
+        assembled = get_prompt_assembler().assemble(message, conversation_history, jobs, cv_text, summary)
+        logger.info(
+            "Prompt ~%d/%d tokens", assembled["token_count"], assembled["budget"],
+            extra={
+                "jobs": len(assembled["jobs"]),
+                "history_messages": len(assembled["history"]),
+                "cv_chars": len(assembled["cv_text"])
+            }
+        )
+        jobs_info = "\n".join([f"- {job}" for job in assembled["jobs"]])
+
+        request = self.build_request(
+            assembled["message"],
+            assembled["history"],
+            jobs_info,
+            assembled["cv_text"],
+            assembled["summary"]
+        )
+        stage_duration.observe(time.perf_counter() - start, stage="prompt_build")
+        return request, assembled
+
+    def _finish_prepare(
+        self,
+        message: str,
+        conversation_history: List[Dict],
+        jobs: Dict[str, List],
+        cv_text: str,
+        summary: str
+    ) -> Tuple[Any, List[str], str]:
+        """Ghép prompt từ kết quả truy xuất và tạo cache key tương ứng"""
+        request, assembled = self.build_prompt(message, conversation_history, jobs["documents"], cv_text, summary)
+        cache_key = get_response_cache().make_key(
+            message, jobs["ids"], assembled["history"], self.model_name, self.temperature,
+            cv_text=assembled["cv_text"], summary=assembled["summary"]
+        )
+        return request, jobs["ids"], cache_key
+
+    def prepare_request(
+        self,
+        message: str,
+        conversation_history: List[Dict] = None,
+        cv_text: str = "",
+        summary: str = ""
+    ) -> Tuple[Any, List[str], str]:
+        """
+        Truy xuất công việc liên quan và xây dựng request gửi cho AI
+
+        Args:
+            message: Tin nhắn từ user
+            conversation_history: Lịch sử hội thoại (optional)
+            cv_text: Nội dung CV (nếu có)
+            summary: Tóm tắt các lượt chat cũ (nếu có)
+
+        Returns:
+            Tuple[Any, List[str], str]: (request, ID các công việc đã truy xuất, cache key)
+        """
+        jobs = search_jobs(build_retrieval_query(message, cv_text), top_k=self.retrieval_top_k)
+        return self._finish_prepare(message, conversation_history, jobs, cv_text, summary)
+
+    async def prepare_request_async(
+        self,
+        message: str,
+        conversation_history: List[Dict] = None,
+        cv_text: str = "",
+        summary: str = ""
+    ) -> Tuple[Any, List[str], str]:
+        """Phiên bản async của prepare_request (vector search chạy ngoài event loop)"""
+        jobs = await search_jobs_async(build_retrieval_query(message, cv_text), top_k=self.retrieval_top_k)
+        return self._finish_prepare(message, conversation_history, jobs, cv_text, summary)
+
+    def _log_exchange(self, request: Any, response: str, started: float) -> None:
+        """Log tóm tắt mỗi lượt chat; nội dung prompt / câu trả lời chỉ log theo tỉ lệ lấy mẫu"""
+        extra = {
+            "provider": self.provider_name,
+            "model": self.model_name,
+            "response_chars": len(response or ""),
+            "elapsed": round(time.perf_counter() - started, 3)
+        }
+        if should_log_payload():
+            extra["prompt"] = payload_preview(self.describe_request(request))
+            extra["response"] = payload_preview(response or "")
+        logger.info("Chat với %s hoàn tất", self.display_name, extra=extra)
+
+    def chat(
+        self,
+        message: str,
+        conversation_history: List[Dict] = None,
+        cv_text: str = "",
+        summary: str = ""
+    ) -> str:
+        """
+        Method chính để chat với AI (đồng bộ, dùng cho script/CLI)
+
+        Args:
+            message: Tin nhắn từ user
+            conversation_history: Lịch sử hội thoại (optional)
+            cv_text: Nội dung CV người dùng gửi kèm (optional)
+            summary: Tóm tắt các lượt chat cũ của session (optional)
+
+        Returns:
+            str: Response từ AI
+        """
+        started = time.perf_counter()
+        cache = get_response_cache()
+        # Version trước khi truy xuất: job bị ghi lại sau thời điểm này thì câu trả lời không được cache
+        version = cache.current_version()
+        request, job_ids, cache_key = self.prepare_request(message, conversation_history, cv_text, summary)
+
+        ai_response = cache.get_or_generate(
+            cache_key,
+            job_ids,
+            lambda: self.generate_response(request),
+            version=version
+        )
+
+        self._log_exchange(request, ai_response, started)
+        return ai_response
+
+    async def chat_async(
+        self,
+        message: str,
+        conversation_history: List[Dict] = None,
+        cv_text: str = "",
+        summary: str = "",
+        on_latency: Optional[Callable[[float], None]] = None
+    ) -> str:
+        """
+        Phiên bản async của chat() - dùng trong các route FastAPI
+
+        Args:
+            message: Tin nhắn từ user
+            conversation_history: Lịch sử hội thoại (optional)
+            cv_text: Nội dung CV người dùng gửi kèm (optional)
+            summary: Tóm tắt các lượt chat cũ của session (optional)
+            on_latency: Callback nhận latency của provider, chỉ được gọi khi request này
+                        thực sự gọi provider (không gọi khi cache hit hoặc dùng chung kết quả)
+
+        Returns:
+            str: Response từ AI
+        """
+        started = time.perf_counter()
+        cache = get_response_cache()
+        version = cache.current_version()
+        request, job_ids, cache_key = await self.prepare_request_async(message, conversation_history, cv_text, summary)
+
+        ai_response = await cache.get_or_generate_async(
+            cache_key,
+            job_ids,
+            lambda: self.generate_response_async(request, on_latency),
+            version=version
+        )
+
+        self._log_exchange(request, ai_response, started)
+        return ai_response
+
+    async def chat_stream(
+        self,
+        message: str,
+        conversation_history: List[Dict] = None,
+        cv_text: str = "",
+        summary: str = "",
+        on_latency: Optional[Callable[[float], None]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Giống chat_async() nhưng trả về từng đoạn response ngay khi provider sinh ra
+
+        Args:
+            message: Tin nhắn từ user
+            conversation_history: Lịch sử hội thoại (optional)
+            cv_text: Nội dung CV người dùng gửi kèm (optional)
+            summary: Tóm tắt các lượt chat cũ của session (optional)
+            on_latency: Callback nhận latency của provider (không gọi khi cache hit)
+
+        Yields:
+            str: Từng đoạn text của response
+        """
+        started = time.perf_counter()
+        cache = get_response_cache()
+        version = cache.current_version()
+        request, job_ids, cache_key = await self.prepare_request_async(message, conversation_history, cv_text, summary)
+
+        # Cache hit: trả về cả câu trả lời trong một lần
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        start = time.perf_counter()
+        chunks = []
+        async for token in self.stream_response(request, on_latency):
+            chunks.append(token)
+            yield token
+        response = "".join(chunks)
+        cache.set(cache_key, response, job_ids, time.perf_counter() - start, version=version)
+        self._log_exchange(request, response, started)
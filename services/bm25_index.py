@@ -0,0 +1,201 @@
+"""
+BM25 Index - Chỉ mục từ khóa (inverted index + BM25) cho mô tả công việc
+Bổ sung cho vector search: các từ khóa chính xác ("Spring Boot", "ReactJS", "Đà Nẵng")
+mà embedding mặc định hay bỏ sót. Chỉ mục nằm trong bộ nhớ, lưu xuống SQLite theo từng job
+thay đổi (không ghi lại toàn bộ) và tự nạp lại khi process khác (script import) ghi vào.
+Chỉ mục lưu kèm TOKENIZER_VERSION, khác version hiện tại thì cần xây lại (xem needs_rebuild)
+"""
+import heapq
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from services.job_text import TOKENIZER_VERSION, index_terms
+
+logger = logging.getLogger(__name__)
+
+
+class BM25Index:
+    """Inverted index với điểm Okapi BM25"""
+
+    def __init__(self, db_path: str = "", k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            db_path: File SQLite để lưu chỉ mục, rỗng = chỉ lưu trong bộ nhớ
+            k1: Độ bão hòa tần suất term
+            b: Mức chuẩn hóa theo độ dài văn bản
+        """
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._docs: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        # Version tokenizer đã tạo ra các term trong chỉ mục, None = chưa xây
+        self._tokenizer_version: Optional[str] = None
+        self._db = None
+        self._db_version = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS bm25_docs ("
+                "job_id TEXT PRIMARY KEY, terms TEXT NOT NULL, length INTEGER NOT NULL)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS bm25_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.commit()
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @property
+    def needs_rebuild(self) -> bool:
+        """Chỉ mục chưa từng được xây, bị đánh dấu hỏng hoặc được tạo bằng tokenizer khác"""
+        self._refresh_if_changed()
+        return self._tokenizer_version != str(TOKENIZER_VERSION)
+
+    def _clear(self) -> None:
+        self._docs.clear()
+        self._lengths.clear()
+        self._postings.clear()
+        self._total_length = 0
+
+    def _load(self) -> None:
+        """Nạp toàn bộ chỉ mục từ SQLite (xây lại posting list trong bộ nhớ)"""
+        with self._lock:
+            self._clear()
+            row = self._db.execute("SELECT value FROM bm25_meta WHERE key = 'tokenizer_version'").fetchone()
+            self._tokenizer_version = row[0] if row else None
+            # Term tạo bằng tokenizer khác không khớp với query, bỏ qua cho tới khi xây lại
+            if self._tokenizer_version == str(TOKENIZER_VERSION):
+                for job_id, terms, length in self._db.execute("SELECT job_id, terms, length FROM bm25_docs"):
+                    self._add(job_id, json.loads(terms), length)
+            self._db_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        logger.info(
+            "Đã nạp chỉ mục BM25",
+            extra={"documents": len(self._docs), "tokenizer_version": self._tokenizer_version}
+        )
+
+    def _refresh_if_changed(self) -> None:
+        """Nạp lại nếu process khác đã ghi vào file SQLite (data_version chỉ đổi khi kết nối khác commit)"""
+        if self._db is None:
+            return
+        with self._lock:
+            if self._db.execute("PRAGMA data_version").fetchone()[0] != self._db_version:
+                self._load()
+
+    def _add(self, job_id: str, terms: Dict[str, int], length: int) -> None:
+        self._docs[job_id] = terms
+        self._lengths[job_id] = length
+        self._total_length += length
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[job_id] = frequency
+
+    def _remove(self, job_id: str) -> bool:
+        terms = self._docs.pop(job_id, None)
+        if terms is None:
+            return False
+        self._total_length -= self._lengths.pop(job_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[job_id]
+            if not postings:
+                del self._postings[term]
+        return True
+
+    def upsert(self, documents: Iterable[Tuple[str, str]], commit: bool = True) -> None:
+        """
+        Thêm hoặc cập nhật văn bản trong chỉ mục
+
+        Args:
+            documents: Danh sách (job_id, text)
+            commit: Commit SQLite ngay (False khi nằm trong giao dịch của rebuild)
+        """
+        rows = []
+        with self._lock:
+            for job_id, text in documents:
+                terms = index_terms(text)
+                frequencies = dict(Counter(terms))
+                self._remove(job_id)
+                self._add(job_id, frequencies, len(terms))
+                rows.append((job_id, json.dumps(frequencies, ensure_ascii=False), len(terms)))
+            if self._db is not None and rows:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO bm25_docs (job_id, terms, length) VALUES (?, ?, ?)", rows
+                )
+                if commit:
+                    self._db.commit()
+
+    def rebuild(self, documents: Iterable[Tuple[str, str]]) -> None:
+        """
+        Xây lại toàn bộ chỉ mục bằng tokenizer hiện tại (thay thế mọi văn bản cũ)
+
+        Args:
+            documents: Tất cả (job_id, text) đang có trong vector DB
+        """
+        with self._lock:
+            self._clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM bm25_docs")
+            self.upsert(documents, commit=False)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO bm25_meta (key, value) VALUES ('tokenizer_version', ?)",
+                    (str(TOKENIZER_VERSION),)
+                )
+                self._db.commit()
+            self._tokenizer_version = str(TOKENIZER_VERSION)
+
+    def invalidate(self) -> None:
+        """Đánh dấu chỉ mục cần xây lại (vd: ghi vào chỉ mục lỗi nên không còn khớp với vector DB)"""
+        with self._lock:
+            self._tokenizer_version = None
+            if self._db is not None:
+                self._db.execute("DELETE FROM bm25_meta WHERE key = 'tokenizer_version'")
+                self._db.commit()
+
+    def delete(self, job_ids: Iterable[str]) -> None:
+        """Xóa văn bản khỏi chỉ mục"""
+        with self._lock:
+            removed = [(job_id,) for job_id in job_ids if self._remove(job_id)]
+            if self._db is not None and removed:
+                self._db.executemany("DELETE FROM bm25_docs WHERE job_id = ?", removed)
+                self._db.commit()
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Tìm văn bản theo từ khóa
+
+        Args:
+            query: Câu truy vấn
+            top_k: Số kết quả tối đa
+
+        Returns:
+            List[Tuple[str, float]]: (job_id, điểm BM25) theo điểm giảm dần
+        """
+        self._refresh_if_changed()
+        with self._lock:
+            count = len(self._docs)
+            if not count:
+                return []
+            average_length = self._total_length / count
+            scores: Dict[str, float] = {}
+            for term in set(index_terms(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                frequency = len(postings)
+                idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+                for job_id, term_frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[job_id] / average_length)
+                    scores[job_id] = scores.get(job_id, 0.0) + idf * term_frequency * (self.k1 + 1) / (term_frequency + norm)
+        # Cùng điểm thì xếp theo id để kết quả ổn định
+        return heapq.nsmallest(top_k, scores.items(), key=lambda item: (-item[1], item[0]))
+
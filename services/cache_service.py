@@ -0,0 +1,350 @@
+"""
+Cache Service - Cache in-process cho câu trả lời AI
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+from config import get_settings
+from services.singleflight import AsyncSingleFlight, SingleFlight
+from services.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Cache LRU có giới hạn số phần tử và TTL (thread-safe)
+
+    Phần tử ít được dùng nhất bị loại khi cache đầy; phần tử quá TTL
+    được coi như không tồn tại và bị xóa khi truy cập.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        ttl_seconds: Optional[float] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        """
+        Args:
+            max_size: Số phần tử tối đa
+            ttl_seconds: Thời gian sống của mỗi phần tử (None = không hết hạn)
+            on_evict: Callback gọi khi một phần tử bị loại (hết hạn, đầy cache, xóa)
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Lấy giá trị theo key, trả về default nếu không có hoặc đã hết hạn"""
+        evicted = None
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                self.evictions += 1
+                evicted = (key, value)
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+        self._notify_evict([evicted])
+        return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Thêm hoặc cập nhật một phần tử"""
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        evicted = []
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = (value, expires_at)
+            while len(self._data) > self.max_size:
+                old_key, (old_value, _) = self._data.popitem(last=False)
+                self.evictions += 1
+                evicted.append((old_key, old_value))
+        self._notify_evict(evicted)
+
+    def delete(self, key: Hashable) -> bool:
+        """Xóa một phần tử, trả về True nếu phần tử tồn tại"""
+        with self._lock:
+            item = self._data.pop(key, None)
+        if item is None:
+            return False
+        self._notify_evict([(key, item[0])])
+        return True
+
+    def clear(self) -> None:
+        """Xóa toàn bộ cache"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _notify_evict(self, items: List[tuple]) -> None:
+        # Gọi callback ngoài lock để tránh deadlock nếu callback truy cập cache
+        if self.on_evict:
+            for key, value in items:
+                self.on_evict(key, value)
+
+
+def normalize_message(message: str) -> str:
+    """
+    Chuẩn hóa tin nhắn để các câu gần giống nhau dùng chung cache
+    (Unicode NFC, chữ thường, gộp khoảng trắng, bỏ dấu câu cuối câu)
+    """
+    text = unicodedata.normalize("NFC", message).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" .!?…")
+
+
+class ResponseCache:
+    """
+    Cache câu trả lời AI theo (message chuẩn hóa, job IDs truy xuất được,
+    lịch sử đã cắt, CV, model, temperature).
+
+    Khi một job được upsert lại vào vector DB, mọi câu trả lời đã trích dẫn
+    job đó bị xóa khỏi cache. Câu trả lời được sinh từ dữ liệu trước một lần ghi
+    (version dữ liệu đã đổi khi sinh xong) không được lưu.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        ttl_seconds: Optional[float] = 3600,
+        enabled: bool = True,
+        version_source: Optional[Callable[[], int]] = None
+    ):
+        """
+        Args:
+            max_size: Số câu trả lời tối đa
+            ttl_seconds: Thời gian sống của mỗi câu trả lời
+            enabled: Bật / tắt cache
+            version_source: Hàm trả về version dữ liệu vector DB (tăng sau mỗi lần ghi)
+        """
+        self.enabled = enabled
+        self._version_source = version_source
+        self._cache = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds, on_evict=self._on_evict)
+        # job_id -> tập các cache key đã dùng job đó
+        self._job_index: Dict[str, Set[str]] = {}
+        # RLock: _cache.set() / delete() gọi _on_evict (cũng lấy lock này) trong cùng thread
+        self._index_lock = threading.RLock()
+        self.stale_skipped = 0
+        self.saved_latency = 0.0
+        # Gộp các request giống hệt nhau đang chờ LLM trả lời
+        self._inflight = AsyncSingleFlight()
+        self._inflight_sync = SingleFlight()
+
+    @staticmethod
+    def make_key(
+        message: str,
+        job_ids: List[str],
+        conversation_history: List[Dict],
+        model: str,
+        temperature: float,
+        cv_text: str = "",
+        summary: str = ""
+    ) -> str:
+        """
+        Tạo cache key
+
+        Args:
+            message: Tin nhắn từ user
+            job_ids: ID các công việc đã truy xuất (theo thứ tự)
+            conversation_history: Lịch sử hội thoại đã cắt gửi kèm prompt
+            model: Tên model
+            temperature: Temperature của model
+            cv_text: Trích đoạn CV đưa vào prompt (nếu có)
+            summary: Tóm tắt hội thoại cũ đưa vào prompt (nếu có)
+
+        Returns:
+            str: SHA-256 hex digest
+        """
+        history = [(msg.get("role", ""), msg.get("content", "")) for msg in conversation_history or []]
+        history_hash = hashlib.sha256(
+            json.dumps([summary, history], ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        cv_hash = hashlib.sha256(cv_text.encode("utf-8")).hexdigest() if cv_text else ""
+        raw = json.dumps(
+            [normalize_message(message), list(job_ids), history_hash, cv_hash, model, temperature],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Lấy câu trả lời đã cache, cộng dồn latency tiết kiệm được nếu hit"""
+        if not self.enabled:
+            return None
+        entry = self._cache.get(key)
+        record_cache("response", entry is not None)
+        if entry is None:
+            return None
+        with self._index_lock:
+            self.saved_latency += entry["latency"]
+        logger.info("Response cache hit", extra={"saved_latency": round(entry["latency"], 3)})
+        return entry["response"]
+
+    def current_version(self) -> Optional[int]:
+        """Version dữ liệu vector DB hiện tại (None nếu không theo dõi version)"""
+        return self._version_source() if self._version_source else None
+
+    def set(
+        self,
+        key: str,
+        response: str,
+        job_ids: List[str],
+        latency: float,
+        version: Optional[int] = None
+    ) -> None:
+        """
+        Lưu câu trả lời vào cache
+
+        Args:
+            key: Cache key từ make_key()
+            response: Câu trả lời của AI
+            job_ids: ID các công việc được trích dẫn trong prompt
+            latency: Thời gian (giây) đã tốn để sinh câu trả lời
+            version: current_version() lúc bắt đầu truy xuất / sinh câu trả lời;
+                     vector DB đã bị ghi kể từ đó thì không lưu (job có thể đã đổi)
+        """
+        if not self.enabled or not response:
+            return
+        # Kiểm tra version và ghi trong cùng lock với invalidate_jobs: lần ghi vector DB
+        # xảy ra sau lúc kiểm tra sẽ luôn xóa được câu trả lời này
+        with self._index_lock:
+            if version is not None and version != self.current_version():
+                self.stale_skipped += 1
+                logger.info("Bỏ qua lưu cache: vector DB đã thay đổi trong lúc sinh câu trả lời")
+                return
+            # Cập nhật index trước để on_evict luôn tìm thấy key cần dọn
+            for job_id in job_ids:
+                self._job_index.setdefault(job_id, set()).add(key)
+            self._cache.set(key, {"response": response, "job_ids": list(job_ids), "latency": latency})
+
+    async def get_or_generate_async(
+        self,
+        key: str,
+        job_ids: List[str],
+        generate: Callable[[], Awaitable[str]],
+        version: Optional[int] = None
+    ) -> str:
+        """
+        Trả về câu trả lời đã cache, nếu chưa có thì gọi generate() và lưu lại.
+        Các request cùng key đến khi generate() đang chạy sẽ dùng chung kết quả.
+
+        version: current_version() lúc truy xuất công việc (None = lấy lúc bắt đầu generate())
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        async def generate_and_store() -> str:
+            start_version = self.current_version() if version is None else version
+            start = time.perf_counter()
+            response = await generate()
+            self.set(key, response, job_ids, time.perf_counter() - start, version=start_version)
+            return response
+
+        return await self._inflight.do(key, generate_and_store)
+
+    def get_or_generate(
+        self,
+        key: str,
+        job_ids: List[str],
+        generate: Callable[[], str],
+        version: Optional[int] = None
+    ) -> str:
+        """Phiên bản đồng bộ của get_or_generate_async"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        def generate_and_store() -> str:
+            start_version = self.current_version() if version is None else version
+            start = time.perf_counter()
+            response = generate()
+            self.set(key, response, job_ids, time.perf_counter() - start, version=start_version)
+            return response
+
+        return self._inflight_sync.do(key, generate_and_store)
+
+    def invalidate_jobs(self, job_ids: List[str]) -> int:
+        """
+        Xóa mọi câu trả lời đã trích dẫn một trong các job_ids
+
+        Returns:
+            int: Số câu trả lời bị xóa
+        """
+        with self._index_lock:
+            keys = set()
+            for job_id in job_ids:
+                keys |= self._job_index.pop(job_id, set())
+            removed = sum(1 for key in keys if self._cache.delete(key))
+        if removed:
+            logger.info("Đã xóa %d câu trả lời cache liên quan tới job %s", removed, ", ".join(job_ids))
+        return removed
+
+    def _on_evict(self, key: str, entry: Dict) -> None:
+        # Dọn job index để index không phình ra theo các key đã bị loại
+        with self._index_lock:
+            for job_id in entry["job_ids"]:
+                keys = self._job_index.get(job_id)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._job_index[job_id]
+
+    def stats(self) -> Dict:
+        """Thống kê hit rate và latency tiết kiệm được"""
+        hits, misses = self._cache.hits, self._cache.misses
+        total = hits + misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._cache),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "evictions": self._cache.evictions,
+            "coalesced": self._inflight.shared + self._inflight_sync.shared,
+            "stale_skipped": self.stale_skipped,
+            "saved_latency_seconds": round(self.saved_latency, 3)
+        }
+
+
+# Singleton instance
+_response_cache = None
+
+def get_response_cache() -> ResponseCache:
+    """Lấy singleton instance của ResponseCache"""
+    global _response_cache
+    if _response_cache is None:
+        # Import muộn vì vector_service cũng dùng LRUCache của module này
+        from services.vector_service import get_data_version, register_job_update_listener
+        settings = get_settings()
+        _response_cache = ResponseCache(
+            max_size=settings.response_cache_max_size,
+            ttl_seconds=settings.response_cache_ttl,
+            enabled=settings.response_cache_enabled,
+            version_source=get_data_version
+        )
+        # Tự động invalidate khi job được upsert lại vào vector DB
+        register_job_update_listener(_response_cache.invalidate_jobs)
+    return _response_cache
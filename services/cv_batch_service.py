@@ -0,0 +1,165 @@
+"""
+CV Batch Service - Phân tích nhiều CV trong một request (nhà tuyển dụng upload hàng loạt)
+Các CV được phân tích song song (tối đa bulk_concurrency CV cùng lúc, phần đọc PDF chạy
+trong process pool), kết quả của từng file được trả về ngay khi xong
+"""
+import asyncio
+import logging
+import os
+import time
+import zipfile
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from services.cv_service import get_cv_service
+from services.pdf_extractor import PdfSource
+from services.upload_service import PDF_MAGIC, PDF_MAGIC_WINDOW, SpooledUpload, format_size
+
+logger = logging.getLogger(__name__)
+
+
+class BatchItem:
+    """Một CV cần phân tích: tên hiển thị và hàm đọc nội dung (chạy trong thread)"""
+
+    def __init__(
+        self,
+        name: str,
+        load: Optional[Callable[[], Tuple[PdfSource, Optional[str]]]] = None,
+        error: Optional[str] = None
+    ):
+        """
+        Args:
+            name: Tên file (file trong ZIP có dạng "archive.zip/cv.pdf")
+            load: Hàm trả về (nội dung hoặc đường dẫn PDF, SHA-256 nếu đã biết)
+            error: Lỗi đã biết trước (file bị từ chối), khi đó không phân tích
+        """
+        self.name = name
+        self.load = load
+        self.error = error
+
+    @classmethod
+    def from_upload(cls, name: str, upload: SpooledUpload) -> "BatchItem":
+        """Item từ file PDF đã nhận (SHA-256 đã được tính khi nhận file)"""
+        return cls(name, load=lambda: (upload.source, upload.digest))
+
+
+def _read_zip_member(path: str, member: str, max_bytes: int) -> Tuple[bytes, None]:
+    with zipfile.ZipFile(path) as archive, archive.open(member) as f:
+        # Đọc tối đa max_bytes + 1: không tin file_size trong header (ZIP bomb)
+        data = f.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ValueError(f"File vượt quá {format_size(max_bytes)}")
+    if PDF_MAGIC not in data[:PDF_MAGIC_WINDOW]:
+        raise ValueError("File không phải PDF hợp lệ")
+    return data, None
+
+
+def expand_zip(path: str, archive_name: str, max_bytes: int) -> List[BatchItem]:
+    """
+    Liệt kê các CV trong file ZIP (chỉ đọc danh mục, nội dung được đọc khi phân tích)
+
+    Args:
+        path: Đường dẫn file ZIP đã nhận
+        archive_name: Tên file ZIP (dùng làm tiền tố tên các file bên trong)
+        max_bytes: Dung lượng tối đa của mỗi file PDF sau khi giải nén
+
+    Returns:
+        List[BatchItem]: Mỗi file trong ZIP là một item (file không hợp lệ có sẵn error)
+    """
+    try:
+        with zipfile.ZipFile(path) as archive:
+            infos = archive.infolist()
+    except zipfile.BadZipFile as e:
+        return [BatchItem(archive_name, error=f"File ZIP không hợp lệ: {str(e)}")]
+
+    items = []
+    for info in infos:
+        base_name = os.path.basename(info.filename)
+        # Bỏ qua thư mục và file rác do macOS tạo khi nén
+        if info.is_dir() or info.filename.startswith("__MACOSX/") or base_name.startswith("._"):
+            continue
+        name = f"{archive_name}/{info.filename}"
+        if not base_name.lower().endswith(".pdf"):
+            items.append(BatchItem(name, error="Chỉ chấp nhận file PDF"))
+        elif info.file_size > max_bytes:
+            items.append(BatchItem(name, error=f"File vượt quá {format_size(max_bytes)}"))
+        else:
+            items.append(BatchItem(name, load=partial(_read_zip_member, path, info.filename, max_bytes)))
+    return items
+
+
+async def _analyze_item(index: int, item: BatchItem) -> Dict:
+    started = time.perf_counter()
+    result = {"type": "result", "index": index, "file": item.name, "success": False}
+    try:
+        if item.error:
+            raise ValueError(item.error)
+        source, digest = await asyncio.to_thread(item.load)
+        result["bytes"] = len(source) if isinstance(source, bytes) else os.path.getsize(source)
+        analysis = await get_cv_service().analyze_cv_async(source, digest=digest)
+        if analysis.get("success"):
+            result.update(
+                success=True,
+                email=analysis.get("email"),
+                phone=analysis.get("phone"),
+                skills=analysis.get("skills", []),
+                experience_years=analysis.get("experience_years"),
+                field_confidence=analysis.get("field_confidence")
+            )
+        else:
+            result["error"] = analysis.get("error", "Không thể phân tích CV")
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+async def analyze_cv_batch(items: List[BatchItem], concurrency: int = 4) -> AsyncIterator[Dict]:
+    """
+    Phân tích nhiều CV song song, trả về kết quả theo thứ tự hoàn thành
+
+    Args:
+        items: Danh sách CV cần phân tích
+        concurrency: Số CV được phân tích cùng lúc
+
+    Yields:
+        Dict: {"type": "result", ...} cho từng file, cuối cùng là {"type": "summary", ...}
+              với số file thành công / lỗi và throughput
+    """
+    started = time.perf_counter()
+    results: asyncio.Queue = asyncio.Queue()
+    pending = iter(enumerate(items))
+
+    async def worker():
+        # Các worker dùng chung một iterator: next() không await nên không bị tranh chấp
+        for index, item in pending:
+            await results.put(await _analyze_item(index, item))
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    succeeded = 0
+    total_bytes = 0
+    try:
+        for _ in range(len(items)):
+            result = await results.get()
+            succeeded += result["success"]
+            total_bytes += result.get("bytes", 0)
+            yield result
+    finally:
+        # Client ngắt kết nối giữa chừng: dừng các worker còn lại
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "type": "summary",
+        "total": len(items),
+        "succeeded": succeeded,
+        "failed": len(items) - succeeded,
+        "elapsed_seconds": round(elapsed, 3),
+        "files_per_second": round(len(items) / elapsed, 2) if elapsed > 0 else None,
+        "megabytes_per_second": round(total_bytes / (1024 * 1024) / elapsed, 2) if elapsed > 0 else None,
+        "concurrency": len(workers)
+    }
+    logger.info("Đã phân tích CV hàng loạt", extra={key: value for key, value in summary.items() if key != "type"})
+    yield summary
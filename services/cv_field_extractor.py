@@ -0,0 +1,100 @@
+"""
+CV Field Extractor - Trích xuất email, số điện thoại, số năm kinh nghiệm từ text CV
+Tất cả pattern được gộp thành một regex biên dịch sẵn, text được quét đúng một lần
+(không lowercase, không quét lại cho từng trường), mỗi trường kèm độ tin cậy (0-1)
+"""
+import re
+import unicodedata
+from typing import Dict, Optional, Tuple
+
+# Số năm kinh nghiệm lớn hơn giá trị này coi như nhầm (năm sinh, số liệu khác)
+MAX_EXPERIENCE_YEARS = 50
+
+_EXPERIENCE_WORDS = r"(?:kinh\s+nghiệm|experience|exp\b)"
+_YEARS = r"(?:năm|years?|yrs?)\b"
+# "3", "3+", "2-3", "2 - 3" (lấy số đầu tiên của khoảng)
+_YEAR_COUNT = r"\b(?P<{name}>\d{{1,2}})(?:\s*[-–]\s*\d{{1,2}})?\s*\+?\s*"
+
+# Thứ tự nhánh quan trọng: tại cùng vị trí, email được khớp trước nên chữ số trong email
+# không bị nhận nhầm là số điện thoại
+_FIELDS_RE = re.compile(
+    "|".join((
+        # Email
+        r"(?P<email>\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b)",
+        # Số điện thoại Việt Nam: +84 / 84 / (+84) / 0 + 9-10 chữ số, cho phép dấu cách . -
+        r"(?P<vn_phone>(?:\(?\+84\)?|\b0084|\b84(?=[\s.-]?[35789]))[\s.-]?(?:\(0\)[\s.-]?)?[1-9](?:[\s.-]?\d){8}\b"
+        r"|\b0[1-9](?:[\s.-]?\d){8,9}\b)",
+        # Số điện thoại quốc tế / dạng (xxx) xxx-xxxx
+        r"(?P<intl_phone>\+\d{1,3}[\s.-]?\(?\d{1,4}\)?(?:[\s.-]?\d){6,11}\b|\(\d{3}\)\s*\d{3}[\s.-]?\d{4}\b)",
+        # "kinh nghiệm: hơn 3 năm", "experience: 5+ years"
+        _EXPERIENCE_WORDS + r"\s*:?\s*(?:(?:hơn|trên|khoảng|gần|over|more\s+than|about|nearly)\s+)?"
+        + _YEAR_COUNT.format(name="exp_after") + _YEARS,
+        # "3 năm kinh nghiệm", "5+ years of experience", "2-3 years' experience"
+        _YEAR_COUNT.format(name="exp_before") + _YEARS + r"'?\s*(?:of\s+)?" + _EXPERIENCE_WORDS,
+        # "5 years", "3 năm" (không có chữ "kinh nghiệm" đi kèm)
+        _YEAR_COUNT.format(name="exp_bare") + _YEARS,
+    )),
+    re.IGNORECASE
+)
+
+# Nhánh regex -> (trường, độ tin cậy)
+_GROUP_FIELDS: Dict[str, Tuple[str, float]] = {
+    "email": ("email", 1.0),
+    "vn_phone": ("phone", 0.95),
+    "intl_phone": ("phone", 0.7),
+    "exp_after": ("experience_years", 0.9),
+    "exp_before": ("experience_years", 0.9),
+    "exp_bare": ("experience_years", 0.5),
+}
+_MAX_CONFIDENCE = {"email": 1.0, "phone": 0.95, "experience_years": 0.9}
+
+
+class CVFieldExtractor:
+    """Trích xuất các trường liên hệ / kinh nghiệm từ CV trong một lần quét"""
+
+    def extract(self, text: str) -> Dict:
+        """
+        Trích xuất email, số điện thoại và số năm kinh nghiệm
+
+        Mỗi trường lấy kết quả có độ tin cậy cao nhất, cùng độ tin cậy thì lấy kết quả
+        xuất hiện trước. Dừng quét khi mọi trường đã đạt độ tin cậy tối đa.
+
+        Args:
+            text: Nội dung CV
+
+        Returns:
+            Dict: {"email", "phone", "experience_years", "confidence": {trường: 0-1}}
+                  (trường không tìm thấy có giá trị None và độ tin cậy 0)
+        """
+        values: Dict[str, Optional[object]] = {field: None for field in _MAX_CONFIDENCE}
+        confidence = {field: 0.0 for field in _MAX_CONFIDENCE}
+        remaining = len(_MAX_CONFIDENCE)
+
+        for match in _FIELDS_RE.finditer(unicodedata.normalize("NFC", text)):
+            field, score = _GROUP_FIELDS[match.lastgroup]
+            if score <= confidence[field]:
+                continue
+            value = match.group(match.lastgroup)
+            if field == "experience_years":
+                value = int(value)
+                if value > MAX_EXPERIENCE_YEARS:
+                    continue
+            values[field] = value.strip() if isinstance(value, str) else value
+            confidence[field] = score
+            if score == _MAX_CONFIDENCE[field]:
+                remaining -= 1
+                if remaining == 0:
+                    break
+
+        return {**values, "confidence": confidence}
+
+
+# Singleton instance
+_cv_field_extractor = None
+
+def get_cv_field_extractor() -> CVFieldExtractor:
+    """Lấy singleton instance của CVFieldExtractor"""
+    global _cv_field_extractor
+    if _cv_field_extractor is None:
+        _cv_field_extractor = CVFieldExtractor()
+    return _cv_field_extractor
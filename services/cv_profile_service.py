@@ -0,0 +1,95 @@
+"""
+CV Profile Service - Lưu hồ sơ CV đã phân tích theo cv_id (SHA-256 của file PDF)
+Phân tích + tính embedding một lần khi upload, các lần gợi ý việc làm sau chỉ cần cv_id
+"""
+import time
+from typing import Dict, List, Optional
+
+from config import get_settings
+from services.persistent_store import PersistentStore
+
+# Các trường của kết quả phân tích CV được lưu vào hồ sơ
+_PROFILE_FIELDS = ("email", "phone", "skills", "experience_years")
+
+
+class CVProfileStore(PersistentStore):
+    """
+    Kho hồ sơ CV (in-memory LRU/TTL, tùy chọn lưu xuống SQLite)
+
+    Mỗi hồ sơ là dict gồm: cv_id, text, email, phone, skills, experience_years,
+    search_queries (query tổng hợp + các đoạn CV), embeddings (embedding của từng query),
+    analysis_version, created_at, updated_at.
+    """
+
+    table = "cv_profiles"
+    key_field = "cv_id"
+
+    def __init__(self, max_profiles: int = 5000, ttl_seconds: Optional[float] = None, db_path: str = ""):
+        """
+        Args:
+            max_profiles: Số hồ sơ tối đa giữ trong bộ nhớ
+            ttl_seconds: Thời gian sống của hồ sơ không được dùng tới, None = không hết hạn
+            db_path: Đường dẫn file SQLite để lưu hồ sơ, rỗng = chỉ lưu trong bộ nhớ
+        """
+        super().__init__(max_items=max_profiles, ttl_seconds=ttl_seconds, db_path=db_path)
+
+    def save(
+        self,
+        cv_id: str,
+        analysis: Dict,
+        search_queries: List[str],
+        embeddings: List[List[float]],
+        analysis_version: str
+    ) -> Dict:
+        """
+        Tạo hoặc cập nhật hồ sơ từ kết quả phân tích CV
+
+        Args:
+            cv_id: SHA-256 của file PDF
+            analysis: Kết quả CVService.analyze_cv (success = True)
+            search_queries: Các query tìm việc tạo từ CV
+            embeddings: Embedding của từng query
+            analysis_version: Phiên bản logic phân tích đã tạo ra hồ sơ
+
+        Returns:
+            Dict: Hồ sơ đã lưu
+        """
+        now = time.time()
+        existing = self.get(cv_id)
+        profile = {
+            "cv_id": cv_id,
+            "text": analysis.get("full_text", ""),
+            **{field: analysis.get(field) for field in _PROFILE_FIELDS},
+            "search_queries": search_queries,
+            "embeddings": embeddings,
+            "analysis_version": analysis_version,
+            "created_at": existing["created_at"] if existing else now,
+            "updated_at": now
+        }
+        self._save(profile)
+        return profile
+
+
+def profile_summary(profile: Dict) -> Dict:
+    """Thông tin hồ sơ trả về cho client (không kèm text CV và embedding)"""
+    return {
+        "cv_id": profile["cv_id"],
+        **{field: profile.get(field) for field in _PROFILE_FIELDS},
+        "created_at": profile.get("created_at")
+    }
+
+
+# Singleton instance
+_cv_profile_store = None
+
+def get_cv_profile_store() -> CVProfileStore:
+    """Lấy singleton instance của CVProfileStore"""
+    global _cv_profile_store
+    if _cv_profile_store is None:
+        settings = get_settings()
+        _cv_profile_store = CVProfileStore(
+            max_profiles=settings.cv_profile_max_size,
+            ttl_seconds=settings.cv_profile_ttl or None,
+            db_path=settings.cv_profile_db_path
+        )
+    return _cv_profile_store
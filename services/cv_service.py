@@ -1,156 +1,277 @@
 """
 CV Service - Xử lý đọc và phân tích CV PDF
 """
-import PyPDF2
+import asyncio
 import re
+import hashlib
+import unicodedata
+import json
+import logging
+from pathlib import Path
 from typing import Dict, List, Optional
-from io import BytesIO
+from config import get_settings
+from logging_config import should_log_payload, payload_preview
+from services.cache_service import LRUCache
+from services.metrics import stage_duration, record_cache
+from services.cv_field_extractor import get_cv_field_extractor
+from services.pdf_extractor import PdfSource, get_pdf_extractor
+from services.skill_matcher import get_skill_matcher
+
+logger = logging.getLogger(__name__)
+
+# Tăng khi logic phân tích thay đổi để kết quả cũ trong cache không được dùng lại
+# (phiên bản danh mục kỹ năng cũng được ghép vào cache key)
+ANALYSIS_VERSION = 3
+
+# Tiêu đề mục trong CV -> tên mục chuẩn
+_SECTION_ALIASES = {
+    "mục tiêu nghề nghiệp": "summary", "mục tiêu": "summary", "giới thiệu": "summary", "tóm tắt": "summary",
+    "objective": "summary", "career objective": "summary", "summary": "summary", "profile": "summary",
+    "about me": "summary",
+    "kinh nghiệm làm việc": "experience", "kinh nghiệm": "experience", "work experience": "experience",
+    "experience": "experience", "employment history": "experience",
+    "dự án": "projects", "dự án đã tham gia": "projects", "projects": "projects", "personal projects": "projects",
+    "kỹ năng": "skills", "kỹ năng chuyên môn": "skills", "skills": "skills", "technical skills": "skills",
+    "học vấn": "education", "education": "education",
+    "chứng chỉ": "other", "certifications": "other", "hoạt động": "other", "activities": "other",
+    "sở thích": "other", "interests": "other", "người tham chiếu": "other", "references": "other",
+    "thông tin cá nhân": "other", "personal information": "other", "contact": "other",
+}
+_SECTION_HEADING_RE = re.compile(
+    r"(" + "|".join(re.escape(alias) for alias in sorted(_SECTION_ALIASES, key=len, reverse=True)) + r")\s*:?"
+)
+# Các mục được dùng làm query tìm việc (bỏ học vấn, thông tin cá nhân, ...)
+_QUERY_SECTIONS = ("summary", "experience", "projects", "skills")
+_QUERY_CHUNK_CHARS = 800
+
+
+def _chunk_lines(text: str, max_chars: int) -> List[str]:
+    """Chia text thành các đoạn tối đa max_chars, cắt tại ranh giới dòng"""
+    chunks, current, size = [], [], 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if current and size + len(line) > max_chars:
+            chunks.append(" ".join(current))
+            current, size = [], 0
+        current.append(line[:max_chars])
+        size += len(line) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
 
 
 class CVService:
     """Service xử lý CV PDF"""
     
     def __init__(self):
-        pass
+        settings = get_settings()
+        # Cache theo SHA-256 của file PDF: cùng một file không phải parse lại
+        self._text_cache = LRUCache(max_size=settings.cv_cache_max_size)
+        self._analysis_cache = LRUCache(max_size=settings.cv_cache_max_size)
+        # Lưu xuống đĩa là tùy chọn vì nội dung CV là dữ liệu cá nhân
+        self.cache_dir = Path(settings.cv_cache_dir) if settings.cv_cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
     
-    def extract_text_from_pdf(self, pdf_file: bytes) -> str:
+    @staticmethod
+    def file_digest(pdf_file: PdfSource) -> str:
+        """SHA-256 của nội dung file (bytes hoặc đường dẫn), dùng làm cache key"""
+        if isinstance(pdf_file, bytes):
+            return hashlib.sha256(pdf_file).hexdigest()
+        digest = hashlib.sha256()
+        with open(pdf_file, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _read_disk_cache(self, digest: str) -> Dict:
+        """Đọc entry cache trên đĩa, trả về {} nếu không có"""
+        if not self.cache_dir:
+            return {}
+        path = self.cache_dir / f"{digest}.json"
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+    
+    def _write_disk_cache(self, digest: str, **fields) -> None:
+        """Ghi (merge) các field vào entry cache trên đĩa"""
+        if not self.cache_dir:
+            return
+        entry = self._read_disk_cache(digest)
+        entry.update(fields)
+        path = self.cache_dir / f"{digest}.json"
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            tmp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+            tmp_path.replace(path)
+        except OSError as e:
+            logger.warning("Không ghi được CV cache: %s", e)
+    
+    def get_cache_stats(self) -> Dict:
+        """Thống kê cache text / phân tích CV"""
+        return {
+            "text_entries": len(self._text_cache),
+            "text_hits": self._text_cache.hits,
+            "text_misses": self._text_cache.misses,
+            "analysis_entries": len(self._analysis_cache),
+            "analysis_hits": self._analysis_cache.hits,
+            "analysis_misses": self._analysis_cache.misses,
+            "disk_cache": str(self.cache_dir) if self.cache_dir else None
+        }
+    
+    def extract_text_from_pdf(self, pdf_file: PdfSource, digest: Optional[str] = None) -> str:
         """
-        Trích xuất text từ file PDF
+        Trích xuất text từ file PDF (có cache theo SHA-256 của file)
         
         Args:
-            pdf_file: Nội dung file PDF dạng bytes
+            pdf_file: Nội dung file PDF dạng bytes, hoặc đường dẫn file PDF
+            digest: SHA-256 đã tính sẵn (vd: khi nhận upload), None = tự tính
             
         Returns:
             str: Text đã trích xuất từ PDF
         """
-        try:
-            pdf_reader = PyPDF2.PdfReader(BytesIO(pdf_file))
-            text = ""
-            
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+        with stage_duration.time(stage="pdf_extract"):
+            digest = digest or self.file_digest(pdf_file)
+            text = self._text_cache.get(digest)
+            if text is None:
+                text = self._read_disk_cache(digest).get("text")
+                record_cache("cv_text", text is not None)
+                if text is None:
+                    text = self._parse_pdf(pdf_file)
+                    self._write_disk_cache(digest, text=text)
+                self._text_cache.set(digest, text)
+            else:
+                record_cache("cv_text", True)
+                logger.info("CV cache hit", extra={"digest": digest[:12]})
+            return text
+    
+    async def extract_text_from_pdf_async(self, pdf_file: PdfSource, digest: Optional[str] = None) -> str:
+        """
+        Phiên bản async của extract_text_from_pdf (hash + parse chạy ngoài event loop)
+        
+        Args:
+            pdf_file: Nội dung file PDF dạng bytes, hoặc đường dẫn file PDF
+            digest: SHA-256 đã tính sẵn, None = tự tính
             
-            print(f"**********📄 Đã trích xuất {text}")
-            return text.strip()
-        except Exception as e:
-            raise Exception(f"Lỗi khi đọc PDF: {str(e)}")
+        Returns:
+            str: Text đã trích xuất từ PDF
+        """
+        return await asyncio.to_thread(self.extract_text_from_pdf, pdf_file, digest)
+    
+    def _parse_pdf(self, pdf_file: PdfSource) -> str:
+        """Parse PDF trong process pool (không qua cache)"""
+        text = get_pdf_extractor().extract(pdf_file)
+        logger.info("Đã trích xuất text từ PDF", extra={"chars": len(text)})
+        if should_log_payload():
+            logger.info("Text CV", extra={"payload": payload_preview(text)})
+        return text
+    
+    def extract_fields(self, text: str) -> Dict:
+        """
+        Trích xuất email, số điện thoại, số năm kinh nghiệm trong một lần quét text
+        
+        Returns:
+            Dict: {"email", "phone", "experience_years", "confidence"}
+        """
+        return get_cv_field_extractor().extract(text)
     
     def extract_email(self, text: str) -> Optional[str]:
         """Trích xuất email từ text"""
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, text)
-        print(f"**********📧 Tìm thấy email: {emails}")
-        return emails[0] if emails else None
+        return self.extract_fields(text)["email"]
     
     def extract_phone(self, text: str) -> Optional[str]:
-        """Trích xuất số điện thoại từ text"""
-        phone_patterns = [
-            r'\+?\d{1,3}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,9}',
-            r'\d{10,11}',
-            r'\(\d{3}\)\s*\d{3}[-.\s]?\d{4}'
-        ]
-        
-        for pattern in phone_patterns:
-            phones = re.findall(pattern, text)
-            if phones:
-                print(f"**********📞 Tìm thấy số điện thoại: {phones}" )
-                return phones[0]
-        return None
+        """Trích xuất số điện thoại từ text (ưu tiên số Việt Nam +84 / 0xx)"""
+        return self.extract_fields(text)["phone"]
     
     def extract_skills(self, text: str) -> List[str]:
         """
-        Trích xuất các kỹ năng từ CV
-        Tìm kiếm các từ khóa phổ biến trong lĩnh vực công nghệ
+        Trích xuất các kỹ năng từ CV theo danh mục kỹ năng (data/skills_taxonomy.json)
+        So khớp theo ranh giới từ, alias được quy về tên chuẩn (vd: "reactjs" -> React, "k8s" -> Kubernetes)
         """
-        # Danh sách kỹ năng phổ biến (có thể mở rộng)
-        common_skills = [
-            # Programming Languages
-            'python', 'java', 'javascript', 'typescript', 'c++', 'c#', 'php', 'ruby', 'go', 'rust',
-            'swift', 'kotlin', 'scala', 'r', 'matlab',
-            
-            # Web Technologies
-            'html', 'css', 'react', 'angular', 'vue', 'nodejs', 'express', 'django', 'flask',
-            'spring', 'fastapi', 'nextjs', 'nuxt',
-            
-            # Databases
-            'mysql', 'postgresql', 'mongodb', 'redis', 'oracle', 'sql server', 'sqlite',
-            'dynamodb', 'cassandra', 'elasticsearch',
-            
-            # Cloud & DevOps
-            'aws', 'azure', 'gcp', 'docker', 'kubernetes', 'jenkins', 'gitlab', 'github',
-            'terraform', 'ansible', 'ci/cd', 'devops',
-            
-            # Mobile
-            'android', 'ios', 'react native', 'flutter', 'xamarin',
-            
-            # Data & AI
-            'machine learning', 'deep learning', 'data science', 'ai', 'nlp', 'computer vision',
-            'tensorflow', 'pytorch', 'keras', 'pandas', 'numpy', 'scikit-learn',
-            
-            # Other
-            'git', 'agile', 'scrum', 'rest api', 'graphql', 'microservices', 'linux',
-            'testing', 'junit', 'selenium', 'jest'
-        ]
-        
-        text_lower = text.lower()
-        found_skills = []
-        
-        for skill in common_skills:
-            if skill.lower() in text_lower:
-                found_skills.append(skill.title())
-        print(f"**********🛠️ Tìm thấy kỹ năng: {found_skills}")
-        # Loại bỏ trùng lặp và giữ nguyên thứ tự
-        return list(dict.fromkeys(found_skills))
+        found_skills = get_skill_matcher().find(text)
+        logger.debug("Tìm thấy %d kỹ năng", len(found_skills))
+        return found_skills
     
     def extract_experience_years(self, text: str) -> Optional[int]:
         """
         Trích xuất số năm kinh nghiệm từ CV
-        Tìm các pattern như: "5 years", "3+ years", "2-3 years"
-        """
-        patterns = [
-            r'(\d+)\+?\s*(?:years?|năm)',
-            r'(\d+)-\d+\s*(?:years?|năm)',
-        ]
-        print(f"**********⏳ Tìm thấy số năm kinh nghiệm với các pattern: {patterns}")
-        for pattern in patterns:
-            matches = re.findall(pattern, text.lower())
-            if matches:
-                try:
-                    return int(matches[0])
-                except:
-                    pass
-        return None
-    
-    def analyze_cv(self, pdf_file: bytes) -> Dict:
+        Ưu tiên các cụm có chữ "kinh nghiệm" / "experience": "3 năm kinh nghiệm", "5+ years of experience"
+        """
+        return self.extract_fields(text)["experience_years"]
+    
+    @staticmethod
+    def analysis_version() -> str:
+        """Phiên bản kết quả phân tích: logic phân tích + danh mục kỹ năng"""
+        return f"{ANALYSIS_VERSION}.{get_skill_matcher().version}"
+    
+    def analyze_cv(self, pdf_file: PdfSource, digest: Optional[str] = None) -> Dict:
         """
         Phân tích toàn bộ CV và trả về thông tin có cấu trúc
         
         Args:
-            pdf_file: Nội dung file PDF dạng bytes
+            pdf_file: Nội dung file PDF dạng bytes, hoặc đường dẫn file PDF
+            digest: SHA-256 đã tính sẵn, None = tự tính
             
         Returns:
             Dict chứa thông tin đã phân tích
         """
+        digest = digest or self.file_digest(pdf_file)
+        version = self.analysis_version()
+        cache_key = f"{digest}:v{version}"
+        cached = self._analysis_cache.get(cache_key)
+        if cached is None:
+            cached = self._read_disk_cache(digest).get(f"analysis_v{version}")
+            if cached is not None:
+                self._analysis_cache.set(cache_key, cached)
+        record_cache("cv_analysis", cached is not None)
+        if cached is not None:
+            logger.info("CV analysis cache hit", extra={"digest": digest[:12]})
+            return dict(cached)
+        
+        analysis = self._analyze(pdf_file, digest)
+        # Chỉ cache kết quả thành công (lỗi có thể do tạm thời)
+        if analysis.get("success"):
+            self._analysis_cache.set(cache_key, analysis)
+            self._write_disk_cache(digest, **{f"analysis_v{version}": analysis})
+        return dict(analysis)
+    
+    async def analyze_cv_async(self, pdf_file: PdfSource, digest: Optional[str] = None) -> Dict:
+        """
+        Phiên bản async của analyze_cv, dùng trong các route FastAPI
+        
+        Args:
+            pdf_file: Nội dung file PDF dạng bytes, hoặc đường dẫn file PDF
+            digest: SHA-256 đã tính sẵn, None = tự tính
+            
+        Returns:
+            Dict chứa thông tin đã phân tích
+        """
+        return await asyncio.to_thread(self.analyze_cv, pdf_file, digest)
+    
+    def _analyze(self, pdf_file: PdfSource, digest: str) -> Dict:
+        """Phân tích CV (không qua cache)"""
         try:
             # Trích xuất text từ PDF
-            text = self.extract_text_from_pdf(pdf_file)
+            text = self.extract_text_from_pdf(pdf_file, digest)
             
             if not text or len(text) < 50:
                 raise Exception("CV quá ngắn hoặc không đọc được nội dung")
             
-            # Phân tích các thông tin
-            email = self.extract_email(text)
-            phone = self.extract_phone(text)
+            # Phân tích các thông tin (email, phone, kinh nghiệm trong một lần quét)
+            fields = self.extract_fields(text)
             skills = self.extract_skills(text)
-            experience_years = self.extract_experience_years(text)
             
             return {
                 "success": True,
                 "full_text": text,
-                "email": email,
-                "phone": phone,
+                "email": fields["email"],
+                "phone": fields["phone"],
                 "skills": skills,
-                "experience_years": experience_years,
+                "experience_years": fields["experience_years"],
+                "field_confidence": fields["confidence"],
                 "text_length": len(text)
             }
             
@@ -200,6 +321,60 @@ class CVService:
             full_text = cv_analysis.get("full_text", "")
             return full_text[:500] if full_text else "Tìm việc làm"
 
+    
+    @staticmethod
+    def split_sections(text: str) -> Dict[str, str]:
+        """
+        Tách CV thành các mục theo tiêu đề thường gặp (tiếng Việt / tiếng Anh)
+        
+        Args:
+            text: Nội dung CV
+            
+        Returns:
+            Dict[str, str]: Tên mục (summary, experience, projects, skills, education, other) -> nội dung;
+                            phần trước tiêu đề đầu tiên nằm ở mục "header"
+        """
+        sections: Dict[str, List[str]] = {}
+        current = "header"
+        # Text từ PDF có thể ở dạng Unicode tổ hợp (NFD), chuẩn hóa để so khớp tiêu đề tiếng Việt
+        for line in unicodedata.normalize("NFC", text).splitlines():
+            heading = _SECTION_HEADING_RE.fullmatch(line.strip().lower())
+            if heading:
+                current = _SECTION_ALIASES[heading.group(1)]
+                continue
+            sections.setdefault(current, []).append(line)
+        return {name: "\n".join(lines).strip() for name, lines in sections.items() if "".join(lines).strip()}
+    
+    def create_job_search_queries(self, cv_analysis: Dict, max_queries: int = 6) -> List[str]:
+        """
+        Tạo nhiều query tìm kiếm từ CV: query tổng hợp (kỹ năng + cấp độ) và các đoạn
+        của những mục liên quan tới công việc (tóm tắt, kinh nghiệm, dự án, kỹ năng)
+        
+        Args:
+            cv_analysis: Kết quả phân tích CV từ analyze_cv()
+            max_queries: Số query tối đa
+            
+        Returns:
+            List[str]: Các query, query tổng hợp đứng đầu
+        """
+        summary_query = self.create_job_search_query(cv_analysis)
+        if not summary_query:
+            return []
+        queries = [summary_query]
+        
+        sections = self.split_sections(cv_analysis.get("full_text", ""))
+        relevant = [sections[name] for name in _QUERY_SECTIONS if name in sections]
+        # CV không có tiêu đề mục rõ ràng: dùng toàn bộ text
+        if not relevant:
+            relevant = [cv_analysis.get("full_text", "")]
+        for section in relevant:
+            for chunk in _chunk_lines(section, _QUERY_CHUNK_CHARS):
+                if len(queries) >= max_queries:
+                    return queries
+                if len(chunk) >= 30:
+                    queries.append(chunk)
+        return queries
+
 
 # Singleton instance
 _cv_service = None
@@ -1,47 +1,61 @@
 """
 Service xử lý logic gọi Google Gemini API
 """
+import logging
 import google.generativeai as genai
-from typing import List, Dict
+from typing import Any, List, Dict, AsyncIterator, Optional, Tuple
 from config import get_settings, SYSTEM_PROMPT
-from services.vector_service import search_jobs_vector
+from services.base_ai_service import BaseAIService
 
+logger = logging.getLogger(__name__)
 
 
-class GeminiService:
+class GeminiService(BaseAIService):
     """Service để tương tác với Google Gemini API"""
-    
+
+    provider_name = "gemini"
+    display_name = "Gemini"
+    retrieval_top_k = 3  # Chỉ lấy top 3 job liên quan nhất
+
     def __init__(self):
         """Khởi tạo Gemini client"""
         settings = get_settings()
+        # ai_model có thể là model của provider khác khi dùng router
+        super().__init__(settings.ai_model if settings.ai_model.startswith("gemini") else "gemini-3-flash-preview")
         genai.configure(api_key=settings.GEMINI_API_KEY)
-        
+
         # Cấu hình generation với giới hạn token
         generation_config = {
-            "temperature": settings.ai_temperature,
-            "max_output_tokens": settings.ai_max_tokens,  # Giới hạn output
+            "temperature": self.temperature,
+            "max_output_tokens": self.max_tokens,  # Giới hạn output
             "top_p": 0.95,
         }
-        
+
+        # Gemini dùng transport riêng của google SDK (không qua HTTP pool dùng chung)
         self.model = genai.GenerativeModel(
-            settings.ai_model,
+            self.model_name,
             generation_config=generation_config
         )
-        print(f"✅ Gemini initialized (max tokens: {settings.ai_max_tokens})")
-    
-    def build_conversation(
-        self, 
-        message: str, 
+        logger.info("Gemini initialized (model: %s, max tokens: %d)", self.model_name, self.max_tokens)
+
+    def build_request(
+        self,
+        message: str,
         conversation_history: List[Dict],
-        jobs_info: str = ""
+        jobs_info: str = "",
+        cv_text: str = "",
+        summary: str = ""
     ) -> str:
         """
         Xây dựng chuỗi conversation từ lịch sử và tin nhắn mới
-        
+
         Args:
             message: Tin nhắn hiện tại từ user
             conversation_history: Lịch sử hội thoại trước đó
-            
+            jobs_info: Thông tin công việc từ vector search
+            cv_text: Nội dung CV của người dùng (nếu có)
+            summary: Tóm tắt các lượt chat cũ (nếu có)
+
         Returns:
             str: Chuỗi conversation đầy đủ để gửi cho AI
         """
@@ -51,77 +65,60 @@ class GeminiService:
             conversation += f"Các công việc phù hợp từ hệ thống:\n{jobs_info}\n\n"
         else:
             conversation += "Lưu ý: Hiện tại chưa tìm thấy công việc cụ thể trong cơ sở dữ liệu. Hãy tư vấn chung hoặc hỏi thêm thông tin.\n\n"
-        
+
+        if cv_text:
+            conversation += f"Nội dung CV của người dùng (hãy dựa vào CV này khi trả lời):\n{cv_text}\n\n"
+
+        if summary:
+            conversation += f"Tóm tắt các lượt hội thoại trước đó:\n{summary}\n\n"
+
         # Thêm lịch sử hội thoại
         if conversation_history:
             for msg in conversation_history:
                 role = "User" if msg.get("role") == "user" else "Assistant"
                 conversation += f"{role}: {msg.get('content')}\n"
-        
+
         # Thêm tin nhắn hiện tại
         conversation += f"User: {message}\nAssistant:"
-        
+
         return conversation
-    
-    def generate_response(self, conversation: str) -> str:
-        """
-        Gọi Gemini API để tạo response
-        
-        Args:
-            conversation: Chuỗi conversation đầy đủ
-            
-        Returns:
-            str: Response từ AI
-            
-        Raises:
-            Exception: Nếu có lỗi khi gọi API
-        """
-        # Thêm timeout 30s để tránh request bị treo
-        response = self.model.generate_content(
+
+    def _send(self, conversation: str) -> Any:
+        # Timeout để tránh request bị treo
+        return self.model.generate_content(
+            conversation,
+            request_options={"timeout": self.timeout}
+        )
+
+    async def _send_async(self, conversation: str) -> Any:
+        return await self.model.generate_content_async(
             conversation,
-            request_options={"timeout": 30}
+            request_options={"timeout": self.timeout}
         )
+
+    def _response_text(self, response: Any) -> str:
         return response.text
-    
-    def chat(self, message: str, conversation_history: List[Dict] = None) -> str:
-        """
-        Method chính để chat với AI
-        
-        Args:
-            message: Tin nhắn từ user
-            conversation_history: Lịch sử hội thoại (optional)
-            
-        Returns:
-            str: Response từ AI
-        """
-        if conversation_history is None:
-            conversation_history = []
-        
-        # Giới hạn lịch sử chỉ giữ 5 tin nhắn gần nhất để tránh prompt quá dài
-        conversation_history = conversation_history[-5:] if len(conversation_history) > 5 else conversation_history
-
-        # Truy xuất công việc bằng vector search (chỉ lấy top 3 job liên quan nhất)
-        jobs = search_jobs_vector(message, top_k=3)
-        jobs_info = "\n".join([f"- {job}" for job in jobs]) if jobs else ""
-        
-        # Xây dựng conversation
-        conversation = self.build_conversation(message, conversation_history, jobs_info)
-        
-        # Debug log (optional)
-        print("\n" + "=" * 50)
-        print("📝 Conversation sent to AI:")
-        print(conversation)
-        print("=" * 50)
-        
-        # Gọi API
-        ai_response = self.generate_response(conversation)
-        
-        # Debug log
-        print("\n🤖 AI Response:")
-        print(ai_response)
-        print("=" * 50 + "\n")
-        
-        return ai_response
+
+    def _response_usage(self, response: Any) -> Tuple[Optional[int], Optional[int]]:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return None, None
+        return usage.prompt_token_count, usage.candidates_token_count
+
+    async def _open_stream(self, conversation: str) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(
+            conversation,
+            stream=True,
+            request_options={"timeout": self.timeout}
+        )
+        return self._iter_text(response)
+
+    @staticmethod
+    async def _iter_text(response) -> AsyncIterator[str]:
+        async for chunk in response:
+            # Chunk có thể không có text (vd: bị chặn bởi safety filter)
+            if chunk.parts:
+                yield chunk.text
 
 
 # Singleton instance
@@ -0,0 +1,142 @@
+"""
+HTTP Transport - Connection pool dùng chung cho các AI provider
+Giữ kết nối keep-alive (HTTP/2 nếu đã cài h2) để không phải bắt tay TLS lại ở
+mỗi request, kèm retry với exponential backoff + jitter cho lỗi tạm thời
+"""
+import asyncio
+import importlib.util
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from openai import DEFAULT_CONNECTION_LIMITS, DefaultAsyncHttpxClient, DefaultHttpxClient, Timeout
+
+from config import get_settings
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    """HTTP/2 cần package h2 (pip install httpx[http2])"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """
+    Kiểm tra lỗi có phải do timeout / rate limit / lỗi kết nối / lỗi server tạm thời không
+
+    OpenAI SDK gắn `status_code`, google-api-core gắn `code` cho lỗi HTTP.
+    """
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if isinstance(status, int) and (status == 429 or status >= 500):
+        return True
+    name = type(exc).__name__
+    return any(
+        marker in name
+        for marker in ("Timeout", "RateLimit", "ResourceExhausted", "Unavailable", "Connection", "Connect")
+    )
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Thời gian chờ trước lần thử lại thứ attempt (exponential backoff, full jitter)"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+async def retry_async(
+    call: Callable[[], Awaitable[T]],
+    attempts: Optional[int] = None,
+    label: str = "AI provider"
+) -> T:
+    """
+    Gọi call(), thử lại khi gặp lỗi tạm thời (xem is_retryable_error)
+
+    Args:
+        call: Hàm trả về coroutine thực hiện request
+        attempts: Số lần thử lại tối đa (None = theo settings.ai_retry_attempts)
+        label: Tên hiển thị trong log
+
+    Returns:
+        Kết quả của call()
+    """
+    settings = get_settings()
+    attempts = settings.ai_retry_attempts if attempts is None else attempts
+    for attempt in range(attempts + 1):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt >= attempts or not is_retryable_error(e):
+                raise
+            delay = backoff_delay(attempt, settings.ai_retry_base_delay, settings.ai_retry_max_delay)
+            logger.warning("%s lỗi tạm thời (%s), thử lại sau %.2fs", label, type(e).__name__, delay)
+            await asyncio.sleep(delay)
+
+
+def retry_sync(call: Callable[[], T], attempts: Optional[int] = None, label: str = "AI provider") -> T:
+    """Phiên bản đồng bộ của retry_async"""
+    settings = get_settings()
+    attempts = settings.ai_retry_attempts if attempts is None else attempts
+    for attempt in range(attempts + 1):
+        try:
+            return call()
+        except Exception as e:
+            if attempt >= attempts or not is_retryable_error(e):
+                raise
+            delay = backoff_delay(attempt, settings.ai_retry_base_delay, settings.ai_retry_max_delay)
+            logger.warning("%s lỗi tạm thời (%s), thử lại sau %.2fs", label, type(e).__name__, delay)
+            time.sleep(delay)
+
+
+def _pool_options() -> dict:
+    settings = get_settings()
+    # Dùng đúng lớp Limits / Timeout của thư viện HTTP mà openai SDK đang dùng
+    limits_cls = type(DEFAULT_CONNECTION_LIMITS)
+    return {
+        "limits": limits_cls(
+            max_connections=settings.ai_http_max_connections,
+            max_keepalive_connections=settings.ai_http_max_keepalive,
+            keepalive_expiry=settings.ai_http_keepalive_expiry
+        ),
+        "timeout": Timeout(settings.ai_http_read_timeout, connect=settings.ai_http_connect_timeout),
+        "http2": http2_available()
+    }
+
+
+# Singleton instances (dùng chung cho mọi client OpenAI-compatible)
+_async_http_client = None
+_sync_http_client = None
+
+def get_async_http_client() -> DefaultAsyncHttpxClient:
+    """Lấy connection pool async dùng chung"""
+    global _async_http_client
+    if _async_http_client is None:
+        options = _pool_options()
+        _async_http_client = DefaultAsyncHttpxClient(**options)
+        logger.info(
+            "HTTP pool initialized (max %d connections, HTTP/2: %s)",
+            options["limits"].max_connections, options["http2"]
+        )
+    return _async_http_client
+
+
+def get_sync_http_client() -> DefaultHttpxClient:
+    """Lấy connection pool đồng bộ dùng chung (cho chat() trong script/CLI)"""
+    global _sync_http_client
+    if _sync_http_client is None:
+        _sync_http_client = DefaultHttpxClient(**_pool_options())
+    return _sync_http_client
+
+
+async def close_http_clients() -> None:
+    """Đóng các connection pool (gọi khi tắt ứng dụng)"""
+    global _async_http_client, _sync_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+    if _sync_http_client is not None:
+        _sync_http_client.close()
+        _sync_http_client = None
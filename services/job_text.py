@@ -0,0 +1,293 @@
+"""
+Job Text - Tạo đoạn text và metadata của công việc để vector hóa
+Dùng chung cho API /api/vector và các script import để cùng một job luôn được index giống nhau.
+Metadata (địa điểm, cấp bậc, loại hình, hình thức, lương, ngày hết hạn) được chuẩn hóa để
+lọc ngay trong Chroma bằng `where` (xem build_job_where).
+Tokenizer dùng chung cho so khớp kỹ năng và chỉ mục từ khóa BM25 cũng nằm ở đây
+"""
+import calendar
+import re
+import time
+import unicodedata
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACE_RE = re.compile(r'\s+')
+
+# Token: chữ/số (kể cả tiếng Việt có dấu) cùng + và # để giữ "c++", "c#".
+# Các dấu khác (. / - khoảng trắng) là ranh giới: "Node.js", "node js" cùng là ("node", "js")
+_TOKEN_RE = re.compile(r"[\w+#]+")
+# Tăng mỗi khi tokenize / index_terms đổi cách tách term: chỉ mục BM25 lưu version này
+# và được xây lại khi không khớp (term cũ không còn khớp với query tách theo cách mới)
+TOKENIZER_VERSION = 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Tách text thành token (giữ nguyên hoa/thường, chuẩn hóa Unicode NFC)"""
+    return _TOKEN_RE.findall(unicodedata.normalize("NFC", text))
+
+
+def _fold(token: str) -> str:
+    """Lowercase và bỏ dấu tiếng Việt (để "Đà Nẵng" khớp với "da nang")"""
+    text = unicodedata.normalize("NFD", token.lower()).replace("đ", "d")
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def index_terms(text: str) -> List[str]:
+    """
+    Tách text thành các term của chỉ mục từ khóa: từng âm tiết / từ và cặp từ liền nhau
+    (cặp "spring_boot", "da_nang" giúp cụm từ khớp nguyên cụm được điểm cao hơn)
+    """
+    tokens = [_fold(token) for token in tokenize(text)]
+    return tokens + [f"{first}_{second}" for first, second in zip(tokens, tokens[1:])]
+
+
+def clean_html(html_text: str) -> str:
+    """Loại bỏ HTML tags và giữ lại text thuần"""
+    if not html_text:
+        return ""
+    clean = _TAG_RE.sub('', html_text)
+    clean = _SPACE_RE.sub(' ', clean).strip()
+    return clean
+
+
+def build_job_text(job: Dict) -> str:
+    """
+    Ghép thông tin job thành 1 đoạn text để vector hóa
+
+    Args:
+        job: Thông tin công việc (name, description, location, salary, level, job_type,
+             years_of_experience, start_date, end_date, work_mode); description có thể chứa HTML
+
+    Returns:
+        str: Text đầy đủ của công việc
+    """
+    def field(key: str) -> str:
+        value = job.get(key)
+        return "" if value is None else str(value)
+
+    return (
+        f"{field('name')}: {clean_html(field('description'))}\n"
+        f"Địa điểm: {field('location')}\n"
+        f"Lương: {field('salary')}\n"
+        f"Cấp bậc: {field('level')}\n"
+        f"Loại hình: {field('job_type')}\n"
+        f"Kinh nghiệm: {field('years_of_experience')}\n"
+        f"Ngày bắt đầu: {field('start_date')}\n"
+        f"Ngày kết thúc: {field('end_date')}\n"
+        f"Hình thức làm việc: {field('work_mode')}"
+    )
+
+
+_KEY_RE = re.compile(r"[^a-z0-9]+")
+_LOCATION_SPLIT_RE = re.compile(r"\s*(?:[/,;|&]|\s-\s|\bvà\b|\band\b)\s*", re.IGNORECASE)
+# Tên gọi khác của các thành phố lớn -> key chuẩn
+_LOCATION_ALIASES = {
+    "hn": "ha_noi", "hanoi": "ha_noi", "tp_ha_noi": "ha_noi", "thanh_pho_ha_noi": "ha_noi",
+    "hcm": "ho_chi_minh", "tp_hcm": "ho_chi_minh", "tphcm": "ho_chi_minh", "hcmc": "ho_chi_minh",
+    "tp_ho_chi_minh": "ho_chi_minh", "thanh_pho_ho_chi_minh": "ho_chi_minh",
+    "ho_chi_minh_city": "ho_chi_minh", "sai_gon": "ho_chi_minh", "saigon": "ho_chi_minh",
+    "da_nang_city": "da_nang", "danang": "da_nang", "tp_da_nang": "da_nang",
+}
+
+# Lương: "15,000,000đ", "15-20 triệu", "Lên đến 2000$", "Thỏa thuận"
+_SALARY_NUMBER_RE = re.compile(r"(\d+(?:[.,]\d+)*)\s*(triệu|tr\b|m\b|k\b|nghìn|ngàn)?", re.IGNORECASE)
+_SALARY_UNITS = {"triệu": 1_000_000, "tr": 1_000_000, "m": 1_000_000, "k": 1_000, "nghìn": 1_000, "ngàn": 1_000}
+_SALARY_UP_TO_RE = re.compile(r"lên\s+(?:đến|tới)|up\s+to|tối\s+đa|dưới|under", re.IGNORECASE)
+_SALARY_FROM_RE = re.compile(r"^\s*(?:từ|trên|from|over|hơn)\b", re.IGNORECASE)
+_FOREIGN_CURRENCY_RE = re.compile(r"\$|usd|eur|€", re.IGNORECASE)
+# Khoảng lương chỉ có một đầu: đầu còn lại là 0 / giá trị rất lớn để so sánh vẫn đúng
+OPEN_SALARY_MAX = 10 ** 12
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d")
+
+# Tất cả key metadata của job: upsert luôn ghi đủ các key (None = xóa key cũ)
+# vì Chroma gộp metadata mới vào metadata cũ thay vì thay thế.
+# build_job_metadata chỉ ghi các key này, build_job_where chỉ lọc trên các key này
+JOB_METADATA_KEYS = (
+    "location", "level", "job_type", "work_mode",
+    "salary_min", "salary_max", "start_date_ts", "end_date_ts",
+)
+
+MetadataValue = Union[str, int, List[str], None]
+
+
+def normalize_key(value) -> str:
+    """Chuẩn hóa giá trị thành key để lọc: bỏ dấu, lowercase ("Full-time" -> "full_time")"""
+    text = unicodedata.normalize("NFD", str(value)).replace("đ", "d").replace("Đ", "D")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _KEY_RE.sub("_", text.lower()).strip("_")
+
+
+def normalize_locations(value) -> List[str]:
+    """Tách và chuẩn hóa địa điểm: "Hà Nội / TP.HCM" -> ["ha_noi", "ho_chi_minh"]"""
+    keys: Dict[str, None] = {}
+    for part in _LOCATION_SPLIT_RE.split(str(value or "")):
+        key = normalize_key(part)
+        if key:
+            keys.setdefault(_LOCATION_ALIASES.get(key, key))
+    return list(keys)
+
+
+def parse_salary_range(value) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Parse mức lương (VND) thành khoảng (min, max)
+
+    Returns:
+        Tuple: (None, None) nếu thỏa thuận / không parse được / không phải VND;
+               khoảng chỉ có một đầu dùng 0 hoặc OPEN_SALARY_MAX cho đầu còn lại
+    """
+    if value is None or isinstance(value, bool):
+        return None, None
+    if isinstance(value, (int, float, Decimal)):
+        amount = int(value)
+        return (amount, amount) if amount > 0 else (None, None)
+
+    text = str(value)
+    if _FOREIGN_CURRENCY_RE.search(text):
+        return None, None
+    numbers: List[float] = []
+    units: List[Optional[int]] = []
+    for match in _SALARY_NUMBER_RE.finditer(text):
+        raw, unit = match.groups()
+        if re.fullmatch(r"\d{1,3}(?:[.,]\d{3})+", raw):
+            number = float(re.sub(r"[.,]", "", raw))  # Dấu phân cách hàng nghìn
+        else:
+            number = float(raw.replace(",", "."))
+        numbers.append(number)
+        units.append(_SALARY_UNITS.get(unit.lower()) if unit else None)
+    if not numbers:
+        return None, None
+
+    # "15-20 triệu": đơn vị viết ở số cuối áp dụng cho các số không có đơn vị;
+    # số quá nhỏ để là VND ("10 - 15.000.000", "Lương 15-20") được hiểu là triệu
+    last_unit = next((unit for unit in reversed(units) if unit), 1)
+    amounts = []
+    for number, unit in zip(numbers[:2], units[:2]):
+        amount = number * (unit or last_unit)
+        amounts.append(int(amount * 1_000_000 if amount < 1000 else amount))
+    amounts.sort()
+    if amounts[-1] <= 0:
+        return None, None
+    if len(amounts) == 2:
+        return amounts[0], amounts[1]
+    if _SALARY_UP_TO_RE.search(text):
+        return 0, amounts[0]
+    if _SALARY_FROM_RE.search(text):
+        return amounts[0], OPEN_SALARY_MAX
+    return amounts[0], amounts[0]
+
+
+def parse_date_ts(value) -> Optional[int]:
+    """Chuyển ngày (date, datetime, "2026-12-31", "31/12/2026") thành epoch (giây, UTC)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return calendar.timegm(value.utctimetuple()) if value.tzinfo else calendar.timegm(value.timetuple())
+    if isinstance(value, date):
+        return calendar.timegm(value.timetuple())
+    text = str(value).strip()
+    try:
+        return parse_date_ts(datetime.fromisoformat(text.replace("Z", "+00:00")))
+    except ValueError:
+        pass
+    for date_format in _DATE_FORMATS:
+        try:
+            return calendar.timegm(datetime.strptime(text[:10], date_format).timetuple())
+        except ValueError:
+            continue
+    return None
+
+
+def build_job_metadata(job: Dict) -> Dict[str, MetadataValue]:
+    """
+    Tạo metadata có cấu trúc của job để lọc trong Chroma
+
+    Args:
+        job: Thông tin công việc (cùng các field như build_job_text)
+
+    Returns:
+        Dict: Đủ các key trong JOB_METADATA_KEYS; giá trị không xác định là None
+              (riêng end_date_ts = 0 khi không có ngày hết hạn, để vẫn lọc được)
+    """
+    def key(field: str) -> Optional[str]:
+        return normalize_key(job.get(field) or "") or None
+
+    salary_min, salary_max = parse_salary_range(job.get("salary"))
+    values = {
+        "location": normalize_locations(job.get("location")) or None,
+        "level": key("level"),
+        "job_type": key("job_type"),
+        "work_mode": key("work_mode"),
+        "salary_min": salary_min,
+        "salary_max": salary_max,
+        "start_date_ts": parse_date_ts(job.get("start_date")),
+        "end_date_ts": parse_date_ts(job.get("end_date")) or 0,
+    }
+    return {key: values[key] for key in JOB_METADATA_KEYS}
+
+
+def _values(value: Union[str, Iterable[str], None]) -> List[str]:
+    """Bộ lọc dạng "a,b" hoặc list -> danh sách giá trị"""
+    if value is None:
+        return []
+    parts = value.split(",") if isinstance(value, str) else value
+    return [part.strip() for part in parts if part and part.strip()]
+
+
+def _condition(field: str, condition) -> Dict:
+    """Điều kiện lọc trên một key metadata, báo lỗi nếu key không được index (lọc sẽ luôn rỗng)"""
+    if field not in JOB_METADATA_KEYS:
+        raise ValueError(f"Metadata key không hợp lệ: {field}")
+    return {field: condition}
+
+
+def build_job_where(
+    location: Union[str, Iterable[str], None] = None,
+    level: Union[str, Iterable[str], None] = None,
+    job_type: Union[str, Iterable[str], None] = None,
+    work_mode: Union[str, Iterable[str], None] = None,
+    salary_min: Optional[int] = None,
+    salary_max: Optional[int] = None,
+    active_only: bool = False
+) -> Optional[Dict]:
+    """
+    Tạo bộ lọc `where` của Chroma từ các tiêu chí tìm việc
+
+    Args:
+        location: Địa điểm (nhiều giá trị cách nhau bởi dấu phẩy), vd: "Hà Nội,HCM"
+        level, job_type, work_mode: Cấp bậc / loại hình / hình thức làm việc (nhiều giá trị = OR)
+        salary_min: Lương mong muốn tối thiểu (VND): job có mức trên của khoảng lương >= giá trị này
+        salary_max: Lương tối đa (VND): job có mức dưới của khoảng lương <= giá trị này
+        active_only: Chỉ lấy job chưa hết hạn (tính theo ngày, job không có ngày hết hạn vẫn được lấy)
+
+    Returns:
+        Dict bộ lọc where, None nếu không có tiêu chí nào
+        (job lương thỏa thuận không khớp khi lọc theo lương)
+    """
+    conditions: List[Dict] = []
+
+    locations = list(dict.fromkeys(key for value in _values(location) for key in normalize_locations(value)))
+    if locations:
+        matches = [_condition("location", {"$contains": key}) for key in locations]
+        conditions.append(matches[0] if len(matches) == 1 else {"$or": matches})
+
+    for field, value in (("level", level), ("job_type", job_type), ("work_mode", work_mode)):
+        keys = list(dict.fromkeys(normalize_key(item) for item in _values(value)))
+        if keys:
+            conditions.append(_condition(field, keys[0] if len(keys) == 1 else {"$in": keys}))
+
+    if salary_min is not None:
+        conditions.append(_condition("salary_max", {"$gte": int(salary_min)}))
+    if salary_max is not None:
+        conditions.append(_condition("salary_min", {"$lte": int(salary_max)}))
+
+    if active_only:
+        # Làm tròn về đầu ngày (UTC) để bộ lọc giống nhau trong cả ngày (retrieval cache vẫn dùng được)
+        today = int(time.time()) // 86400 * 86400
+        conditions.append({"$or": [_condition("end_date_ts", {"$gte": today}), _condition("end_date_ts", 0)]})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
@@ -0,0 +1,136 @@
+"""
+Service dùng chung cho các provider có API tương thích OpenAI (OpenAI, OpenRouter, ...)
+Các client dùng chung connection pool trong services.http_transport
+"""
+import logging
+from openai import OpenAI, AsyncOpenAI
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from config import SYSTEM_PROMPT
+from services.base_ai_service import BaseAIService
+from services.http_transport import get_async_http_client, get_sync_http_client
+
+logger = logging.getLogger(__name__)
+
+
+class OpenAICompatibleService(BaseAIService):
+    """Gọi Chat Completions API qua OpenAI SDK"""
+
+    def __init__(self, api_key: str, model_name: str, base_url: Optional[str] = None):
+        """
+        Args:
+            api_key: API key của provider
+            model_name: Tên model
+            base_url: Endpoint của provider (None = OpenAI)
+        """
+        super().__init__(model_name)
+        # Retry do BaseAIService đảm nhiệm (backoff có jitter), tắt retry của SDK
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=get_sync_http_client(),
+            max_retries=0
+        )
+        # Client async dùng cho các route FastAPI (không chặn event loop)
+        self.async_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=get_async_http_client(),
+            max_retries=0
+        )
+        logger.info("%s initialized (model: %s, max tokens: %d)", self.display_name, self.model_name, self.max_tokens)
+
+    def build_request(
+        self,
+        message: str,
+        conversation_history: List[Dict],
+        jobs_info: str = "",
+        cv_text: str = "",
+        summary: str = ""
+    ) -> List[Dict]:
+        """
+        Xây dựng danh sách messages cho Chat Completions API
+
+        Args:
+            message: Tin nhắn hiện tại từ user
+            conversation_history: Lịch sử hội thoại trước đó
+            jobs_info: Thông tin công việc từ vector search
+            cv_text: Nội dung CV của người dùng (nếu có)
+            summary: Tóm tắt các lượt chat cũ (nếu có)
+
+        Returns:
+            List[Dict]: Danh sách messages để gửi cho provider
+        """
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+
+        # Thêm thông tin công việc vào system message nếu có
+        if jobs_info:
+            messages.append({
+                "role": "system",
+                "content": f"Các công việc phù hợp từ hệ thống:\n{jobs_info}"
+            })
+        else:
+            messages.append({
+                "role": "system",
+                "content": "Lưu ý: Hiện tại chưa tìm thấy công việc cụ thể trong cơ sở dữ liệu. Hãy tư vấn chung hoặc hỏi thêm thông tin."
+            })
+
+        if cv_text:
+            messages.append({
+                "role": "system",
+                "content": f"Nội dung CV của người dùng (hãy dựa vào CV này khi trả lời):\n{cv_text}"
+            })
+
+        if summary:
+            messages.append({
+                "role": "system",
+                "content": f"Tóm tắt các lượt hội thoại trước đó:\n{summary}"
+            })
+
+        # Thêm lịch sử hội thoại
+        if conversation_history:
+            for msg in conversation_history:
+                messages.append({
+                    "role": msg.get("role", "user"),
+                    "content": msg.get("content", "")
+                })
+
+        # Thêm tin nhắn hiện tại
+        messages.append({"role": "user", "content": message})
+
+        return messages
+
+    def describe_request(self, messages: List[Dict]) -> str:
+        return "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+
+    def _completion_args(self, messages: List[Dict]) -> Dict:
+        return {
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+
+    def _send(self, messages: List[Dict]) -> Any:
+        return self.client.chat.completions.create(**self._completion_args(messages))
+
+    async def _send_async(self, messages: List[Dict]) -> Any:
+        return await self.async_client.chat.completions.create(**self._completion_args(messages))
+
+    def _response_text(self, response: Any) -> str:
+        return response.choices[0].message.content
+
+    def _response_usage(self, response: Any) -> Tuple[Optional[int], Optional[int]]:
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return None, None
+        return usage.prompt_tokens, usage.completion_tokens
+
+    async def _open_stream(self, messages: List[Dict]) -> AsyncIterator[str]:
+        stream = await self.async_client.chat.completions.create(**self._completion_args(messages), stream=True)
+        return self._iter_deltas(stream)
+
+    @staticmethod
+    async def _iter_deltas(stream) -> AsyncIterator[str]:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
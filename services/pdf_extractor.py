@@ -0,0 +1,186 @@
+"""
+PDF Extractor - Trích xuất text PDF trong process pool
+PyPDF2 là code Python thuần, chạy lâu (PDF dài / PDF cố tình gây lỗi) sẽ giữ GIL;
+chạy trong process riêng để không ảnh hưởng tới các request chat khác
+"""
+import logging
+import mmap
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Iterator, List, Optional, Tuple, Union
+
+import PyPDF2
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Nội dung PDF (bytes) hoặc đường dẫn file PDF trên đĩa
+PdfSource = Union[bytes, str]
+
+
+class PdfExtractionError(Exception):
+    """Không đọc được PDF (file lỗi, quá thời gian, hệ thống quá tải)"""
+
+
+# Các hàm chạy trong worker process (phải ở cấp module để pickle được)
+
+@contextmanager
+def _open_reader(pdf_file: PdfSource) -> Iterator[PyPDF2.PdfReader]:
+    """PdfReader từ bytes, hoặc từ file trên đĩa qua mmap (không chép cả file vào bộ nhớ)"""
+    if isinstance(pdf_file, bytes):
+        yield PyPDF2.PdfReader(BytesIO(pdf_file))
+        return
+    with open(pdf_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield PyPDF2.PdfReader(mapped)
+
+
+def _extract_document(pdf_file: PdfSource, max_pages: int) -> Tuple[int, List[str]]:
+    """Đọc PDF một lần: (tổng số trang, text của tối đa max_pages trang đầu)"""
+    with _open_reader(pdf_file) as reader:
+        total_pages = len(reader.pages)
+        return total_pages, [reader.pages[index].extract_text() or "" for index in range(min(total_pages, max_pages))]
+
+
+def _terminate(executor: ProcessPoolExecutor) -> None:
+    """Dừng process của executor (ProcessPoolExecutor không hủy được task đang chạy)"""
+    for process in list((getattr(executor, "_processes", None) or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class PdfExtractor:
+    """
+    Trích xuất text PDF trong các worker process có giới hạn
+
+    - Mỗi tài liệu là một task, chạy trong một worker riêng (không dùng chung với request khác)
+    - Tối đa max_pages trang đầu được đọc, phần còn lại bị bỏ qua
+    - Cả lần gọi (chờ worker + đọc) phải xong trong timeout giây; quá hạn thì chỉ
+      worker của tài liệu đó bị dừng, các tài liệu khác đang đọc không bị ảnh hưởng
+    - workers = 0: đọc trực tiếp trong thread gọi (dùng cho script)
+    """
+
+    def __init__(self, workers: int = 2, timeout: float = 15.0, max_pages: int = 20):
+        """
+        Args:
+            workers: Số worker process, 0 = không dùng process pool
+            timeout: Thời gian tối đa (giây) cho mỗi tài liệu
+            max_pages: Số trang tối đa được đọc
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self._closed = False
+        # Các worker đang rảnh; None = chỗ trống, worker được tạo khi cần (spawn chậm)
+        self._idle: "queue.Queue[Optional[ProcessPoolExecutor]]" = queue.Queue()
+        for _ in range(max(0, workers)):
+            self._idle.put(None)
+
+    def _checkout(self, deadline: float) -> ProcessPoolExecutor:
+        """Lấy một worker rảnh, chờ tối đa tới deadline"""
+        try:
+            executor = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            raise PdfExtractionError("Hệ thống đang xử lý quá nhiều PDF, vui lòng thử lại sau")
+        if executor is None:
+            try:
+                # spawn: không fork process đang có thread (ChromaDB, logging)
+                executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+            except Exception:
+                self._idle.put(None)
+                raise
+        return executor
+
+    def _checkin(self, executor: ProcessPoolExecutor, healthy: bool) -> None:
+        """Trả worker về; worker bị kẹt / hỏng thì dừng và để lần sau tạo mới"""
+        if healthy and not self._closed:
+            self._idle.put(executor)
+            return
+        if healthy:
+            executor.shutdown(wait=False)
+        else:
+            _terminate(executor)
+        self._idle.put(None)
+
+    def shutdown(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                executor = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def extract(self, pdf_file: PdfSource) -> str:
+        """
+        Trích xuất text từ PDF
+
+        Args:
+            pdf_file: Nội dung file PDF dạng bytes, hoặc đường dẫn file PDF
+
+        Returns:
+            str: Text của các trang, nối bằng xuống dòng
+
+        Raises:
+            PdfExtractionError: PDF lỗi, quá thời gian hoặc hệ thống đang quá tải
+        """
+        if self.workers <= 0:
+            try:
+                total_pages, pages = _extract_document(pdf_file, self.max_pages)
+            except Exception as e:
+                raise PdfExtractionError(f"Lỗi khi đọc PDF: {str(e)}") from e
+        else:
+            total_pages, pages = self._extract_in_worker(pdf_file)
+
+        if total_pages > len(pages):
+            logger.warning("PDF có %d trang, chỉ đọc %d trang đầu", total_pages, len(pages))
+        logger.info("Đã đọc PDF", extra={"pages": len(pages)})
+        return "\n".join(pages).strip()
+
+    def _extract_in_worker(self, pdf_file: PdfSource) -> Tuple[int, List[str]]:
+        # Một deadline cho cả lần gọi: chờ worker và đọc không được cộng dồn quá timeout
+        deadline = time.monotonic() + self.timeout
+        executor = self._checkout(deadline)
+        healthy = True
+        try:
+            future = executor.submit(_extract_document, pdf_file, self.max_pages)
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            healthy = False
+            raise PdfExtractionError(f"Đọc PDF quá {self.timeout:g} giây")
+        except BrokenProcessPool as e:
+            # Worker chết giữa chừng (vd: hết bộ nhớ)
+            healthy = False
+            raise PdfExtractionError(f"Lỗi khi đọc PDF: {str(e)}") from e
+        except Exception as e:
+            raise PdfExtractionError(f"Lỗi khi đọc PDF: {str(e)}") from e
+        finally:
+            self._checkin(executor, healthy)
+
+
+# Singleton instance
+_pdf_extractor = None
+
+def get_pdf_extractor() -> PdfExtractor:
+    """Lấy singleton instance của PdfExtractor"""
+    global _pdf_extractor
+    if _pdf_extractor is None:
+        settings = get_settings()
+        _pdf_extractor = PdfExtractor(
+            workers=settings.pdf_workers,
+            timeout=settings.pdf_timeout,
+            max_pages=settings.pdf_max_pages
+        )
+    return _pdf_extractor
+
+
+def shutdown_pdf_extractor() -> None:
+    """Dừng process pool (gọi khi tắt ứng dụng)"""
+    if _pdf_extractor is not None:
+        _pdf_extractor.shutdown()
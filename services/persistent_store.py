@@ -0,0 +1,89 @@
+"""
+Persistent Store - Kho dict theo key: LRU/TTL trong bộ nhớ, tùy chọn lưu xuống SQLite
+Dùng chung cho SessionStore và CVProfileStore
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from services.cache_service import LRUCache
+
+
+class PersistentStore:
+    """
+    Kho lưu các bản ghi dạng dict (in-memory LRU/TTL, tùy chọn lưu xuống SQLite)
+
+    Lớp con khai báo tên bảng (table) và trường chứa khóa của bản ghi (key_field),
+    cột khóa trong SQLite trùng tên với key_field.
+    """
+
+    table = ""
+    key_field = ""
+
+    def __init__(self, max_items: int, ttl_seconds: Optional[float] = None, db_path: str = ""):
+        """
+        Args:
+            max_items: Số bản ghi tối đa giữ trong bộ nhớ
+            ttl_seconds: Thời gian sống của bản ghi không được dùng tới, None = không hết hạn
+            db_path: Đường dẫn file SQLite, rỗng = chỉ lưu trong bộ nhớ
+        """
+        self.ttl_seconds = ttl_seconds
+        self._items = LRUCache(max_size=max_items, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                f"{self.key_field} TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _load(self, key: str) -> Optional[Dict]:
+        """Đọc bản ghi từ SQLite (bỏ qua bản ghi đã hết hạn)"""
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT data, updated_at FROM {self.table} WHERE {self.key_field} = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        data, updated_at = row
+        if self.ttl_seconds and updated_at < time.time() - self.ttl_seconds:
+            self.delete(key)
+            return None
+        return json.loads(data)
+
+    def _save(self, item: Dict) -> None:
+        item["updated_at"] = time.time()
+        key = item[self.key_field]
+        self._items.set(key, item)
+        if self._db is not None:
+            with self._lock:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} ({self.key_field}, data, updated_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(item, ensure_ascii=False), item["updated_at"])
+                )
+                self._db.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Lấy bản ghi theo key, None nếu không tồn tại hoặc đã hết hạn"""
+        item = self._items.get(key)
+        if item is None:
+            item = self._load(key)
+            if item is not None:
+                self._items.set(key, item)
+        return item
+
+    def delete(self, key: str) -> bool:
+        """Xóa bản ghi khỏi bộ nhớ và SQLite, trả về True nếu bản ghi tồn tại"""
+        existed = self._items.delete(key)
+        if self._db is not None:
+            with self._lock:
+                cursor = self._db.execute(f"DELETE FROM {self.table} WHERE {self.key_field} = ?", (key,))
+                self._db.commit()
+            existed = existed or cursor.rowcount > 0
+        return existed
@@ -0,0 +1,204 @@
+"""
+Prompt Builder - Phân bổ token budget cho các phần của prompt
+(system prompt, công việc truy xuất được, trích đoạn CV, lịch sử hội thoại)
+"""
+import math
+import re
+from typing import Dict, List
+
+from config import get_settings, SYSTEM_PROMPT
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    # tiktoken là optional: không có thì dùng ước lượng theo số byte UTF-8
+    _encoding = None
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+# Số token ước tính cho phần khung cố định (tiêu đề section, role, ...)
+_OVERHEAD_TOKENS = 50
+# Mỗi công việc được giữ ít nhất chừng này token, nếu không đủ thì bỏ job xếp hạng thấp
+_MIN_JOB_TOKENS = 40
+# Tin nhắn cũ được nén còn tối đa chừng này token trước khi bị bỏ hẳn
+_COMPRESSED_HISTORY_TOKENS = 60
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Ước lượng số token của text
+
+    Dùng tiktoken nếu đã cài, ngược lại ước lượng ~4 byte UTF-8 / token
+    (tiếng Việt có dấu tốn nhiều byte hơn nên cũng tốn nhiều token hơn).
+    """
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return sum(max(1, math.ceil(len(word.encode("utf-8")) / 4)) for word in _TOKEN_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cắt text theo ranh giới từ để không vượt quá max_tokens"""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Tìm kiếm nhị phân số từ giữ lại được
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(" ".join(words[:mid])) + 1 <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return " ".join(words[:low]) + " …" if low else ""
+
+
+def _keep_last_tokens(text: str, max_tokens: int) -> str:
+    """Giữ các dòng cuối (mới nhất) của text trong giới hạn max_tokens"""
+    kept, used = [], 0
+    for line in reversed(text.split("\n")):
+        tokens = estimate_tokens(line) + 1
+        if used + tokens > max_tokens:
+            break
+        kept.insert(0, line)
+        used += tokens
+    return "\n".join(kept)
+
+
+def build_retrieval_query(message: str, cv_text: str = "", max_cv_chars: int = 1000) -> str:
+    """
+    Tạo query cho vector search: tin nhắn của user, kèm phần đầu CV nếu có
+    (để gợi ý công việc vẫn dựa trên CV khi câu hỏi quá chung chung)
+    """
+    if not cv_text:
+        return message
+    return f"{message}\n{cv_text[:max_cv_chars]}"
+
+
+class PromptAssembler:
+    """
+    Ghép prompt trong giới hạn token budget
+
+    Thứ tự ưu tiên: system prompt và tin nhắn hiện tại luôn được giữ; phần còn
+    lại chia cho công việc (theo thứ hạng), trích đoạn CV và lịch sử. Khi vượt
+    budget, phần ít giá trị nhất bị cắt trước: tin nhắn cũ nhất, công việc xếp
+    hạng thấp nhất, phần cuối của CV.
+    """
+
+    def __init__(
+        self,
+        budget: int = 3000,
+        max_job_tokens: int = 300,
+        jobs_share: float = 0.4,
+        cv_share: float = 0.35
+    ):
+        """
+        Args:
+            budget: Tổng số token tối đa của prompt
+            max_job_tokens: Số token tối đa cho mỗi công việc
+            jobs_share: Tỉ lệ budget còn lại dành cho công việc
+            cv_share: Tỉ lệ budget còn lại dành cho CV
+        """
+        self.budget = budget
+        self.max_job_tokens = max_job_tokens
+        self.jobs_share = jobs_share
+        self.cv_share = cv_share
+
+    def assemble(
+        self,
+        message: str,
+        conversation_history: List[Dict] = None,
+        jobs: List[str] = None,
+        cv_text: str = "",
+        summary: str = ""
+    ) -> Dict:
+        """
+        Chọn và cắt các phần của prompt cho vừa budget
+
+        Args:
+            message: Tin nhắn hiện tại từ user
+            conversation_history: Lịch sử hội thoại
+            jobs: Mô tả công việc truy xuất được (theo thứ tự phù hợp giảm dần)
+            cv_text: Nội dung CV (nếu có)
+            summary: Tóm tắt các lượt chat cũ của session (nếu có)
+
+        Returns:
+            Dict: system_prompt, jobs, cv_text, summary, history, message, token_count, budget
+        """
+        conversation_history = conversation_history or []
+        jobs = jobs or []
+
+        # Tin nhắn hiện tại được giữ, chỉ cắt khi chiếm quá nửa budget
+        message = truncate_to_tokens(message, self.budget // 2)
+        fixed = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(message) + _OVERHEAD_TOKENS
+        available = max(0, self.budget - fixed)
+
+        # 1. Công việc: giữ theo thứ hạng; mỗi job được chia đều budget (tối đa
+        #    max_job_tokens) để một mô tả dài không chiếm chỗ của các job sau
+        jobs_budget = int(available * self.jobs_share)
+        per_job = min(self.max_job_tokens, max(_MIN_JOB_TOKENS, jobs_budget // max(1, len(jobs))))
+        selected_jobs, jobs_used = [], 0
+        for job in jobs:
+            job_text = truncate_to_tokens(job, min(per_job, jobs_budget - jobs_used))
+            if not job_text:
+                break
+            selected_jobs.append(job_text)
+            jobs_used += estimate_tokens(job_text)
+
+        # 2. CV: nhận phần budget của mình cộng với phần công việc không dùng hết
+        cv_budget = int(available * self.cv_share) + (jobs_budget - jobs_used)
+        cv_excerpt = truncate_to_tokens(cv_text, cv_budget) if cv_text else ""
+        cv_used = estimate_tokens(cv_excerpt)
+
+        # 3. Lịch sử: phần còn lại. Bản tóm tắt (nếu có) dùng tối đa 1/3, giữ
+        #    các dòng mới nhất; sau đó lấy tin nhắn từ mới nhất ngược về trước,
+        #    tin nhắn quá dài được nén trước khi bị bỏ
+        history_budget = available - jobs_used - cv_used
+        summary_excerpt = _keep_last_tokens(summary, history_budget // 3) if summary else ""
+        history, history_used = [], estimate_tokens(summary_excerpt)
+        for msg in reversed(conversation_history):
+            content = msg.get("content", "") or ""
+            tokens = estimate_tokens(content) + 4
+            if history_used + tokens > history_budget:
+                content = truncate_to_tokens(content, min(_COMPRESSED_HISTORY_TOKENS, history_budget - history_used - 4))
+                if not content:
+                    break
+                tokens = estimate_tokens(content) + 4
+            history.insert(0, {"role": msg.get("role", "user"), "content": content})
+            history_used += tokens
+
+        # 4. Nếu còn dư (lịch sử ngắn), trả lại cho CV đã bị cắt
+        leftover = history_budget - history_used
+        if cv_text and leftover > 0 and cv_excerpt != cv_text:
+            cv_excerpt = truncate_to_tokens(cv_text, cv_used + leftover)
+            cv_used = estimate_tokens(cv_excerpt)
+
+        return {
+            "system_prompt": SYSTEM_PROMPT,
+            "jobs": selected_jobs,
+            "cv_text": cv_excerpt,
+            "summary": summary_excerpt,
+            "history": history,
+            "message": message,
+            "token_count": fixed + jobs_used + cv_used + history_used,
+            "budget": self.budget
+        }
+
+
+# Singleton instance
+_prompt_assembler = None
+
+def get_prompt_assembler() -> PromptAssembler:
+    """Lấy singleton instance của PromptAssembler"""
+    global _prompt_assembler
+    if _prompt_assembler is None:
+        settings = get_settings()
+        _prompt_assembler = PromptAssembler(
+            budget=settings.prompt_token_budget,
+            max_job_tokens=settings.prompt_max_job_tokens
+        )
+    return _prompt_assembler
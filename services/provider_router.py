@@ -0,0 +1,332 @@
+"""
+Provider Router - Chọn AI provider nhanh nhất đang hoạt động tốt
+Hỗ trợ failover khi timeout/429 và hedged request (gửi thêm request dự phòng)
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+
+from config import get_settings
+from services.admission import QueueFullError, get_admission_stats
+from services.http_transport import is_retryable_error
+from services.metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderStats:
+    """Thống kê latency và lỗi (cửa sổ trượt) của một provider"""
+
+    def __init__(self, window: int = 100):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True = thành công
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+
+    def record_failure(self, cooldown: float = 0.0) -> None:
+        self.outcomes.append(False)
+        if cooldown:
+            self.cooldown_until = time.monotonic() + cooldown
+
+    @property
+    def p50(self) -> Optional[float]:
+        return percentile(list(self.latencies), 50)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return percentile(list(self.latencies), 95)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def is_healthy(self, max_error_rate: float) -> bool:
+        """Provider khỏe nếu không trong thời gian cooldown và tỉ lệ lỗi chấp nhận được"""
+        if time.monotonic() < self.cooldown_until:
+            return False
+        # Cần đủ mẫu mới đánh giá tỉ lệ lỗi, tránh loại provider vì 1 lỗi lẻ
+        return len(self.outcomes) < 5 or self.error_rate <= max_error_rate
+
+
+class ProviderRouter:
+    """
+    Router phân phối request tới các AI service (Gemini/OpenAI/OpenRouter)
+
+    - Ưu tiên provider khỏe có p50 latency thấp nhất (provider chưa có số liệu
+      được thử trước để thu thập latency)
+    - Failover sang provider tiếp theo khi lỗi; timeout/429/5xx còn đưa provider
+      vào cooldown
+    - Nếu hedge_delay > 0: sau hedge_delay giây chưa có kết quả thì gửi thêm
+      request tới provider kế tiếp, lấy câu trả lời về trước
+    """
+
+    def __init__(
+        self,
+        services: Dict,
+        timeout: float = 20.0,
+        hedge_delay: float = 0.0,
+        cooldown: float = 30.0,
+        max_error_rate: float = 0.5
+    ):
+        """
+        Args:
+            services: Map tên provider -> service (có chat_async và chat_stream)
+            timeout: Timeout (giây) cho mỗi lần gọi provider
+            hedge_delay: Độ trễ (giây) trước khi gửi hedged request, 0 = tắt
+            cooldown: Thời gian (giây) tạm ngừng dùng provider sau timeout/429
+            max_error_rate: Tỉ lệ lỗi tối đa để provider còn được coi là khỏe
+        """
+        if not services:
+            raise ValueError("ProviderRouter cần ít nhất một AI service")
+        self.services = services
+        self.timeout = timeout
+        self.hedge_delay = hedge_delay
+        self.cooldown = cooldown
+        self.max_error_rate = max_error_rate
+        self.stats = {name: ProviderStats() for name in services}
+
+    def ranked_providers(self) -> List[str]:
+        """Danh sách provider theo thứ tự ưu tiên; provider không khỏe xếp cuối để dự phòng"""
+        def sort_key(name: str):
+            p50 = self.stats[name].p50
+            return (p50 is not None, p50 or 0.0)
+
+        healthy = [name for name in self.services if self.stats[name].is_healthy(self.max_error_rate)]
+        unhealthy = [name for name in self.services if name not in healthy]
+        return sorted(healthy, key=sort_key) + sorted(unhealthy, key=lambda name: self.stats[name].cooldown_until)
+
+    def _record_failure(self, name: str, exc: BaseException) -> None:
+        if isinstance(exc, QueueFullError):
+            # Hàng đợi phía mình đầy, provider không lỗi: chỉ chuyển provider khác
+            logger.warning("Provider %s đang đầy hàng đợi, chuyển provider khác", name)
+            return
+        retryable = is_retryable_error(exc)
+        self.stats[name].record_failure(self.cooldown if retryable else 0.0)
+        logger.warning("Provider %s lỗi (%s: %s), chuyển provider khác", name, type(exc).__name__, exc)
+
+    async def _call(
+        self,
+        name: str,
+        message: str,
+        conversation_history: List[Dict],
+        cv_text: str,
+        summary: str
+    ) -> str:
+        """
+        Gọi một provider với timeout và ghi nhận latency / lỗi
+
+        Latency chỉ được ghi khi request thực sự tới provider (cache hit hay chờ
+        kết quả dùng chung không phản ánh tốc độ của provider)
+        """
+        stats = self.stats[name]
+        stats.in_flight += 1
+        latencies = []
+        try:
+            # Timeout / bị hủy vì hedge: hủy luôn lời gọi provider (và trả slot admission)
+            response = await asyncio.wait_for(
+                self.services[name].chat_async(
+                    message=message,
+                    conversation_history=conversation_history,
+                    cv_text=cv_text,
+                    summary=summary,
+                    on_latency=latencies.append
+                ),
+                timeout=self.timeout
+            )
+        except asyncio.CancelledError:
+            # Bị hủy vì hedged request khác đã trả về trước: không tính là lỗi
+            raise
+        except Exception as e:
+            self._record_failure(name, e)
+            raise
+        finally:
+            stats.in_flight -= 1
+        if latencies:
+            stats.record_success(latencies[0])
+        return response
+
+    async def chat_async(
+        self,
+        message: str,
+        conversation_history: List[Dict] = None,
+        cv_text: str = "",
+        summary: str = ""
+    ) -> str:
+        """
+        Chat qua provider tốt nhất, failover/hedge khi cần
+
+        Args:
+            message: Tin nhắn từ user
+            conversation_history: Lịch sử hội thoại (optional)
+            cv_text: Nội dung CV người dùng gửi kèm (optional)
+            summary: Tóm tắt các lượt chat cũ của session (optional)
+
+        Returns:
+            str: Response từ provider trả lời thành công đầu tiên
+        """
+        candidates = iter(self.ranked_providers())
+        pending = set()
+        task_names = {}
+        hedged = False
+        last_error: Optional[BaseException] = None
+
+        def launch() -> bool:
+            name = next(candidates, None)
+            if name is None:
+                return False
+            logger.info("Router gửi request tới %s", name)
+            task = asyncio.create_task(self._call(name, message, conversation_history, cv_text, summary))
+            task_names[task] = name
+            pending.add(task)
+            return True
+
+        launch()
+        try:
+            while pending:
+                # Chỉ hedge một lần, khi đang có đúng một request chưa xong
+                wait_timeout = self.hedge_delay if self.hedge_delay > 0 and not hedged and len(pending) == 1 else None
+                done, pending = await asyncio.wait(pending, timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if launch():
+                        logger.info("Sau %ss chưa có kết quả, đã gửi hedged request", self.hedge_delay)
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        if hedged:
+                            logger.info("%s trả lời trước", task_names[task])
+                        return task.result()
+                    last_error = task.exception()
+                # Request lỗi: failover sang provider tiếp theo, giữ số request
+                # song song như trước (1, hoặc 2 nếu đã hedge)
+                while len(pending) < (2 if hedged else 1) and launch():
+                    pass
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error or RuntimeError("Không có AI provider nào khả dụng")
+
+    async def complete_async(self, prompt: str) -> str:
+        """Gửi một prompt đơn lẻ tới provider tốt nhất (failover khi lỗi, không hedge)"""
+        last_error: Optional[BaseException] = None
+        for name in self.ranked_providers():
+            try:
+                return await asyncio.wait_for(self.services[name].complete_async(prompt), timeout=self.timeout)
+            except Exception as e:
+                self._record_failure(name, e)
+                last_error = e
+        raise last_error or RuntimeError("Không có AI provider nào khả dụng")
+
+    async def chat_stream(
+        self,
+        message: str,
+        conversation_history: List[Dict] = None,
+        cv_text: str = "",
+        summary: str = ""
+    ) -> AsyncIterator[str]:
+        """
+        Streaming qua provider tốt nhất
+
+        Failover chỉ xảy ra trước khi token đầu tiên được gửi cho client;
+        lỗi sau đó được ném ra cho route xử lý.
+        """
+        last_error: Optional[BaseException] = None
+        for name in self.ranked_providers():
+            stats = self.stats[name]
+            # Chỉ có latency khi stream thực sự tới provider (cache hit thì không)
+            latencies = []
+            stream = self.services[name].chat_stream(
+                message=message,
+                conversation_history=conversation_history,
+                cv_text=cv_text,
+                summary=summary,
+                on_latency=latencies.append
+            )
+            try:
+                first_token = await asyncio.wait_for(stream.__anext__(), timeout=self.timeout)
+            except StopAsyncIteration:
+                if latencies:
+                    stats.record_success(latencies[0])
+                return
+            except Exception as e:
+                self._record_failure(name, e)
+                last_error = e
+                await stream.aclose()
+                continue
+
+            logger.info("Router stream từ %s", name)
+            yield first_token
+            try:
+                async for token in stream:
+                    yield token
+            except Exception:
+                stats.record_failure()
+                raise
+            if latencies:
+                stats.record_success(latencies[0])
+            return
+
+        raise last_error or RuntimeError("Không có AI provider nào khả dụng")
+
+    def get_stats(self) -> Dict:
+        """Thống kê latency / lỗi theo provider"""
+        result = {}
+        for name in self.services:
+            stats = self.stats[name]
+            result[name] = {
+                "healthy": stats.is_healthy(self.max_error_rate),
+                "p50_latency": round(stats.p50, 3) if stats.p50 is not None else None,
+                "p95_latency": round(stats.p95, 3) if stats.p95 is not None else None,
+                "error_rate": round(stats.error_rate, 3),
+                "samples": len(stats.outcomes),
+                "in_flight": stats.in_flight,
+                "cooldown_remaining": round(max(0.0, stats.cooldown_until - time.monotonic()), 1)
+            }
+        admission = get_admission_stats()
+        for name in result:
+            result[name]["admission"] = admission.get(name)
+        return {"order": self.ranked_providers(), "providers": result}
+
+
+# Singleton instance
+_provider_router = None
+
+def get_provider_router() -> ProviderRouter:
+    """
+    Lấy instance của ProviderRouter (singleton pattern)
+    Chỉ những provider đã cấu hình API key mới được đưa vào router.
+    """
+    global _provider_router
+    if _provider_router is None:
+        from services.gemini_service import get_gemini_service
+        from services.openai_service import get_openai_service
+        from services.openrouter_service import get_openrouter_service
+
+        settings = get_settings()
+        available = {
+            "gemini": (settings.GEMINI_API_KEY, get_gemini_service),
+            "openai": (settings.OPENAI_API_KEY, get_openai_service),
+            "openrouter": (settings.OPENROUTER_API_KEY, get_openrouter_service),
+        }
+        services = {}
+        for name in settings.ai_router_providers:
+            api_key, factory = available.get(name, (None, None))
+            if api_key:
+                services[name] = factory()
+        _provider_router = ProviderRouter(
+            services,
+            timeout=settings.ai_router_timeout,
+            hedge_delay=settings.ai_hedge_delay,
+            cooldown=settings.ai_router_cooldown
+        )
+        logger.info("Provider router initialized (providers: %s)", ", ".join(services))
+    return _provider_router
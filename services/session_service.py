@@ -0,0 +1,244 @@
+"""
+Session Service - Lưu phiên chat phía server
+Giữ lịch sử gần đây, nội dung CV và bản tóm tắt các lượt chat cũ theo session ID.
+Tin nhắn bị đẩy khỏi lịch sử được gom lại, mỗi khi đủ một cửa sổ thì LLM viết lại
+bản tóm tắt một lần (bản tóm tắt cũ + các tin nhắn mới), độ dài có giới hạn
+"""
+import logging
+import re
+import secrets
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config import get_settings
+from services.persistent_store import PersistentStore
+
+logger = logging.getLogger(__name__)
+
+# Độ dài tối đa của một dòng trích đoạn (tin nhắn cũ chưa được LLM tóm tắt)
+_EXCERPT_LINE_CHARS = 200
+# Tin nhắn cũ chờ tóm tắt được lưu tối đa ngần này ký tự mỗi tin
+_PENDING_MESSAGE_CHARS = 1000
+# Session ID do server sinh (secrets.token_urlsafe(32)); ID khác dạng này không bao giờ được nhận
+_SESSION_ID_RE = re.compile(r"[A-Za-z0-9_-]{43}")
+
+
+def _shorten(text: str, max_chars: int) -> str:
+    """Gộp khoảng trắng, cắt tại ranh giới từ nếu dài hơn max_chars"""
+    text = re.sub(r"\s+", " ", text or "").strip()
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(" ", 1)[0] + " …"
+    return text
+
+
+def _keep_tail(text: str, max_chars: int) -> str:
+    """Giữ phần cuối (mới nhất) của text trong max_chars, bắt đầu từ đầu một dòng nếu được"""
+    if len(text) <= max_chars:
+        return text
+    tail = text[-max_chars:]
+    newline = tail.find("\n")
+    return tail[newline + 1:] if 0 <= newline < len(tail) - 1 else tail
+
+
+def excerpt_message(msg: Dict, max_chars: int = _EXCERPT_LINE_CHARS) -> str:
+    """
+    Trích một dòng từ tin nhắn cũ (câu đầu tiên, tối đa max_chars), dùng khi tin nhắn
+    chưa được LLM tóm tắt
+    """
+    role = "User" if msg.get("role") == "user" else "Assistant"
+    content = re.sub(r"\s+", " ", msg.get("content", "") or "").strip()
+    first_sentence = re.split(r"(?<=[.!?])\s", content, maxsplit=1)[0]
+    return f"{role}: {_shorten(first_sentence, max_chars)}"
+
+
+def build_summary_prompt(summary: str, messages: List[Dict], max_chars: int) -> str:
+    """Prompt yêu cầu LLM viết lại bản tóm tắt từ bản cũ và các tin nhắn mới bị đẩy khỏi lịch sử"""
+    lines = [
+        f"{'Người dùng' if msg.get('role') == 'user' else 'Trợ lý'}: {msg.get('content', '')}"
+        for msg in messages
+    ]
+    return (
+        f"Hãy cập nhật bản tóm tắt cuộc trò chuyện tìm việc dưới đây, tối đa {max_chars} ký tự. "
+        "Giữ lại thông tin về người dùng (vị trí, kỹ năng, kinh nghiệm, địa điểm, mức lương mong muốn), "
+        "các công việc đã được gợi ý và những yêu cầu còn dang dở. Chỉ trả về bản tóm tắt.\n\n"
+        f"Bản tóm tắt hiện tại:\n{summary or '(chưa có)'}\n\n"
+        "Các tin nhắn mới:\n" + "\n".join(lines)
+    )
+
+
+class SessionStore(PersistentStore):
+    """
+    Kho lưu phiên chat (in-memory LRU/TTL, tùy chọn lưu xuống SQLite)
+
+    Mỗi session là dict gồm: session_id, history (các tin nhắn gần nhất),
+    cv_text, summary (bản tóm tắt do LLM viết), pending (tin nhắn cũ đã bị đẩy
+    khỏi history nhưng chưa được tóm tắt), created_at, updated_at.
+    """
+
+    table = "chat_sessions"
+    key_field = "session_id"
+
+    def __init__(
+        self,
+        max_recent_messages: int = 10,
+        summary_max_chars: int = 2000,
+        max_sessions: int = 10000,
+        ttl_seconds: Optional[float] = 86400,
+        db_path: str = "",
+        summary_window: int = 10
+    ):
+        """
+        Args:
+            max_recent_messages: Số tin nhắn giữ nguyên văn; cũ hơn sẽ được tóm tắt
+            summary_max_chars: Độ dài tối đa của bản tóm tắt
+            max_sessions: Số session tối đa giữ trong bộ nhớ
+            ttl_seconds: Thời gian sống của session không hoạt động
+            db_path: Đường dẫn file SQLite để lưu session, rỗng = chỉ lưu trong bộ nhớ
+            summary_window: Số tin nhắn cũ gom lại cho mỗi lần LLM tóm tắt
+        """
+        self.max_recent_messages = max_recent_messages
+        self.summary_max_chars = summary_max_chars
+        self.summary_window = max(1, summary_window)
+        # Các session đang được tóm tắt (tránh gọi LLM hai lần cho cùng một cửa sổ)
+        self._summarizing = set()
+        super().__init__(max_items=max_sessions, ttl_seconds=ttl_seconds, db_path=db_path)
+
+    def create(self, history: List[Dict] = None) -> Dict:
+        """
+        Tạo session mới với ID ngẫu nhiên do server sinh (client không tự chọn được ID,
+        nên không đoán được ID để đọc lịch sử / CV của người khác)
+
+        Args:
+            history: Lịch sử ban đầu (vd: client chuyển từ chế độ gửi cả lịch sử)
+        """
+        now = time.time()
+        session = {
+            "session_id": secrets.token_urlsafe(32),
+            "history": [],
+            "cv_text": "",
+            "summary": "",
+            "pending": [],
+            "created_at": now,
+            "updated_at": now
+        }
+        for msg in history or []:
+            self._append(session, msg.get("role", "user"), msg.get("content", ""))
+        self._save(session)
+        return session
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """Lấy session theo ID, None nếu ID không do server cấp, không tồn tại hoặc đã hết hạn"""
+        if not _SESSION_ID_RE.fullmatch(session_id or ""):
+            return None
+        return super().get(session_id)
+
+    def _append(self, session: Dict, role: str, content: str) -> None:
+        """Thêm tin nhắn, tin nhắn cũ nhất vượt giới hạn history được đưa vào hàng chờ tóm tắt"""
+        session["history"].append({"role": role, "content": content})
+        overflow = len(session["history"]) - self.max_recent_messages
+        if overflow <= 0:
+            return
+        pending = session.setdefault("pending", [])
+        for msg in session["history"][:overflow]:
+            pending.append({"role": msg["role"], "content": _shorten(msg["content"], _PENDING_MESSAGE_CHARS)})
+        session["history"] = session["history"][overflow:]
+        # LLM không theo kịp (lỗi / chậm): gộp phần dư dạng trích đoạn vào bản tóm tắt
+        # để hàng chờ không vượt quá hai cửa sổ
+        excess = len(pending) - 2 * self.summary_window
+        if excess > 0:
+            lines = [session["summary"]] if session["summary"] else []
+            lines.extend(excerpt_message(msg) for msg in pending[:excess])
+            session["summary"] = _keep_tail("\n".join(lines), self.summary_max_chars)
+            del pending[:excess]
+
+    def context_summary(self, session: Dict) -> str:
+        """
+        Phần tóm tắt đưa vào prompt: bản tóm tắt của LLM + trích đoạn các tin nhắn
+        chưa được tóm tắt (tối đa hai cửa sổ)
+        """
+        lines = [session["summary"]] if session["summary"] else []
+        lines.extend(excerpt_message(msg) for msg in session.get("pending", []))
+        return "\n".join(lines)
+
+    def summary_due(self, session_id: str) -> bool:
+        """Đã gom đủ một cửa sổ tin nhắn cũ và chưa có lần tóm tắt nào đang chạy"""
+        session = self.get(session_id)
+        return (
+            session is not None
+            and session_id not in self._summarizing
+            and len(session.get("pending", [])) >= self.summary_window
+        )
+
+    async def summarize(self, session_id: str, complete: Callable[[str], Awaitable[str]]) -> bool:
+        """
+        Gọi LLM viết lại bản tóm tắt từ bản cũ và một cửa sổ tin nhắn đang chờ
+
+        Args:
+            session_id: ID phiên chat
+            complete: Hàm gửi một prompt tới LLM và trả về text (vd: ai_service.complete_async)
+
+        Returns:
+            bool: True nếu bản tóm tắt được cập nhật
+        """
+        session = self.get(session_id)
+        if session is None or session_id in self._summarizing:
+            return False
+        batch = list(session.get("pending", [])[:self.summary_window])
+        if not batch:
+            return False
+        self._summarizing.add(session_id)
+        try:
+            summary = await complete(build_summary_prompt(session["summary"], batch, self.summary_max_chars))
+        except Exception as e:
+            # Giữ nguyên hàng chờ: lần sau thử lại, hoặc được gộp dạng trích đoạn khi quá dài
+            logger.warning("Không tóm tắt được session %s: %s", session_id, e)
+            return False
+        finally:
+            self._summarizing.discard(session_id)
+
+        session = self.get(session_id)
+        # Hàng chờ đã đổi đầu (bị gộp dạng trích đoạn trong lúc chờ LLM): bỏ kết quả này
+        if session is None or session.get("pending", [])[:len(batch)] != batch or not summary.strip():
+            return False
+        session["summary"] = _keep_tail(summary.strip(), self.summary_max_chars)
+        del session["pending"][:len(batch)]
+        self._save(session)
+        logger.info("Đã tóm tắt session %s", session_id, extra={"messages": len(batch), "chars": len(session["summary"])})
+        return True
+
+    def append_turn(self, session_id: str, user_message: str, assistant_message: str) -> bool:
+        """Ghi một lượt hỏi-đáp vào session, False nếu session không còn (bị xóa / hết hạn)"""
+        session = self.get(session_id)
+        if session is None:
+            return False
+        self._append(session, "user", user_message)
+        self._append(session, "assistant", assistant_message)
+        self._save(session)
+        return True
+
+    def set_cv(self, session_id: str, cv_text: str) -> bool:
+        """Lưu nội dung CV cho session (dùng lại ở các lượt sau), False nếu session không còn"""
+        session = self.get(session_id)
+        if session is None:
+            return False
+        session["cv_text"] = cv_text
+        self._save(session)
+        return True
+
+# Singleton instance
+_session_store = None
+
+def get_session_store() -> SessionStore:
+    """Lấy singleton instance của SessionStore"""
+    global _session_store
+    if _session_store is None:
+        settings = get_settings()
+        _session_store = SessionStore(
+            max_recent_messages=settings.session_max_recent_messages,
+            summary_max_chars=settings.session_summary_max_chars,
+            max_sessions=settings.session_max_sessions,
+            ttl_seconds=settings.session_ttl,
+            db_path=settings.session_db_path,
+            summary_window=settings.session_summary_window
+        )
+    return _session_store
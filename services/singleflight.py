@@ -0,0 +1,108 @@
+"""
+Single-flight - Gộp các lời gọi giống nhau đang chạy đồng thời
+Các request trùng key trong lúc lời gọi đầu tiên chưa xong sẽ chờ và dùng chung kết quả
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Single-flight cho code đồng bộ (chạy trong nhiều thread)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Dict] = {}
+        self.shared = 0  # Số lời gọi được phục vụ bằng kết quả dùng chung
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Gọi fn() một lần cho mỗi key đang chạy
+
+        Args:
+            key: Key nhận diện lời gọi
+            fn: Hàm thực hiện lời gọi thật
+
+        Returns:
+            Kết quả của fn() (hoặc ném lại exception của nó)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["event"].set()
+
+
+class AsyncSingleFlight:
+    """Single-flight cho coroutine (trong cùng một event loop)"""
+
+    def __init__(self):
+        # key -> {"task": task chạy lời gọi thật, "waiters": số request đang chờ task}
+        self._calls: Dict[Hashable, Dict] = {}
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() một lần cho mỗi key đang chạy
+
+        Lời gọi thật chạy trong task riêng: một request bị hủy (client ngắt
+        kết nối, timeout) không làm hủy kết quả mà các request khác đang chờ.
+        Khi request chờ cuối cùng bị hủy thì lời gọi thật cũng bị hủy
+        (không để lời gọi mồ côi tiếp tục giữ slot của provider).
+
+        Args:
+            key: Key nhận diện lời gọi
+            fn: Hàm trả về coroutine thực hiện lời gọi thật
+
+        Returns:
+            Kết quả của fn() (hoặc ném lại exception của nó)
+        """
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(fn())
+            call = {"task": task, "waiters": 0}
+            self._calls[key] = call
+            task.add_done_callback(lambda done: self._on_done(key, done))
+        else:
+            self.shared += 1
+        call["waiters"] += 1
+        try:
+            return await asyncio.shield(call["task"])
+        except asyncio.CancelledError:
+            if call["waiters"] == 1 and not call["task"].done():
+                # Request đến sau phải tạo lời gọi mới thay vì chờ task đang bị hủy
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call["task"].cancel()
+            raise
+        finally:
+            call["waiters"] -= 1
+
+    def _on_done(self, key: Hashable, task: asyncio.Future) -> None:
+        call = self._calls.get(key)
+        if call is not None and call["task"] is task:
+            del self._calls[key]
+        # Đánh dấu exception đã được xử lý khi mọi request chờ đã bị hủy
+        if not task.cancelled():
+            task.exception()
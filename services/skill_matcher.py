@@ -0,0 +1,112 @@
+"""
+Skill Matcher - Trích xuất kỹ năng từ text theo danh mục kỹ năng (data/skills_taxonomy.json)
+Text được tách thành token một lần, mỗi vị trí tra dictionary theo cụm token dài nhất
+=> chi phí O(số token × độ dài cụm dài nhất), không phụ thuộc số kỹ năng trong danh mục
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import get_settings
+from services.job_text import tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAXONOMY_PATH = Path(__file__).resolve().parent.parent / "data" / "skills_taxonomy.json"
+
+
+class SkillMatcher:
+    """So khớp kỹ năng theo ranh giới từ, ưu tiên cụm dài nhất ("react native" trước "react")"""
+
+    def __init__(self, skills: List[Dict], version: int = 0):
+        """
+        Args:
+            skills: Danh sách kỹ năng dạng {"name", "category", "aliases", "exact"}
+            version: Phiên bản của danh mục
+        """
+        self.version = version
+        self.categories: Dict[str, str] = {}
+        # Cụm token (lowercase) -> tên kỹ năng
+        self._phrases: Dict[Tuple[str, ...], str] = {}
+        # Cụm token giữ nguyên hoa/thường -> tên kỹ năng (cho các tên dễ nhầm như "Go", "AI")
+        self._exact: Dict[Tuple[str, ...], str] = {}
+        self.max_phrase_len = 1
+
+        for skill in skills:
+            name = skill["name"]
+            self.categories[name] = skill.get("category", "")
+            for alias in skill.get("aliases", []):
+                self._add(self._phrases, tuple(token.lower() for token in tokenize(alias)), name)
+            for form in skill.get("exact", []):
+                self._add(self._exact, tuple(tokenize(form)), name)
+
+    def _add(self, index: Dict[Tuple[str, ...], str], phrase: Tuple[str, ...], name: str) -> None:
+        if not phrase:
+            logger.warning("Bỏ qua alias rỗng của kỹ năng %s", name)
+            return
+        existing = index.setdefault(phrase, name)
+        if existing != name:
+            logger.warning("Alias %r đã thuộc về %s, bỏ qua cho %s", " ".join(phrase), existing, name)
+        self.max_phrase_len = max(self.max_phrase_len, len(phrase))
+
+    @classmethod
+    def from_file(cls, path: Path) -> "SkillMatcher":
+        """
+        Đọc danh mục kỹ năng từ file JSON
+
+        Args:
+            path: Đường dẫn file JSON ({"version": int, "skills": [...]})
+
+        Returns:
+            SkillMatcher: Matcher đã được build
+        """
+        with open(path, encoding="utf-8") as f:
+            taxonomy = json.load(f)
+        matcher = cls(taxonomy["skills"], version=taxonomy.get("version", 0))
+        logger.info(
+            "Đã tải danh mục kỹ năng",
+            extra={"path": str(path), "version": matcher.version, "skills": len(matcher.categories)}
+        )
+        return matcher
+
+    def find(self, text: str) -> List[str]:
+        """
+        Tìm các kỹ năng xuất hiện trong text
+
+        Args:
+            text: Nội dung CV (hoặc mô tả công việc)
+
+        Returns:
+            List[str]: Tên chuẩn của các kỹ năng, theo thứ tự xuất hiện đầu tiên, không trùng lặp
+        """
+        tokens = tokenize(text)
+        lowered = [token.lower() for token in tokens]
+        found: Dict[str, None] = {}
+        position = 0
+        count = len(tokens)
+
+        while position < count:
+            step = 1
+            for size in range(min(self.max_phrase_len, count - position), 0, -1):
+                end = position + size
+                name = self._phrases.get(tuple(lowered[position:end])) or self._exact.get(tuple(tokens[position:end]))
+                if name:
+                    found.setdefault(name)
+                    step = size
+                    break
+            position += step
+
+        return list(found)
+
+
+# Singleton instance
+_skill_matcher: Optional[SkillMatcher] = None
+
+def get_skill_matcher() -> SkillMatcher:
+    """Lấy singleton instance của SkillMatcher (đọc danh mục theo cấu hình skills_taxonomy_path)"""
+    global _skill_matcher
+    if _skill_matcher is None:
+        path = get_settings().skills_taxonomy_path
+        _skill_matcher = SkillMatcher.from_file(Path(path) if path else DEFAULT_TAXONOMY_PATH)
+    return _skill_matcher
@@ -0,0 +1,269 @@
+"""
+Upload Service - Nhận file CV upload theo kiểu streaming, có giới hạn dung lượng
+File được chép từng phần vào bộ nhớ / file tạm (không đọc cả file vào RAM),
+kiểm tra magic bytes trước khi parse và tính SHA-256 trong lúc chép
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from io import BytesIO
+from typing import AsyncIterator, Dict, Optional, Union
+
+from fastapi import UploadFile
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+PDF_MAGIC = b"%PDF-"
+# Theo chuẩn PDF, header có thể nằm trong 1024 byte đầu tiên
+PDF_MAGIC_WINDOW = 1024
+PDF_CONTENT_TYPES = {"application/pdf", "application/x-pdf", "application/octet-stream", ""}
+ZIP_MAGIC = b"PK\x03\x04"
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed", "application/octet-stream", ""}
+# Phần dư cho các field khác của form multipart (message, lịch sử hội thoại, ...)
+FORM_OVERHEAD_BYTES = 1024 * 1024
+
+
+class UploadRejectedError(Exception):
+    """File upload không hợp lệ (quá lớn, sai định dạng, rỗng)"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class SpooledUpload:
+    """
+    File upload đã được chép xong
+
+    File nhỏ nằm trong bộ nhớ, file lớn hơn spool_max_memory được ghi ra file tạm
+    (worker đọc PDF sẽ mmap file đó thay vì nhận bytes)
+    """
+
+    def __init__(self, spool_max_memory: int):
+        self.spool_max_memory = spool_max_memory
+        self.size = 0
+        self.digest = ""
+        self.path: Optional[str] = None
+        self._buffer: Optional[BytesIO] = BytesIO()
+        self._file = None
+        self._hash = hashlib.sha256()
+
+    def write(self, chunk: bytes) -> None:
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        if self._buffer is not None and self.size > self.spool_max_memory:
+            self._rollover()
+        (self._file or self._buffer).write(chunk)
+
+    def _rollover(self) -> None:
+        fd, self.path = tempfile.mkstemp(prefix="cv_upload_", suffix=".pdf")
+        self._file = os.fdopen(fd, "wb")
+        self._file.write(self._buffer.getvalue())
+        self._buffer = None
+
+    def finish(self) -> None:
+        self.digest = self._hash.hexdigest()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        """Nội dung (bytes) nếu file nằm trong bộ nhớ, ngược lại là đường dẫn file tạm"""
+        return self.path if self.path else self._buffer.getvalue()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except OSError as e:
+                logger.warning("Không xóa được file tạm %s: %s", self.path, e)
+            self.path = None
+        self._buffer = None
+
+
+def format_size(size: int) -> str:
+    return f"{size / (1024 * 1024):.0f}MB" if size >= 1024 * 1024 else f"{size // 1024}KB"
+
+
+def _check_content_type(file: UploadFile, allowed: set, label: str) -> None:
+    content_type = (file.content_type or "").split(";")[0].strip().lower()
+    if content_type not in allowed:
+        raise UploadRejectedError(415, f"Chỉ chấp nhận file {label} (content-type: {content_type})")
+
+
+# Loại file được nhận: (content-type hợp lệ, magic bytes, số byte đầu để tìm magic, tên hiển thị)
+UPLOAD_KINDS = {
+    "pdf": (PDF_CONTENT_TYPES, PDF_MAGIC, PDF_MAGIC_WINDOW, "PDF"),
+    "zip": (ZIP_CONTENT_TYPES, ZIP_MAGIC, len(ZIP_MAGIC), "ZIP"),
+}
+
+
+async def receive_upload(
+    file: UploadFile,
+    kind: str = "pdf",
+    max_bytes: Optional[int] = None,
+    spool_max_memory: Optional[int] = None
+) -> SpooledUpload:
+    """
+    Chép file upload theo từng phần; người gọi phải close() kết quả
+
+    Args:
+        file: File upload từ FastAPI
+        kind: Loại file ("pdf" hoặc "zip"), dùng để kiểm tra content-type và magic bytes
+        max_bytes: Dung lượng tối đa (None = theo cấu hình upload_max_bytes)
+        spool_max_memory: Ngưỡng ghi ra file tạm (None = theo cấu hình, 0 = luôn ghi ra đĩa)
+
+    Returns:
+        SpooledUpload: File đã chép, kèm size và digest SHA-256
+
+    Raises:
+        UploadRejectedError: 413 nếu quá lớn, 415 nếu sai định dạng, 400 nếu file rỗng
+    """
+    settings = get_settings()
+    content_types, magic, magic_window, label = UPLOAD_KINDS[kind]
+    max_bytes = max_bytes or settings.upload_max_bytes
+    if spool_max_memory is None:
+        spool_max_memory = settings.upload_spool_max_memory
+    _check_content_type(file, content_types, label)
+    # Starlette đã biết size khi parse form: từ chối ngay, không cần chép
+    if file.size is not None and file.size > max_bytes:
+        raise UploadRejectedError(413, f"File vượt quá {format_size(max_bytes)}")
+
+    upload = SpooledUpload(spool_max_memory)
+    try:
+        head = b""
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            if len(head) < magic_window:
+                head += chunk[:magic_window - len(head)]
+                if len(head) >= magic_window and magic not in head:
+                    raise UploadRejectedError(415, f"File không phải {label} hợp lệ")
+            if upload.size + len(chunk) > max_bytes:
+                raise UploadRejectedError(413, f"File vượt quá {format_size(max_bytes)}")
+            upload.write(chunk)
+        upload.finish()
+
+        if upload.size == 0:
+            raise UploadRejectedError(400, "File rỗng")
+        if magic not in head:
+            raise UploadRejectedError(415, f"File không phải {label} hợp lệ")
+    except BaseException:
+        upload.close()
+        raise
+
+    logger.info("Đã nhận file upload", extra={"bytes": upload.size, "on_disk": upload.path is not None})
+    return upload
+
+
+@asynccontextmanager
+async def spool_pdf_upload(file: UploadFile, max_bytes: Optional[int] = None) -> AsyncIterator[SpooledUpload]:
+    """
+    Chép file PDF upload theo từng phần, file tạm được xóa khi ra khỏi khối `async with`
+
+    Args:
+        file: File upload từ FastAPI
+        max_bytes: Dung lượng tối đa (None = theo cấu hình upload_max_bytes)
+
+    Yields:
+        SpooledUpload: File đã chép, kèm size và digest SHA-256
+
+    Raises:
+        UploadRejectedError: 413 nếu quá lớn, 415 nếu không phải PDF, 400 nếu file rỗng
+    """
+    upload = await receive_upload(file, "pdf", max_bytes)
+    try:
+        yield upload
+    finally:
+        upload.close()
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Từ chối request multipart quá lớn bằng 413 trước khi FastAPI parse form
+
+    - Có Content-Length: kiểm tra ngay từ header
+    - Không có (chunked): đếm số byte nhận được, vượt giới hạn thì dừng đọc
+    - path_limits: giới hạn riêng cho từng path (vd: endpoint upload nhiều CV)
+    """
+
+    def __init__(self, app, max_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes + FORM_OVERHEAD_BYTES
+        self.path_limits = {path: limit + FORM_OVERHEAD_BYTES for path, limit in (path_limits or {}).items()}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.path_limits.get(scope.get("path", ""), self.max_bytes)
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+            await self._reject(send, max_bytes)
+            return
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    too_large = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def limited_send(message):
+            nonlocal response_started
+            # FastAPI có thể đổi lỗi đọc body thành 400, thay bằng 413
+            if too_large:
+                if message["type"] == "http.response.start" and not response_started:
+                    response_started = True
+                    await self._reject(send, max_bytes)
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except _BodyTooLarge:
+            if not response_started:
+                await self._reject(send, max_bytes)
+
+    async def _reject(self, send, max_bytes: int) -> None:
+        body = ('{"detail":"Request vượt quá %s"}' % format_size(max_bytes)).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,29 +1,519 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
 import chromadb
+from typing import Callable, Dict, List, Optional, Tuple
 from chromadb.utils import embedding_functions
+from config import get_settings
+from services.bm25_index import BM25Index
+from services.cache_service import LRUCache
+from services.singleflight import AsyncSingleFlight, SingleFlight
+from services.metrics import stage_duration, record_cache
+
+logger = logging.getLogger(__name__)
 
 # Khởi tạo ChromaDB persistent client
-client = chromadb.PersistentClient(path="d:/D_CNTT/TTCS/AIJobHunter/vector_db")
-collection = client.get_or_create_collection("jobs")
+VECTOR_DB_PATH = "d:/D_CNTT/TTCS/AIJobHunter/vector_db"
+client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
+# Embedding function mặc định của Chroma, giữ tham chiếu để tự tính embedding cho query (hồ sơ CV)
+embedding_function = embedding_functions.DefaultEmbeddingFunction()
+collection = client.get_or_create_collection("jobs", embedding_function=embedding_function)
+
+# Các callback được gọi khi job bị ghi lại (vd: để invalidate cache)
+_job_update_listeners: List[Callable[[List[str]], None]] = []
+
+def register_job_update_listener(callback: Callable[[List[str]], None]):
+    """Đăng ký callback nhận danh sách job_id mỗi khi job được upsert hoặc bị xóa"""
+    _job_update_listeners.append(callback)
+
+# Cache kết quả truy xuất: (query, top_k, filters, version) -> ids/documents/distances
+# Mỗi lần ghi, version tăng lên nên các kết quả cũ không bao giờ được trả về nữa
+_settings = get_settings()
+_retrieval_cache = LRUCache(
+    max_size=_settings.retrieval_cache_max_size,
+    ttl_seconds=_settings.retrieval_cache_ttl
+)
+_data_version = 0
+_version_lock = threading.Lock()
+
+# Chỉ mục từ khóa BM25 trên cùng các văn bản với collection (tìm kiếm lai, xem search_jobs),
+# lưu cạnh thư mục vector_db. Mọi lần ghi / xóa job cập nhật chỉ mục ngay sau khi ghi vào Chroma
+lexical_index = BM25Index(
+    _settings.bm25_index_path or os.path.join(os.path.dirname(VECTOR_DB_PATH), "bm25_index.db")
+)
+_lexical_lock = threading.Lock()
+
+# Gộp các query giống hệt nhau đang chạy đồng thời thành một lần gọi Chroma
+_inflight_queries = SingleFlight()
+_inflight_queries_async = AsyncSingleFlight()
+
+def _bump_data_version():
+    """Đánh dấu dữ liệu vector DB đã thay đổi và bỏ toàn bộ kết quả truy xuất cũ"""
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+    _retrieval_cache.clear()
+
+def get_retrieval_cache_stats() -> Dict:
+    """Thống kê retrieval cache"""
+    hits, misses = _retrieval_cache.hits, _retrieval_cache.misses
+    total = hits + misses
+    return {
+        "enabled": _settings.retrieval_cache_enabled,
+        "entries": len(_retrieval_cache),
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+        "coalesced": _inflight_queries.shared + _inflight_queries_async.shared,
+        "data_version": _data_version
+    }
+
+def _index_lexical(documents: List[Tuple[str, str]]):
+    """
+    Cập nhật chỉ mục BM25 ngay sau khi ghi vào Chroma.
+    Lỗi không làm hỏng lần ghi: chỉ mục bị đánh dấu cần xây lại ở lần tìm kiếm sau
+    """
+    try:
+        lexical_index.upsert(documents)
+    except Exception:
+        logger.exception("Lỗi khi cập nhật chỉ mục BM25, sẽ xây lại")
+        _invalidate_lexical()
+
+def _unindex_lexical(job_ids: List[str]):
+    """Xóa job khỏi chỉ mục BM25 ngay sau khi xóa khỏi Chroma"""
+    try:
+        lexical_index.delete(job_ids)
+    except Exception:
+        logger.exception("Lỗi khi xóa khỏi chỉ mục BM25, sẽ xây lại")
+        _invalidate_lexical()
+
+def _invalidate_lexical():
+    try:
+        lexical_index.invalidate()
+    except Exception:
+        logger.exception("Không đánh dấu được chỉ mục BM25 cần xây lại")
+
+def _lexical_documents():
+    """Tất cả (job_id, document) trong collection, đọc theo trang"""
+    total = collection.count()
+    for offset in range(0, total, _settings.vector_batch_size):
+        page = collection.get(include=["documents"], limit=_settings.vector_batch_size, offset=offset)
+        yield from zip(page["ids"], page["documents"])
+
+def _ensure_lexical_index():
+    """
+    Xây lại chỉ mục BM25 từ collection khi chỉ mục chưa từng được xây (lần đầu bật tìm kiếm lai,
+    file chỉ mục bị xóa), bị đánh dấu hỏng hoặc được tạo bằng TOKENIZER_VERSION cũ
+    """
+    if not lexical_index.needs_rebuild:
+        return
+    with _lexical_lock:
+        if not lexical_index.needs_rebuild:
+            return
+        started = time.perf_counter()
+        # rebuild giữ lock của chỉ mục suốt quá trình: job ghi đồng thời được áp dụng sau đó
+        lexical_index.rebuild(_lexical_documents())
+        logger.info(
+            "Đã xây lại chỉ mục BM25 từ vector DB",
+            extra={"documents": len(lexical_index), "seconds": round(time.perf_counter() - started, 3)}
+        )
+
+def get_data_version() -> int:
+    """Version dữ liệu vector DB, tăng sau mỗi lần ghi / xóa job"""
+    return _data_version
+
+def _notify_job_update(job_ids: List[str]):
+    _bump_data_version()
+    for callback in _job_update_listeners:
+        try:
+            callback(job_ids)
+        except Exception as e:
+            logger.exception("Lỗi khi gọi job update listener: %s", e)
+
+# Hash nội dung đã chuẩn hóa của job, lưu trong metadata để bỏ qua việc embed lại job không đổi
+CONTENT_HASH_KEY = "content_hash"
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def _content_hash(job_text: str) -> str:
+    """SHA-256 của text đã chuẩn hóa (NFC, gộp khoảng trắng) để khác biệt định dạng không bị tính là thay đổi"""
+    normalized = _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", job_text)).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def _stored_metadatas(job_ids: List[str]) -> Dict[str, Dict]:
+    """Metadata hiện có trong vector DB của các job (job chưa có thì không nằm trong kết quả)"""
+    stored = collection.get(ids=job_ids, include=["metadatas"])
+    return {job_id: metadata or {} for job_id, metadata in zip(stored["ids"], stored["metadatas"])}
+
+def _metadata_matches(stored: Dict, metadata: Optional[Dict]) -> bool:
+    """Metadata mới đã có sẵn trong vector DB chưa (giá trị None = key không tồn tại)"""
+    return all(stored.get(key) == value for key, value in (metadata or {}).items())
 
 # Hàm thêm công việc vào vector DB
-def add_job_to_vector(job_id: str, job_text: str):
+def add_job_to_vector(job_id: str, job_text: str, metadata: Optional[Dict] = None, force: bool = False) -> bool:
     """
     Thêm hoặc cập nhật công việc vào vector DB.
     Sử dụng upsert để tự động update nếu job_id đã tồn tại.
+    metadata (từ build_job_metadata) dùng để lọc khi tìm kiếm, None = giữ metadata cũ.
+    Nếu text không đổi (cùng content hash) thì không embed lại, chỉ cập nhật metadata khi khác.
+    
+    Args:
+        force: Luôn embed lại (vd: sau khi đổi embedding model)
+        
+    Returns:
+        bool: True nếu job được embed và ghi lại, False nếu nội dung không đổi
     """
+    text_hash = _content_hash(job_text)
+    stored = None if force else _stored_metadatas([job_id]).get(job_id)
+    if stored is not None and stored.get(CONTENT_HASH_KEY) == text_hash:
+        if not _metadata_matches(stored, metadata):
+            collection.update(ids=[job_id], metadatas=[metadata])
+            _notify_job_update([job_id])
+        return False
+    
     collection.upsert(
         documents=[job_text],
-        ids=[job_id]
+        ids=[job_id],
+        metadatas=[{**(metadata or {}), CONTENT_HASH_KEY: text_hash}]
     )
+    _index_lexical([(job_id, job_text)])
+    _notify_job_update([job_id])
+    return True
+
+def add_jobs_to_vector(
+    jobs: List[Tuple],
+    batch_size: Optional[int] = None,
+    on_batch: Optional[Callable[[Dict], None]] = None,
+    force: bool = False
+) -> Dict:
+    """
+    Thêm hoặc cập nhật nhiều công việc vào vector DB theo từng batch
+    (mỗi batch một lần tính embedding và một lần upsert, thay vì từng job một).
+    Job có text không đổi so với bản trong vector DB (cùng content hash) không bị embed lại,
+    nên đồng bộ lại toàn bộ chỉ tốn thời gian cho các job thực sự thay đổi.
+    
+    Args:
+        jobs: Danh sách (job_id, job_text) hoặc (job_id, job_text, metadata);
+              job_id trùng lặp thì lấy bản sau cùng
+        batch_size: Số job mỗi batch (None = theo cấu hình vector_batch_size)
+        on_batch: Callback nhận thống kê sau mỗi batch
+                  (batch, size, unchanged, done, total, seconds, jobs_per_second, error nếu lỗi)
+        force: Embed lại tất cả, bỏ qua content hash (vd: sau khi đổi embedding model)
+        
+    Returns:
+        Dict: upserted (số job đã embed và ghi), unchanged_ids (job không đổi, không embed lại),
+              failed_ids (job thuộc batch bị lỗi), seconds, jobs_per_second
+    """
+    # Chroma từ chối id trùng lặp trong cùng một lần upsert
+    unique_jobs = list({job[0]: job for job in jobs}.values())
+    batch_size = max(1, min(batch_size or _settings.vector_batch_size, client.get_max_batch_size()))
+    started = time.perf_counter()
+    upserted: List[str] = []
+    unchanged_ids: List[str] = []
+    failed_ids: List[str] = []
+    # Job có dữ liệu thay đổi (kể cả chỉ đổi metadata) để báo cho listener
+    updated: List[str] = []
+    
+    try:
+        for number, offset in enumerate(range(0, len(unique_jobs), batch_size), start=1):
+            batch = unique_jobs[offset:offset + batch_size]
+            batch_started = time.perf_counter()
+            report = {"batch": number, "size": len(batch)}
+            try:
+                stored = {} if force else _stored_metadatas([job[0] for job in batch])
+                changed, same, metadata_updates = [], [], []
+                for job in batch:
+                    job_id, text = job[0], job[1]
+                    metadata = job[2] if len(job) > 2 else None
+                    text_hash = _content_hash(text)
+                    old = stored.get(job_id)
+                    if old is None or old.get(CONTENT_HASH_KEY) != text_hash:
+                        changed.append((job_id, text, {**(metadata or {}), CONTENT_HASH_KEY: text_hash}))
+                    else:
+                        same.append(job_id)
+                        if not _metadata_matches(old, metadata):
+                            metadata_updates.append((job_id, metadata))
+                
+                if changed:
+                    ids = [job[0] for job in changed]
+                    texts = [job[1] for job in changed]
+                    collection.upsert(
+                        ids=ids,
+                        documents=texts,
+                        embeddings=embedding_function(texts),
+                        metadatas=[job[2] for job in changed]
+                    )
+                    _index_lexical(list(zip(ids, texts)))
+                if metadata_updates:
+                    # Chỉ đổi metadata: update không tính lại embedding
+                    collection.update(
+                        ids=[job_id for job_id, _ in metadata_updates],
+                        metadatas=[metadata for _, metadata in metadata_updates]
+                    )
+                upserted.extend(job[0] for job in changed)
+                unchanged_ids.extend(same)
+                updated.extend(job[0] for job in changed)
+                updated.extend(job_id for job_id, _ in metadata_updates)
+                report["unchanged"] = len(same)
+            except Exception as e:
+                logger.exception("Lỗi khi upsert batch %d (%d job)", number, len(batch))
+                failed_ids.extend(job[0] for job in batch)
+                report["error"] = str(e)
+            seconds = time.perf_counter() - batch_started
+            report.update(
+                done=len(upserted) + len(unchanged_ids) + len(failed_ids),
+                total=len(unique_jobs),
+                seconds=round(seconds, 3),
+                jobs_per_second=round(len(batch) / seconds, 1) if seconds > 0 else None
+            )
+            logger.info("Đã upsert batch job", extra=report)
+            if on_batch is not None:
+                on_batch(report)
+    finally:
+        # Báo một lần cho tất cả job đã ghi (kể cả khi bị dừng giữa chừng)
+        if updated:
+            _notify_job_update(updated)
+    
+    elapsed = time.perf_counter() - started
+    return {
+        "upserted": len(upserted),
+        "unchanged_ids": unchanged_ids,
+        "failed_ids": failed_ids,
+        "seconds": round(elapsed, 3),
+        "jobs_per_second": round((len(upserted) + len(unchanged_ids)) / elapsed, 1) if elapsed > 0 else None
+    }
+
+def delete_jobs_from_vector(job_ids: List[str]) -> List[str]:
+    """
+    Xóa công việc khỏi vector DB (job bị gỡ / hết hạn)
+    
+    Args:
+        job_ids: Danh sách job_id cần xóa
+        
+    Returns:
+        List[str]: Các job_id thực sự tồn tại và đã bị xóa
+    """
+    if not job_ids:
+        return []
+    existing = collection.get(ids=list(job_ids), include=[])["ids"]
+    if existing:
+        collection.delete(ids=existing)
+        _unindex_lexical(existing)
+        _notify_job_update(existing)
+    return existing
+
+def _retrieval_key(query: str, top_k: int, where: Optional[Dict] = None) -> str:
+    """Key cho retrieval cache / single-flight, gắn với bộ lọc và version dữ liệu hiện tại"""
+    return json.dumps([query, top_k, where, _data_version], ensure_ascii=False, sort_keys=True)
 
 # Hàm tìm kiếm công việc theo ngữ nghĩa
-def search_jobs_vector(query: str, top_k: int = 5):
-    results = collection.query(
-        query_texts=[query],
-        n_results=top_k
+def query_jobs_vector(query: str, top_k: int = 5, where: Optional[Dict] = None) -> Dict[str, List]:
+    """
+    Tìm kiếm công việc và trả về đầy đủ ids, documents, distances
+    (danh sách phẳng, theo thứ tự độ phù hợp giảm dần)
+    
+    where: bộ lọc metadata của Chroma (từ build_job_where), lọc ngay trong index
+    """
+    # Lấy version trước khi query: nếu có ghi xen giữa, kết quả được lưu
+    # dưới version cũ và sẽ không bao giờ được đọc lại
+    start = time.perf_counter()
+    cache_key = _retrieval_key(query, top_k, where)
+    if _settings.retrieval_cache_enabled:
+        cached = _retrieval_cache.get(cache_key)
+        record_cache("retrieval", cached is not None)
+        if cached is not None:
+            stage_duration.observe(time.perf_counter() - start, stage="vector_search")
+            return {field: list(values) for field, values in cached.items()}
+    
+    def run_query() -> Dict[str, List]:
+        results = collection.query(
+            query_texts=[query],
+            n_results=top_k,
+            where=where
+        )
+        jobs = {
+            "ids": results['ids'][0] if results['ids'] else [],
+            "documents": results['documents'][0] if results['documents'] else [],
+            "distances": results['distances'][0] if results['distances'] else []
+        }
+        if _settings.retrieval_cache_enabled:
+            _retrieval_cache.set(cache_key, jobs)
+        return jobs
+    
+    jobs = _inflight_queries.do(cache_key, run_query)
+    stage_duration.observe(time.perf_counter() - start, stage="vector_search")
+    # Trả bản sao vì kết quả có thể được dùng chung giữa nhiều request
+    return {field: list(values) for field, values in jobs.items()}
+
+def search_jobs_vector(query: str, top_k: int = 5, where: Optional[Dict] = None):
+    # Trả về danh sách mô tả công việc phù hợp (where: bộ lọc metadata, vd từ build_job_where)
+    return query_jobs_vector(query, top_k, where)["documents"]
+
+async def query_jobs_vector_async(query: str, top_k: int = 5, where: Optional[Dict] = None) -> Dict[str, List]:
+    """
+    Phiên bản async của query_jobs_vector (chạy trong threadpool).
+    Các request giống nhau đồng thời chỉ chiếm một thread.
+    """
+    jobs = await _inflight_queries_async.do(
+        _retrieval_key(query, top_k, where),
+        lambda: asyncio.to_thread(query_jobs_vector, query, top_k, where)
+    )
+    return {field: list(values) for field, values in jobs.items()}
+
+async def search_jobs_vector_async(query: str, top_k: int = 5, where: Optional[Dict] = None):
+    """
+    Phiên bản async của search_jobs_vector.
+    ChromaDB PersistentClient chỉ có API đồng bộ nên query được chạy trong
+    threadpool để không chặn event loop.
+    """
+    return await asyncio.to_thread(search_jobs_vector, query, top_k, where)
+
+def search_jobs(query: str, top_k: int = 5, where: Optional[Dict] = None) -> Dict[str, List]:
+    """
+    Tìm kiếm lai: vector search (ngữ nghĩa) + BM25 (từ khóa chính xác như "Spring Boot",
+    "Đà Nẵng"), hai danh sách được gộp bằng Reciprocal Rank Fusion
+    
+    Args:
+        query: Câu truy vấn
+        top_k: Số kết quả tối đa
+        where: Bộ lọc metadata (từ build_job_where), áp dụng cho cả hai bên
+        
+    Returns:
+        Dict[str, List]: ids, documents, distances (None với job chỉ khớp từ khóa),
+                         scores (điểm RRF), theo thứ tự điểm giảm dần
+    """
+    if not _settings.hybrid_search_enabled:
+        return query_jobs_vector(query, top_k, where)
+    
+    candidates = max(top_k, _settings.hybrid_candidates)
+    vector = query_jobs_vector(query, candidates, where)
+    with stage_duration.time(stage="lexical_search"):
+        _ensure_lexical_index()
+        if where:
+            # Chỉ kiểm tra bộ lọc trên top ứng viên BM25 (lấy dư) thay vì quét cả collection
+            hits = lexical_index.search(query, candidates * max(1, _settings.hybrid_filter_overfetch))
+            matched = set(
+                collection.get(ids=[job_id for job_id, _ in hits], where=where, include=[])["ids"]
+            ) if hits else set()
+            lexical = [hit for hit in hits if hit[0] in matched][:candidates]
+        else:
+            lexical = lexical_index.search(query, candidates)
+    
+    fused = reciprocal_rank_fusion(
+        [vector["ids"], [job_id for job_id, _ in lexical]],
+        k=_settings.rrf_k,
+        weights=[1.0, _settings.hybrid_lexical_weight]
+    )[:top_k]
+    documents = dict(zip(vector["ids"], vector["documents"]))
+    distances = dict(zip(vector["ids"], vector["distances"]))
+    missing = [job_id for job_id, _ in fused if job_id not in documents]
+    if missing:
+        fetched = collection.get(ids=missing, include=["documents"])
+        documents.update(zip(fetched["ids"], fetched["documents"]))
+    # Job còn trong chỉ mục BM25 nhưng đã bị process khác xóa khỏi Chroma thì bỏ qua
+    fused = [(job_id, score) for job_id, score in fused if job_id in documents]
+    return {
+        "ids": [job_id for job_id, _ in fused],
+        "documents": [documents[job_id] for job_id, _ in fused],
+        "distances": [distances.get(job_id) for job_id, _ in fused],
+        "scores": [score for _, score in fused]
+    }
+
+async def search_jobs_async(query: str, top_k: int = 5, where: Optional[Dict] = None) -> Dict[str, List]:
+    """
+    Phiên bản async của search_jobs (chạy trong threadpool).
+    Các request giống nhau đồng thời chỉ chiếm một thread.
+    """
+    jobs = await _inflight_queries_async.do(
+        "hybrid:" + _retrieval_key(query, top_k, where),
+        lambda: asyncio.to_thread(search_jobs, query, top_k, where)
     )
-    # Trả về danh sách mô tả công việc phù hợp
-    return results['documents'][0] if results['documents'] else []
+    return {field: list(values) for field, values in jobs.items()}
+
+def embed_queries(texts: List[str]) -> List[List[float]]:
+    """
+    Tính embedding cho nhiều query trong một lần gọi (cùng embedding function với collection)
+    Dùng để lưu lại và query nhiều lần mà không phải tính lại
+    """
+    return [[float(value) for value in vector] for vector in embedding_function(texts)]
+
+def reciprocal_rank_fusion(
+    rankings: List[List[str]],
+    k: int = 60,
+    weights: Optional[List[float]] = None
+) -> List[Tuple[str, float]]:
+    """
+    Gộp nhiều danh sách xếp hạng bằng Reciprocal Rank Fusion:
+    score(id) = sum(weight / (k + rank)), rank bắt đầu từ 1
+    
+    Args:
+        rankings: Các danh sách id, mỗi danh sách theo thứ tự độ phù hợp giảm dần
+        k: Hằng số làm mượt (60 theo bài báo gốc), càng lớn thì thứ hạng đầu càng ít áp đảo
+        weights: Trọng số của từng danh sách (mặc định bằng nhau)
+        
+    Returns:
+        List[Tuple[str, float]]: (id, điểm RRF) theo điểm giảm dần
+    """
+    scores: Dict[str, float] = {}
+    for index, ranking in enumerate(rankings):
+        weight = weights[index] if weights else 1.0
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + weight / (k + rank)
+    # Cùng điểm thì xếp theo id để kết quả ổn định
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+def query_jobs_by_embeddings(
+    embeddings: List[List[float]],
+    top_k: int = 10,
+    where_document: Optional[Dict] = None,
+    candidates: Optional[int] = None,
+    where: Optional[Dict] = None
+) -> Dict[str, List]:
+    """
+    Tìm kiếm công việc cho nhiều query (đã có embedding) trong một lần gọi Chroma,
+    gộp kết quả bằng Reciprocal Rank Fusion
+    
+    Args:
+        embeddings: Embedding của các query (từ embed_queries)
+        top_k: Số kết quả tối đa
+        where_document: Bộ lọc theo nội dung mô tả công việc, vd: {"$contains": "Python"}
+        candidates: Số kết quả lấy về cho mỗi query trước khi gộp (None = top_k).
+                    Điểm RRF phụ thuộc số này, giữ cố định để các trang nhất quán với nhau
+        where: Bộ lọc metadata (địa điểm, cấp bậc, lương, ...) từ build_job_where
+        
+    Returns:
+        Dict[str, List]: ids, documents, distances (distance nhỏ nhất qua các query),
+                         scores (điểm RRF), theo thứ tự điểm RRF giảm dần
+    """
+    with stage_duration.time(stage="cv_job_query"):
+        results = collection.query(
+            query_embeddings=embeddings,
+            n_results=candidates or top_k,
+            where=where,
+            where_document=where_document
+        )
+    
+    documents: Dict[str, str] = {}
+    distances: Dict[str, float] = {}
+    rankings = []
+    for ids, docs, dists in zip(results["ids"] or [], results["documents"] or [], results["distances"] or []):
+        rankings.append(ids)
+        for job_id, document, distance in zip(ids, docs, dists):
+            documents[job_id] = document
+            distances[job_id] = min(distance, distances.get(job_id, distance))
+    
+    fused = reciprocal_rank_fusion(rankings, k=_settings.rrf_k)[:top_k]
+    return {
+        "ids": [job_id for job_id, _ in fused],
+        "documents": [documents[job_id] for job_id, _ in fused],
+        "distances": [distances[job_id] for job_id, _ in fused],
+        "scores": [score for _, score in fused]
+    }
 
 def check_job_exists(job_id: str) -> bool:
     """Kiểm tra job đã tồn tại trong vector DB chưa"""
@@ -0,0 +1,84 @@
+"""
+Cấu hình chung cho test: chạy trong thư mục tạm (vector DB dùng đường dẫn tương đối,
+không đọc file .env của máy dev)
+"""
+import asyncio
+import hashlib
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.chdir(tempfile.mkdtemp(prefix="jobhunter-tests-"))
+
+
+def call_app(method: str, url: str, **kwargs) -> httpx.Response:
+    """Gửi một request tới app FastAPI qua ASGI (không mở cổng mạng)"""
+    from main import app
+
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, url, **kwargs)
+
+    return asyncio.run(send())
+
+
+class HashEmbeddingFunction:
+    """Embedding giả: vector đếm từ (băm vào 64 chiều), chuẩn hóa độ dài"""
+
+    def __init__(self):
+        self.calls = 0
+        self.texts = 0
+
+    def __call__(self, input):
+        self.calls += 1
+        self.texts += len(input)
+        vectors = []
+        for text in input:
+            vector = [0.0] * 64
+            for word in re.findall(r"\w+", text.lower()):
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1
+            norm = sum(value * value for value in vector) ** 0.5 or 1.0
+            vectors.append([value / norm for value in vector])
+        return vectors
+
+    def embed_query(self, input):
+        return self(input)
+
+    # Chroma kiểm tra các thuộc tính này khi gắn embedding function vào collection
+    @staticmethod
+    def name():
+        return "default"
+
+    def is_legacy(self):
+        return True
+
+
+@pytest.fixture
+def vector_store(monkeypatch, request):
+    """
+    vector_service với collection riêng cho mỗi test, embedding giả và chỉ mục BM25 trong bộ nhớ
+
+    Yields:
+        module services.vector_service (embedding_function là HashEmbeddingFunction đang dùng)
+    """
+    from services import vector_service
+    from services.bm25_index import BM25Index
+
+    embedding = HashEmbeddingFunction()
+    name = "test_" + hashlib.md5(request.node.nodeid.encode()).hexdigest()[:16]
+    collection = vector_service.client.get_or_create_collection(name, embedding_function=embedding)
+    monkeypatch.setattr(vector_service, "collection", collection)
+    monkeypatch.setattr(vector_service, "embedding_function", embedding)
+    monkeypatch.setattr(vector_service, "lexical_index", BM25Index())
+    vector_service._retrieval_cache.clear()
+    yield vector_service
+    vector_service.client.delete_collection(name)
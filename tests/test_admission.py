@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from conftest import call_app
+from services.admission import AdmissionController, QueueFullError
+
+
+def test_rejects_when_queue_full():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=1, queue_timeout=5)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert controller.active == 1 and controller.waiting == 1
+
+        with pytest.raises(QueueFullError) as error:
+            async with controller.slot():
+                pass
+        assert error.value.retry_after >= 1
+        assert controller.rejected == 1
+
+        release.set()
+        await asyncio.gather(holder, queued)
+        assert controller.active == 0 and controller.admitted == 2
+
+    asyncio.run(scenario())
+
+
+def test_rejects_after_queue_timeout():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=4, queue_timeout=0.05)
+        async with controller.slot():
+            with pytest.raises(QueueFullError):
+                async with controller.slot():
+                    pass
+            assert controller.waiting == 0
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_sync_and_async_callers_share_the_limit():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=4, queue_timeout=5)
+    order = []
+
+    async def async_caller():
+        async with controller.slot():
+            order.append("async")
+
+    with controller.slot_sync():
+        thread = threading.Thread(target=lambda: asyncio.run(async_caller()))
+        thread.start()
+        deadline = time.monotonic() + 2
+        while controller.waiting == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Async caller phải chờ slot đang bị lời gọi đồng bộ giữ
+        assert controller.waiting == 1 and order == []
+        order.append("sync")
+    thread.join(timeout=5)
+    assert order == ["sync", "async"]
+    assert controller.active == 0
+
+
+def test_sync_caller_rejected_when_queue_full():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=0, queue_timeout=5)
+    with controller.slot_sync():
+        with pytest.raises(QueueFullError):
+            with controller.slot_sync():
+                pass
+    assert controller.active == 0
+
+
+def test_sync_generate_response_holds_a_slot():
+    from services.base_ai_service import BaseAIService
+
+    class FakeService(BaseAIService):
+        provider_name = "fake-sync"
+        display_name = "Fake"
+
+        def _send(self, request):
+            return self.admission.active
+
+        def _response_text(self, response):
+            return str(response)
+
+    service = FakeService("fake-model")
+    assert service.generate_response("prompt") == "1"
+    assert service.admission.active == 0 and service.admission.admitted == 1
+
+
+def test_chat_route_returns_429_with_retry_after(monkeypatch):
+    from routes import chat as chat_route
+
+    class OverloadedService:
+        async def chat_async(self, **kwargs):
+            raise QueueFullError("gemini", retry_after=7)
+
+    monkeypatch.setattr(chat_route, "_get_ai_service", lambda: OverloadedService())
+    response = call_app("POST", "/api/chat", data={"message": "xin chào"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
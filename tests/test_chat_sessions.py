@@ -0,0 +1,54 @@
+from conftest import call_app
+from services.session_service import SessionStore
+
+
+class FakeService:
+    """AI service giả: ghi lại ngữ cảnh nhận được từ route"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def chat_async(self, message, conversation_history=None, cv_text="", summary=""):
+        self.calls.append({"message": message, "history": list(conversation_history or []), "cv_text": cv_text})
+        return f"Trả lời: {message}"
+
+    async def complete_async(self, prompt):
+        return "Tóm tắt"
+
+
+def use_fake_service(monkeypatch):
+    from routes import chat as chat_route
+
+    service = FakeService()
+    monkeypatch.setattr(chat_route, "_get_ai_service", lambda: service)
+    return service
+
+
+def test_server_issues_session_ids(monkeypatch):
+    service = use_fake_service(monkeypatch)
+    first = call_app("POST", "/api/chat", data={"message": "Xin chào", "new_session": "true"}).json()
+    session_id = first["session_id"]
+    assert len(session_id) == 43
+
+    call_app("POST", "/api/chat", data={"message": "Tìm việc Python", "session_id": session_id})
+    assert [msg["content"] for msg in service.calls[-1]["history"]] == ["Xin chào", "Trả lời: Xin chào"]
+
+    session = call_app("GET", f"/api/chat/sessions/{session_id}").json()
+    assert len(session["history"]) == 4
+    assert "cv_text" not in session
+
+
+def test_unknown_or_client_chosen_ids_are_rejected(monkeypatch):
+    service = use_fake_service(monkeypatch)
+    for session_id in ("user-123", "A" * 43):
+        response = call_app("POST", "/api/chat", data={"message": "Xin chào", "session_id": session_id})
+        assert response.status_code == 404
+        assert call_app("GET", f"/api/chat/sessions/{session_id}").status_code == 404
+    assert service.calls == []
+
+
+def test_store_does_not_accept_ids_it_did_not_issue():
+    store = SessionStore()
+    assert store.get("user-123") is None
+    assert not store.append_turn("user-123", "a", "b")
+    assert store.get("user-123") is None
@@ -0,0 +1,42 @@
+import zipfile
+
+import pytest
+
+from services.cv_batch_service import _read_zip_member, expand_zip
+
+PDF_BYTES = b"%PDF-1.4\n" + b"0" * 4096
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / "cvs.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("a.pdf", PDF_BYTES)
+        # Nén rất tốt: vài KB trong ZIP nhưng 50MB khi giải nén
+        zf.writestr("bomb.pdf", b"%PDF-1.4\n" + b"0" * (50 * 1024 * 1024))
+        zf.writestr("notes.txt", b"hello")
+        zf.writestr("__MACOSX/._a.pdf", b"junk")
+    return str(path)
+
+
+def test_expand_zip_rejects_oversized_and_non_pdf_members(archive):
+    items = {item.name: item for item in expand_zip(archive, "cvs.zip", max_bytes=1024 * 1024)}
+    assert set(items) == {"cvs.zip/a.pdf", "cvs.zip/bomb.pdf", "cvs.zip/notes.txt"}
+    assert items["cvs.zip/a.pdf"].error is None
+    assert items["cvs.zip/a.pdf"].load()[0] == PDF_BYTES
+    assert "vượt quá" in items["cvs.zip/bomb.pdf"].error
+    assert items["cvs.zip/notes.txt"].error == "Chỉ chấp nhận file PDF"
+
+
+def test_member_read_stops_at_the_limit(archive):
+    # Không tin file_size trong header: đọc tối đa max_bytes + 1 byte rồi dừng
+    with pytest.raises(ValueError, match="vượt quá"):
+        _read_zip_member(archive, "bomb.pdf", 1024 * 1024)
+    assert _read_zip_member(archive, "a.pdf", 1024 * 1024) == (PDF_BYTES, None)
+
+
+def test_invalid_archive_is_reported_as_one_item(tmp_path):
+    path = tmp_path / "broken.zip"
+    path.write_bytes(b"PK\x03\x04 not really a zip")
+    [item] = expand_zip(str(path), "broken.zip", max_bytes=1024)
+    assert item.error.startswith("File ZIP không hợp lệ")
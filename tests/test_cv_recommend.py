@@ -0,0 +1,44 @@
+import asyncio
+
+from config import get_settings
+from routes.cv import _recommend_for_profile
+
+JOBS = [
+    ("python-1", "python django backend"),
+    ("python-2", "python flask api"),
+    ("python-3", "python data pipeline"),
+    ("python-4", "python backend django api"),
+    ("react-1", "react frontend ui"),
+    ("react-2", "react native mobile"),
+    ("java-1", "java spring boot"),
+]
+
+
+def recommend(vector_store, **kwargs):
+    profile = {
+        "cv_id": "cv-test",
+        "embeddings": vector_store.embedding_function(["python django backend", "python api"]),
+        "skills": [], "experience_years": None, "email": None, "phone": None
+    }
+    return asyncio.run(_recommend_for_profile(profile, **kwargs))
+
+
+def test_min_score_is_applied_before_paging(vector_store, monkeypatch):
+    monkeypatch.setattr(get_settings(), "rrf_candidates", 2)
+    vector_store.add_jobs_to_vector(JOBS)
+    everything = recommend(vector_store, limit=10)
+    threshold = sorted(job.relevance_score for job in everything.jobs)[-4] - 0.001
+    expected = [job.job_id for job in everything.jobs if job.relevance_score >= threshold]
+    assert 0 < len(expected) < len(JOBS)
+
+    pages, offset = [], 0
+    while True:
+        page = recommend(vector_store, limit=2, offset=offset, min_score=threshold)
+        assert all(job.relevance_score >= threshold for job in page.jobs)
+        pages.extend(job.job_id for job in page.jobs)
+        if not page.has_more:
+            break
+        assert len(page.jobs) == 2
+        offset += 2
+    assert pages == expected
+    assert recommend(vector_store, limit=50, min_score=threshold).total == len(expected)
@@ -0,0 +1,23 @@
+from services.job_text import JOB_METADATA_KEYS, build_job_metadata, build_job_where
+
+
+def where_fields(where):
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            for condition in value:
+                yield from where_fields(condition)
+        else:
+            yield key
+
+
+def test_metadata_always_writes_every_key():
+    metadata = build_job_metadata({"location": "HN / TP.HCM", "salary": "15-20 triệu"})
+    assert tuple(metadata) == JOB_METADATA_KEYS
+    assert metadata["location"] == ["ha_noi", "ho_chi_minh"]
+    assert metadata["level"] is None and metadata["end_date_ts"] == 0
+
+
+def test_where_only_filters_on_indexed_keys():
+    where = build_job_where("Hà Nội", "Senior,Junior", "Full-time", "Remote", 10_000_000, 30_000_000, True)
+    assert set(where_fields(where)) <= set(JOB_METADATA_KEYS)
+    assert build_job_where() is None
@@ -0,0 +1,28 @@
+import time
+
+from services.cv_profile_service import CVProfileStore
+from services.session_service import SessionStore
+
+
+def test_session_survives_restart_via_sqlite(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    store = SessionStore(db_path=db_path)
+    sid = store.create()["session_id"]
+    assert store.append_turn(sid, "Xin chào", "Chào bạn")
+
+    reopened = SessionStore(db_path=db_path)
+    assert [msg["content"] for msg in reopened.get(sid)["history"]] == ["Xin chào", "Chào bạn"]
+    assert reopened.delete(sid)
+    assert reopened.get(sid) is None and not reopened.delete(sid)
+
+
+def test_expired_profile_is_dropped_from_sqlite(tmp_path):
+    db_path = str(tmp_path / "profiles.db")
+    store = CVProfileStore(ttl_seconds=60, db_path=db_path)
+    store.save("cv1", {"full_text": "CV", "skills": ["python"]}, ["python"], [[0.1]], "v1")
+    store._db.execute("UPDATE cv_profiles SET updated_at = ?", (time.time() - 120,))
+    store._db.commit()
+
+    reopened = CVProfileStore(ttl_seconds=60, db_path=db_path)
+    assert reopened.get("cv1") is None
+    assert reopened._db.execute("SELECT COUNT(*) FROM cv_profiles").fetchone()[0] == 0
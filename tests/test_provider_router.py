@@ -0,0 +1,115 @@
+import asyncio
+import itertools
+
+import pytest
+
+from services.base_ai_service import BaseAIService
+from services.provider_router import ProviderRouter
+from services.singleflight import AsyncSingleFlight
+
+_names = itertools.count()
+
+
+class FakeService(BaseAIService):
+    """Provider giả: trả lời sau `delay` giây, ghi lại các lời gọi bị hủy"""
+
+    display_name = "Fake"
+
+    def __init__(self, delay: float):
+        self.provider_name = f"fake-router-{next(_names)}"
+        super().__init__(self.provider_name)
+        self.delay = delay
+        self.sent = 0
+        self.cancelled = 0
+
+    async def prepare_request_async(self, message, conversation_history=None, cv_text="", summary=""):
+        return message, [], f"{self.provider_name}:{message}"
+
+    async def _send_async(self, request):
+        self.sent += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"{self.provider_name}: {request}"
+
+    def _response_text(self, response):
+        return response
+
+
+async def wait_until(condition, timeout=1.0):
+    """Hủy lan qua nhiều task nên cần vài vòng event loop"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition() and loop.time() < deadline:
+        await asyncio.sleep(0.005)
+    return condition()
+
+
+def test_singleflight_cancels_call_only_when_last_waiter_leaves():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        started, cancelled = asyncio.Event(), asyncio.Event()
+
+        async def call():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        first = asyncio.create_task(flight.do("key", call))
+        second = asyncio.create_task(flight.do("key", call))
+        await started.wait()
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled.is_set()
+
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        with pytest.raises(asyncio.CancelledError):
+            await second
+
+    asyncio.run(scenario())
+
+
+def test_timeout_cancels_provider_call_and_frees_its_slot():
+    async def scenario():
+        slow, fast = FakeService(delay=10), FakeService(delay=0)
+        router = ProviderRouter({"slow": slow, "fast": fast}, timeout=0.05)
+        router.stats["fast"].record_success(5.0)  # Để router thử provider chậm trước
+
+        assert (await router.chat_async("xin chào")).startswith(fast.provider_name)
+        assert await wait_until(lambda: slow.cancelled == 1)
+        assert slow.sent == 1 and slow.admission.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_hedge_loser_is_cancelled():
+    async def scenario():
+        slow, fast = FakeService(delay=10), FakeService(delay=0.01)
+        router = ProviderRouter({"slow": slow, "fast": fast}, timeout=5, hedge_delay=0.02)
+        router.stats["fast"].record_success(5.0)
+
+        assert (await router.chat_async("hedge")).startswith(fast.provider_name)
+        assert await wait_until(lambda: slow.cancelled == 1)
+        assert slow.admission.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_cache_hits_do_not_count_as_provider_latency():
+    async def scenario():
+        service = FakeService(delay=0.05)
+        router = ProviderRouter({"only": service}, timeout=5)
+        await router.chat_async("cùng câu hỏi")
+        await router.chat_async("cùng câu hỏi")
+
+        assert service.sent == 1
+        assert len(router.stats["only"].latencies) == 1
+        assert router.stats["only"].p50 >= 0.05
+
+    asyncio.run(scenario())
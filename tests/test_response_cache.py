@@ -0,0 +1,73 @@
+import asyncio
+
+from services.cache_service import ResponseCache, normalize_message
+
+HISTORY = [{"role": "user", "content": "Tôi muốn tìm việc"}, {"role": "assistant", "content": "Bạn ở đâu?"}]
+
+
+def make_key(**overrides):
+    args = dict(
+        message="Có việc Python ở Hà Nội không?",
+        job_ids=["1", "2"],
+        conversation_history=HISTORY,
+        model="model-a",
+        temperature=0.7
+    )
+    args.update(overrides)
+    return ResponseCache.make_key(**args)
+
+
+def test_key_ignores_case_spacing_and_trailing_punctuation():
+    assert normalize_message("  Có việc  Python ở Hà Nội không?? ") == "có việc python ở hà nội không"
+    assert make_key() == make_key(message="có việc python   ở Hà Nội KHÔNG")
+
+
+def test_key_changes_with_every_prompt_input():
+    base = make_key()
+    assert make_key(job_ids=["2", "1"]) != base
+    assert make_key(conversation_history=HISTORY[:1]) != base
+    assert make_key(model="model-b") != base
+    assert make_key(temperature=0.2) != base
+    assert make_key(cv_text="CV") != base
+    assert make_key(summary="Tóm tắt") != base
+
+
+def test_invalidate_jobs_removes_only_answers_citing_them():
+    cache = ResponseCache()
+    cache.set("a", "answer a", ["1", "2"], latency=1.0)
+    cache.set("b", "answer b", ["3"], latency=1.0)
+
+    assert cache.invalidate_jobs(["2"]) == 1
+    assert cache.get("a") is None
+    assert cache.get("b") == "answer b"
+
+
+def test_answer_generated_across_a_vector_write_is_not_stored():
+    version = {"value": 1}
+    cache = ResponseCache(version_source=lambda: version["value"])
+
+    def generate():
+        # Job được ghi lại (version tăng, invalidate chạy) trong lúc LLM đang trả lời
+        version["value"] += 1
+        cache.invalidate_jobs(["1"])
+        return "stale answer"
+
+    assert cache.get_or_generate("key", ["1"], generate) == "stale answer"
+    assert cache.get("key") is None
+    assert cache.stats()["stale_skipped"] == 1
+
+    assert cache.get_or_generate("key", ["1"], lambda: "fresh answer") == "fresh answer"
+    assert cache.get("key") == "fresh answer"
+
+
+def test_version_captured_before_retrieval_is_honoured():
+    version = {"value": 5}
+    cache = ResponseCache(version_source=lambda: version["value"])
+    captured = cache.current_version()
+    version["value"] += 1  # Ghi xảy ra giữa lúc truy xuất và lúc bắt đầu sinh câu trả lời
+
+    async def generate():
+        return "answer"
+
+    assert asyncio.run(cache.get_or_generate_async("key", ["1"], generate, version=captured)) == "answer"
+    assert cache.get("key") is None
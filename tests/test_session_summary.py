@@ -0,0 +1,59 @@
+import asyncio
+
+from services.session_service import SessionStore
+
+
+def make_store(**overrides):
+    options = dict(max_recent_messages=2, summary_max_chars=300, summary_window=2)
+    options.update(overrides)
+    return SessionStore(**options)
+
+
+def add_turns(store, session_id, count):
+    for index in range(count):
+        store.append_turn(session_id, f"Câu hỏi {index}. Chi tiết thêm.", f"Trả lời {index}.")
+
+
+def test_evicted_messages_wait_for_summary_and_appear_as_excerpts():
+    store = make_store()
+    sid = store.create()["session_id"]
+    add_turns(store, sid, 2)
+    session = store.get(sid)
+    assert len(session["history"]) == 2
+    assert [msg["content"] for msg in session["pending"]] == ["Câu hỏi 0. Chi tiết thêm.", "Trả lời 0."]
+    assert store.context_summary(session) == "User: Câu hỏi 0.\nAssistant: Trả lời 0."
+    assert store.summary_due(sid)
+
+
+def test_summarize_folds_one_window_into_llm_summary():
+    store = make_store()
+    sid = store.create()["session_id"]
+    add_turns(store, sid, 2)
+    prompts = []
+
+    async def complete(prompt):
+        prompts.append(prompt)
+        return "Người dùng hỏi về việc làm. " * 50
+
+    assert asyncio.run(store.summarize(sid, complete))
+    session = store.get(sid)
+    assert "Câu hỏi 0. Chi tiết thêm." in prompts[0]
+    assert session["pending"] == []
+    assert 0 < len(session["summary"]) <= 300
+    assert not store.summary_due(sid)
+
+
+def test_pending_stays_bounded_when_llm_fails():
+    store = make_store()
+    sid = store.create()["session_id"]
+
+    async def failing(prompt):
+        raise RuntimeError("provider down")
+
+    for _ in range(10):
+        add_turns(store, sid, 1)
+        if store.summary_due(sid):
+            assert not asyncio.run(store.summarize(sid, failing))
+    session = store.get(sid)
+    assert len(session["pending"]) <= 2 * store.summary_window
+    assert 0 < len(session["summary"]) <= 300
@@ -0,0 +1,57 @@
+import asyncio
+
+import httpx
+
+from config import get_settings
+from conftest import call_app
+from services.upload_service import UploadSizeLimitMiddleware
+
+PDF_BYTES = b"%PDF-1.4\n" + b"0" * 2048
+
+
+def upload_cv(content, content_type="application/pdf"):
+    return call_app("POST", "/api/cv/upload", files={"file": ("cv.pdf", content, content_type)})
+
+
+def test_rejects_file_that_is_not_a_pdf():
+    assert upload_cv(b"MZ" + b"0" * 2048).status_code == 415
+    assert upload_cv(PDF_BYTES, content_type="image/png").status_code == 415
+
+
+def test_rejects_file_over_the_size_limit(monkeypatch):
+    monkeypatch.setattr(get_settings(), "upload_max_bytes", 1024)
+    response = upload_cv(PDF_BYTES)
+    assert response.status_code == 413
+    assert "1KB" in response.json()["detail"]
+
+
+def test_middleware_rejects_large_body_before_the_app_reads_it():
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        while (await receive()).get("more_body"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = UploadSizeLimitMiddleware(app, max_bytes=0, path_limits={"/bulk": 4 * 1024 * 1024})
+    headers = {"content-type": "multipart/form-data; boundary=x"}
+
+    async def chunks(size):
+        for _ in range(size // 65536):
+            yield b"0" * 65536
+
+    async def send():
+        transport = httpx.ASGITransport(app=middleware)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            by_header = await client.post("/upload", content=b"0" * (2 * 1024 * 1024), headers=headers)
+            streamed = await client.post("/upload", content=chunks(2 * 1024 * 1024), headers=headers)
+            allowed = await client.post("/bulk", content=b"0" * (2 * 1024 * 1024), headers=headers)
+            return by_header, streamed, allowed
+
+    by_header, streamed, allowed = asyncio.run(send())
+    assert by_header.status_code == 413 and streamed.status_code == 413
+    assert allowed.status_code == 200
+    # Content-Length quá lớn: app không được gọi; body chunked: app bị dừng giữa chừng
+    assert calls == ["/upload", "/bulk"]
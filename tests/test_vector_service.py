@@ -0,0 +1,89 @@
+from services.bm25_index import BM25Index
+from services.job_text import build_job_metadata, build_job_where
+
+JOBS = [
+    ("1", "Java Developer: Spring Boot, microservices", {"location": "Hà Nội", "level": "Senior"}),
+    ("2", "Java Developer: Spring Boot, Kafka", {"location": "Đà Nẵng", "level": "Junior"}),
+    ("3", "Frontend Developer: ReactJS, TypeScript", {"location": "Hà Nội", "level": "Junior"}),
+]
+
+
+def add_jobs(vector_store, jobs=JOBS):
+    return vector_store.add_jobs_to_vector(
+        [(job_id, text, build_job_metadata(fields)) for job_id, text, fields in jobs]
+    )
+
+
+def test_hybrid_search_applies_filter_to_keyword_hits(vector_store):
+    add_jobs(vector_store)
+    where = build_job_where(location="Hà Nội")
+    results = vector_store.search_jobs("spring boot", top_k=3, where=where)
+    assert results["ids"][0] == "1"
+    assert "2" not in results["ids"]
+    assert set(results["ids"]) <= {"1", "3"}
+
+
+def test_keyword_index_follows_every_write(vector_store):
+    add_jobs(vector_store)
+    vector_store.search_jobs("java", top_k=1)  # Lần tìm đầu tiên xây chỉ mục từ collection
+    assert not vector_store.lexical_index.needs_rebuild
+
+    vector_store.add_job_to_vector("3", "Frontend Developer: VueJS, Nuxt")
+    assert [job_id for job_id, _ in vector_store.lexical_index.search("vuejs")] == ["3"]
+    assert vector_store.lexical_index.search("reactjs") == []
+
+    vector_store.delete_jobs_from_vector(["1"])
+    assert [job_id for job_id, _ in vector_store.lexical_index.search("microservices")] == []
+    assert vector_store.search_jobs("spring boot", top_k=3)["ids"][0] == "2"
+
+
+def test_index_rebuilds_when_tokenizer_version_changes(tmp_path, monkeypatch):
+    from services import bm25_index
+
+    db_path = str(tmp_path / "bm25.db")
+    index = BM25Index(db_path)
+    assert index.needs_rebuild
+    index.rebuild([("1", "Spring Boot"), ("2", "ReactJS")])
+    assert not BM25Index(db_path).needs_rebuild
+
+    monkeypatch.setattr(bm25_index, "TOKENIZER_VERSION", bm25_index.TOKENIZER_VERSION + 1)
+    stale = BM25Index(db_path)
+    assert stale.needs_rebuild and len(stale) == 0
+    stale.rebuild([("2", "ReactJS")])
+    assert len(BM25Index(db_path)) == 1
+
+
+def test_rrf_rewards_items_ranked_high_in_several_lists():
+    from services.vector_service import reciprocal_rank_fusion
+
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "d"]], k=60)
+    assert [item_id for item_id, _ in fused] == ["b", "c", "a", "d"]
+    assert fused[0][1] == 1 / 62 + 1 / 61
+
+
+def test_rrf_weights_and_ties():
+    from services.vector_service import reciprocal_rank_fusion
+
+    assert [item_id for item_id, _ in reciprocal_rank_fusion([["a"], ["b"]], weights=[1.0, 2.0])] == ["b", "a"]
+    # Cùng điểm thì xếp theo id
+    assert [item_id for item_id, _ in reciprocal_rank_fusion([["y"], ["x"]])] == ["x", "y"]
+
+
+def test_unchanged_jobs_are_not_embedded_again(vector_store):
+    embedding = vector_store.embedding_function
+    assert add_jobs(vector_store)["upserted"] == 3
+    texts_embedded = embedding.texts
+
+    # Chỉ khác khoảng trắng và metadata: không embed lại nhưng metadata vẫn được cập nhật
+    jobs = [(job_id, f"  {text}\n", fields) for job_id, text, fields in JOBS]
+    jobs[1] = ("2", JOBS[1][1], {"location": "Hà Nội", "level": "Junior"})
+    result = add_jobs(vector_store, jobs)
+    assert result["upserted"] == 0 and sorted(result["unchanged_ids"]) == ["1", "2", "3"]
+    assert embedding.texts == texts_embedded
+    stored = vector_store.collection.get(ids=["2"], include=["metadatas"])["metadatas"][0]
+    assert stored["location"] == ["ha_noi"]
+
+    assert not vector_store.add_job_to_vector("1", JOBS[0][1])
+    assert vector_store.add_job_to_vector("1", JOBS[0][1] + ", Docker")
+    assert vector_store.add_job_to_vector("3", JOBS[2][1], force=True)
+    assert embedding.texts == texts_embedded + 2